@@ -0,0 +1,237 @@
+"""
+ARENAS
+"""
+
+import time
+
+from gait_pipeline import (DOWNSCALE, FRAME_SKIP, IN_RANGE_DURATION, RESOLUTION, SPEED_RANGE_PERCENT, GaitTrigger,
+                           make_scaled_segmenter, pyramid_factor, rodent_settings)
+from instrumentation import NULL_METRICS
+
+# Keys an arena may set for itself; anything it leaves out comes from the session settings
+ARENA_KEYS = ["name", "rodent", "top_left", "bottom_right", "click", "click_value"]
+
+
+
+# CONFIGURATION
+
+# Settings of every arena in a session. settings["arenas"] (loaded from arenas.json) lists one
+# entry per walkway; each entry overrides the session settings, and "rodent" selects a rodent
+# profile for that arena only. Without an "arenas" list the session is a single arena.
+def arena_settings(settings):
+    entries = settings.get("arenas") or [{}]
+    arenas = []
+    for i, entry in enumerate(entries):
+        unknown = set(entry) - set(ARENA_KEYS) - set(settings)
+        if unknown:
+            raise ValueError(f"Arena {i + 1}: unknown keys {sorted(unknown)}")
+        arena = {key: value for key, value in settings.items() if key != "arenas"}
+        if "rodent" in entry:
+            arena.update(rodent_settings(entry["rodent"]))
+        arena.update(entry)
+        arena.setdefault("name", f"Arena {i + 1}")
+        for key in ("top_left", "bottom_right", "click"):
+            if key not in arena:
+                raise ValueError(f"{arena['name']}: missing {key}")
+        if arena["bottom_right"][0] <= arena["top_left"][0] or arena["bottom_right"][1] <= arena["top_left"][1]:
+            raise ValueError(f"{arena['name']}: bottom_right must be below and right of top_left")
+        arenas.append(arena)
+    names = [arena["name"] for arena in arenas]
+    if len(set(names)) != len(names):
+        raise ValueError("Arena names must be unique")
+    return arenas
+
+# Region (x, y, width, height) of an arena's side view
+def arena_region(arena):
+    (left, top), (right, bottom) = arena["top_left"], arena["bottom_right"]
+    return int(left), int(top), int(right - left), int(bottom - top)
+
+# Smallest region enclosing every region
+def union_region(regions):
+    left = min(x for x, y, width, height in regions)
+    top = min(y for x, y, width, height in regions)
+    right = max(x + width for x, y, width, height in regions)
+    bottom = max(y + height for x, y, width, height in regions)
+    return left, top, right - left, bottom - top
+
+# Row and column slices of a region within a grab of the enclosing region (decimated by decimation)
+def region_window(region, enclosing, decimation=1):
+    x, y, width, height = region
+    left, top = enclosing[:2]
+    return (slice((y - top) // decimation, (y - top + height) // decimation),
+            slice((x - left) // decimation, (x - left + width) // decimation))
+
+
+
+# TRACKING
+
+# One walkway: its side view within the shared grab, rodent profile, click target and limit,
+# and its own segmenter and trigger state
+class Arena:
+    def __init__(self, settings, resolution=RESOLUTION, frame_skip=FRAME_SKIP, metrics=None, calibration=None,
+                 downscale=DOWNSCALE):
+        self.name = settings["name"]
+        self.settings = settings
+        self.region = arena_region(settings)
+        self.click_position = settings["click"]
+        self.click_limit = settings.get("click_value") or float('inf')
+        self.resolution = resolution
+        self.metrics = NULL_METRICS if metrics is None else metrics
+        self.calibration = calibration  # Static mask of where the rodent can appear (see calibration.py)
+
+        # Centroids are in the pixels of resolution whatever the analysis size (see make_scaled_segmenter)
+        self.downscale = downscale
+        self.decimation = pyramid_factor(settings, self.region[2:], resolution) if downscale == "pyramid" else 1
+        self.input_decimation = 1  # Decimation of the grab this arena's side view comes from (see ArenaTracker)
+        self.scale = 1.0  # Quality level scale of the analysis size (see set_quality)
+        self.segmenter_options = {}
+        self._build_segmenter()
+        self.trigger = GaitTrigger(settings, frame_skip=frame_skip)
+        self.window = (slice(None), slice(None))  # Slices of the grab, set by ArenaTracker
+        self.journal = None  # TelemetryJournal recording every analyzed frame, set by ArenaTracker
+        self.index = 0  # This arena's index in the journal
+
+        # Counters
+        self.frames = 0
+        self.detections = 0
+        self.clicks = 0
+        self.seconds = 0.0  # Segmentation and trigger time
+        self.events = []
+
+    @property
+    def done(self):
+        return self.clicks >= self.click_limit
+
+    def _build_segmenter(self):
+        self.segmenter, self.to_reference = make_scaled_segmenter(
+            self.settings, self.region[2:], self.resolution, self.downscale, self.scale,
+            input_decimation=self.input_decimation, metrics=self.metrics, calibration=self.calibration,
+            **self.segmenter_options)
+
+    # Rebuild the segmenter for a quality level (see quality.py): the analysis size is scaled, with
+    # MIN_AREA and the morphology scaled to match. The trigger keeps its state but measures no speed
+    # across the change.
+    def set_quality(self, scale=1.0, frame_skip=FRAME_SKIP, **segmenter_options):
+        self.scale = scale
+        self.segmenter_options = segmenter_options
+        self._build_segmenter()
+        self.trigger.frame_skip = frame_skip
+        self.trigger.forget_position()
+
+    # False while the motion gate sees nothing changing in this arena
+    @property
+    def moving(self):
+        return getattr(self.segmenter, "moving", True)
+
+    # Analyze this arena's view of a grab; returns a click event dict or None. after_gap marks a
+    # grab taken after a longer interval than usual (capture slowed while idle), so no speed is
+    # measured from the previous one.
+    def process(self, grab, current_time, speed_range_percent=SPEED_RANGE_PERCENT, in_range_duration=IN_RANGE_DURATION,
+                after_gap=False):
+        start = time.perf_counter()
+        centroid = self.segmenter.find_centroid(grab[self.window])  # A view of the grab, not a copy
+        if centroid is not None and self.to_reference:
+            centroid = (centroid[0] * self.to_reference[0], centroid[1] * self.to_reference[1])
+        if after_gap:
+            self.trigger.forget_position()
+        trigger_start = self.metrics.clock()
+        gated = getattr(self.segmenter, "gated", False)  # The motion gate reused the last result: nothing measured
+        if gated:
+            self.trigger.skip_frame()
+            click = None
+        else:
+            click = self.trigger.update(centroid, current_time, speed_range_percent, in_range_duration)
+        self.metrics.lap("trigger", trigger_start)
+        if self.journal is not None:
+            area = self.segmenter.area
+            if self.to_reference:
+                area *= self.to_reference[0] * self.to_reference[1]
+            self.journal.record(current_time, self.index, centroid, area, self.trigger, click, gated)
+        self.frames += 1
+        if centroid is not None:
+            self.detections += 1
+        if click:
+            click["arena"] = self.name
+            self.clicks += 1
+            self.events.append(click)
+        self.seconds += time.perf_counter() - start
+        return click
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "clicks": self.clicks,
+            "click_limit": self.settings.get("click_value"),
+            "speed": float(self.trigger.speed),
+            "avg_speed": float(self.trigger.avg_speed),
+            "ms_per_frame": 1000 * self.seconds / max(1, self.frames),
+        }
+
+# Feeds every arena from one grab of the rectangle enclosing them all. Each arena reads its
+# side view as a slice of that grab, so a session costs one screen capture however many arenas it has.
+# With a journal, every arena's frames are recorded to it. With decimate_capture, the grab is taken
+# decimated by the smallest "pyramid" factor of the arenas (pass it on to MssFrameSource).
+class ArenaTracker:
+    def __init__(self, arenas, journal=None, decimate_capture=False):
+        if not arenas:
+            raise ValueError("No arenas to track")
+        self.arenas = arenas
+        self.region = union_region([arena.region for arena in arenas])
+        self.decimation = min(arena.decimation for arena in arenas) if decimate_capture else 1
+        for index, arena in enumerate(arenas):
+            arena.window = region_window(arena.region, self.region, self.decimation)
+            if self.decimation != arena.input_decimation:
+                arena.input_decimation = self.decimation
+                arena._build_segmenter()
+            arena.journal = journal
+            arena.index = index
+
+    # mss monitor for the union rectangle
+    def monitor(self):
+        left, top, width, height = self.region
+        return {"top": top, "left": left, "width": width, "height": height}
+
+    @property
+    def done(self):
+        return all(arena.done for arena in self.arenas)
+
+    def set_quality(self, scale=1.0, frame_skip=FRAME_SKIP, **segmenter_options):
+        for arena in self.arenas:
+            arena.set_quality(scale, frame_skip, **segmenter_options)
+
+    # True while no arena that is still clicking sees motion, so capture can slow down
+    @property
+    def idle(self):
+        return not any(arena.moving for arena in self.arenas if not arena.done)
+
+    # Analyze one grab in every arena that hasn't reached its click limit; returns (arena, click) pairs
+    def process(self, grab, current_time, speed_range_percent=SPEED_RANGE_PERCENT, in_range_duration=IN_RANGE_DURATION,
+                after_gap=False):
+        clicks = []
+        for arena in self.arenas:
+            if arena.done:
+                continue
+            click = arena.process(grab, current_time, speed_range_percent, in_range_duration, after_gap)
+            if click:
+                clicks.append((arena, click))
+        return clicks
+
+    def stats(self):
+        return {arena.name: arena.stats() for arena in self.arenas}
+
+    # One line per arena for the control panel
+    def summary(self):
+        lines = []
+        for arena in self.arenas:
+            limit = "" if arena.click_limit == float('inf') else f"/{arena.click_limit}"
+            lines.append(f"{arena.name}: {arena.clicks}{limit} clicks, {arena.trigger.avg_speed:.0f} px/s")
+        return "\n".join(lines)
+
+    def report(self):
+        left, top, width, height = self.region
+        lines = [f"Tracked {len(self.arenas)} arena(s) from one {width}x{height} grab at ({left}, {top})"]
+        for name, stats in self.stats().items():
+            lines.append(f"  {name}: {stats['clicks']} clicks, detected in {stats['detections']}/{stats['frames']} "
+                         f"frames, {stats['ms_per_frame']:.2f} ms/frame")
+        return "\n".join(lines)
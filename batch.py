@@ -0,0 +1,141 @@
+"""
+BATCH PROCESSING
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from frame_sources import CroppedFrameSource, open_frame_source
+from gait_pipeline import (FRAME_SKIP, IN_RANGE_DURATION, RESOLUTION, RODENT_CONFIGS, SPEED_RANGE_PERCENT,
+                           rodent_settings)
+from replay import replay_session
+
+VIDEO_EXTENSIONS = (".avi", ".mp4", ".mov", ".mkv", ".mpg", ".mpeg", ".wmv", ".cine")
+CSV_FIELDS = ["video", "time", "frame", "avg_speed", "lower_bound", "upper_bound"]
+
+# Video files named on the command line, plus every video inside the given directories, sorted
+def find_videos(paths, recursive=False):
+    videos = []
+    for path in paths:
+        if not os.path.isdir(path):
+            videos.append(path)
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            videos.extend(os.path.join(directory, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+            if not recursive:
+                break
+    return sorted(videos)
+
+# Keep each worker single-threaded inside OpenCV; the pool already uses every core
+def _init_worker():
+    cv2.setNumThreads(1)
+
+# Replay one video; returns a summary dict with its click events (or the error that stopped it)
+def process_video(job):
+    path, settings, options = job
+    result = {"video": path, "duration": 0.0, "elapsed": 0.0, "events": []}
+    start = time.perf_counter()
+    try:
+        with open_frame_source(path, options["fps"]) as source:
+            if options["roi"]:
+                source = CroppedFrameSource(source, options["roi"])
+            result["events"] = replay_session(source, settings, frame_skip=options["frame_skip"],
+                                              resolution=options["resolution"],
+                                              speed_range_percent=options["speed_range_percent"],
+                                              in_range_duration=options["in_range_duration"])
+            result["duration"] = source.timestamp
+    except Exception as e:
+        result["error"] = str(e)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+# Write one JSON object per video
+def write_jsonl(results, f):
+    for result in results:
+        f.write(json.dumps(result) + "\n")
+        yield result
+
+# Write one CSV row per click event
+def write_csv(results, f):
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for result in results:
+        for event in result["events"]:
+            writer.writerow({"video": result["video"], **event})
+        yield result
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a directory of recorded side views through the RGT trigger logic in parallel")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or directories of videos")
+    parser.add_argument("--output", "-o", required=True, help="Click events file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format (default: from the output file extension)")
+    parser.add_argument("--recursive", action="store_true", help="Also search subdirectories for videos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: one per core)")
+    # Rodent profile
+    parser.add_argument("--rodent", choices=list(RODENT_CONFIGS), default="Black Rat", help="Rodent profile (default: Black Rat)")
+    parser.add_argument("--settings", help="Settings file saved by RGT; overrides --rodent")
+    # Region of interest
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+                        help="Crop each frame to the side view before segmentation")
+    # Camera and trigger parameters
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the recordings (default: from each file)")
+    parser.add_argument("--frame-skip", type=int, default=FRAME_SKIP, help=f"Analyze every Nth frame (default: {FRAME_SKIP})")
+    parser.add_argument("--no-downscale", action="store_true", help=f"Segment at native resolution instead of {RESOLUTION}")
+    parser.add_argument("--speed-range", type=float, default=SPEED_RANGE_PERCENT, help=f"Speed range %% (default: {SPEED_RANGE_PERCENT})")
+    parser.add_argument("--in-range-duration", type=float, default=IN_RANGE_DURATION,
+                        help=f"Seconds the speed must stay in range (default: {IN_RANGE_DURATION})")
+    parser.add_argument("--min-click-interval", type=float, help="Minimum seconds between clicks (default: from the profile)")
+    parser.add_argument("--click-limit", type=int, help="Stop each video after this many clicks (default: no limit)")
+    args = parser.parse_args()
+
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    else:
+        settings = rodent_settings(args.rodent)
+    if args.min_click_interval is not None:
+        settings["MIN_CLICK_INTERVAL"] = args.min_click_interval
+    settings["click_value"] = args.click_limit
+    options = {
+        "fps": args.fps,
+        "roi": args.roi,
+        "frame_skip": args.frame_skip,
+        "resolution": None if args.no_downscale else RESOLUTION,
+        "speed_range_percent": args.speed_range,
+        "in_range_duration": args.in_range_duration,
+    }
+
+    videos = find_videos(args.inputs, args.recursive)
+    if not videos:
+        parser.error("No videos found")
+    output_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    writer = write_csv if output_format == "csv" else write_jsonl
+    print(f"Processing {len(videos)} videos with {args.workers} workers")
+
+    start = time.perf_counter()
+    clicks, footage = 0, 0.0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor, \
+            open(args.output, "w", newline="") as f:
+        results = executor.map(process_video, [(video, settings, options) for video in videos])
+        for result in writer(results, f):
+            if "error" in result:
+                print(f"{result['video']}: error: {result['error']}")
+                continue
+            clicks += len(result["events"])
+            footage += result["duration"]
+            print(f"{result['video']}: {len(result['events'])} clicks in {result['duration']:.1f}s of footage "
+                  f"({result['elapsed']:.1f}s)")
+    elapsed = time.perf_counter() - start
+    print(f"Processed {footage:.1f}s of footage in {elapsed:.1f}s ({clicks} clicks) -> {args.output}")
@@ -0,0 +1,50 @@
+"""
+CHROMA KEY SEGMENTATION
+"""
+
+import argparse
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_lut import time_per_frame
+from benchmarks.synthetic import add_noise, capture_frame, crossing_frames
+from gait_pipeline import RESOLUTION, ChromaKeySegmenter, FrameSegmenter, rodent_settings
+
+PROFILE = "Black Rat"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the HSV and chroma key color masks, from the raw capture on")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--sizes", default="1280x400,1920x1080", help="Comma-separated native capture sizes")
+    parser.add_argument("--noise", type=int, default=12, help="Per-pixel color noise added to the synthetic frames")
+    args = parser.parse_args()
+
+    settings = rodent_settings(PROFILE)
+    for size in args.sizes.split(","):
+        width, height = map(int, size.split("x"))
+        frames = add_noise(crossing_frames(args.frames, (width, height), speed=(width + 120) / args.frames), args.noise)
+        grabs = [capture_frame(frame) for frame in frames]
+        print(f"{width}x{height} {PROFILE}")
+
+        # Color mask alone, on frames already downscaled to RESOLUTION
+        hsv = FrameSegmenter(settings, RESOLUTION)
+        chroma = ChromaKeySegmenter(settings, RESOLUTION)
+        scaled = [cv2.resize(frame, RESOLUTION) for frame in frames]
+        hsv._allocate(scaled[0].shape)
+        chroma._allocate(scaled[0].shape)
+        mismatched = sum(int(np.count_nonzero(hsv.color_mask(frame) != chroma.color_mask(frame))) for frame in scaled)
+        hsv_ms = time_per_frame(hsv.color_mask, scaled)
+        chroma_ms = time_per_frame(chroma.color_mask, scaled)
+        print(f"  color mask at {RESOLUTION[0]}x{RESOLUTION[1]}: hsv {hsv_ms:6.3f} ms  chroma {chroma_ms:6.3f} ms  "
+              f"speedup {hsv_ms / chroma_ms:5.2f}x  mismatched pixels {mismatched}")
+
+        # Everything after the screen grab: the live conversion, then the segmenter (resize, mask, morphology, blob)
+        hsv = FrameSegmenter(settings, RESOLUTION)
+        chroma = ChromaKeySegmenter(settings, RESOLUTION)
+        hsv_ms = time_per_frame(lambda grab: hsv.find_centroid(cv2.cvtColor(grab, cv2.COLOR_RGBA2BGR)), grabs)
+        converted_ms = time_per_frame(lambda grab: chroma.find_centroid(cv2.cvtColor(grab, cv2.COLOR_RGBA2BGR)), grabs)
+        raw_ms = time_per_frame(chroma.find_centroid, grabs)
+        print(f"  grab to centroid: hsv {hsv_ms:6.3f} ms  chroma {converted_ms:6.3f} ms  chroma on the raw grab {raw_ms:6.3f} ms  "
+              f"speedup {hsv_ms / raw_ms:5.2f}x")
@@ -0,0 +1,89 @@
+"""
+DOWNSCALE COST
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import add_noise, capture_frame, crossing_frames
+from gait_pipeline import RESOLUTION, area_resize, make_scaled_segmenter, pyramid_factor, rodent_settings
+
+PROFILES = ["Black Rat", "Black Mouse"]
+FACTORS = [1, 2, 4, 8]
+
+# Capture conversion plus downscale of one raw grab: the full-size RGBA2BGR conversion then a
+# resize to RESOLUTION ("resize"), or area decimation of the raw grab before converting (a factor)
+def prepare(grab, factor):
+    if factor is None:
+        return cv2.cvtColor(grab, cv2.COLOR_RGBA2BGR)  # The segmenter resizes
+    if factor > 1:
+        height, width = grab.shape[:2]
+        grab = area_resize(grab, (width // factor, height // factor))
+    return cv2.cvtColor(grab, cv2.COLOR_RGBA2BGR)
+
+# Mean milliseconds per grab of preparing and segmenting, the per-frame centroids (in RESOLUTION pixels)
+# and the share of the time spent on the capture conversion and decimation
+def run(grabs, settings, size, factor):
+    if factor is None:
+        segmenter, to_reference = make_scaled_segmenter(settings, size, RESOLUTION, "resize", roi_tracking=False,
+                                                         motion_gating=False)
+    else:
+        segmenter, to_reference = make_scaled_segmenter(settings, size, RESOLUTION, "pyramid", factor=factor,
+                                                         input_decimation=factor, roi_tracking=False, motion_gating=False)
+    segmenter.find_centroid(prepare(grabs[0], factor))
+    centroids = []
+    prepare_seconds = 0.0
+    start = time.perf_counter()
+    for grab in grabs:
+        prepared = time.perf_counter()
+        side_view = prepare(grab, factor)
+        prepare_seconds += time.perf_counter() - prepared
+        centroid = segmenter.find_centroid(side_view)
+        if centroid is not None and to_reference:
+            centroid = (centroid[0] * to_reference[0], centroid[1] * to_reference[1])
+        centroids.append(centroid)
+    seconds = time.perf_counter() - start
+    return 1000 * seconds / len(grabs), centroids, prepare_seconds / seconds
+
+# Detection count, and mean and max centroid distance from the reference centroids where both found one
+def agreement(centroids, reference):
+    distances = [np.hypot(a[0] - b[0], a[1] - b[1]) for a, b in zip(centroids, reference) if a and b]
+    detected = sum(centroid is not None for centroid in centroids)
+    if not distances:
+        return detected, float('nan'), float('nan')
+    return detected, float(np.mean(distances)), float(np.max(distances))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the resize path with pyramid decimation of the raw grab")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--sizes", default="1280x400,1920x1080", help="Comma-separated native side view sizes")
+    parser.add_argument("--noise", type=int, default=12, help="Per-pixel color noise added to the synthetic frames")
+    args = parser.parse_args()
+
+    for size in args.sizes.split(","):
+        width, height = map(int, size.split("x"))
+        body = (max(4, width // 20), max(2, height // 14))
+        speed = (width + 2 * body[0]) / args.frames
+        grabs = [capture_frame(frame) for frame in
+                 add_noise(crossing_frames(args.frames, (width, height), speed, body), args.noise)]
+        for profile in PROFILES:
+            settings = rodent_settings(profile)
+            chosen = pyramid_factor(settings, (width, height))
+            print(f"{width}x{height} {profile} (MIN_AREA {settings['MIN_AREA']}, pyramid factor {chosen})")
+            base_ms, reference, base_share = run(grabs, settings, (width, height), None)
+            detected, _, _ = agreement(reference, reference)
+            print(f"  {'resize':8s} {base_ms:7.3f} ms/frame ({100 * base_share:3.0f}% capture)  "
+                  f"detected {detected}/{len(grabs)}")
+            for factor in FACTORS:
+                if factor > min(width, height):
+                    continue
+                ms, centroids, share = run(grabs, settings, (width, height), factor)
+                detected, mean_error, max_error = agreement(centroids, reference)
+                marker = "  <- chosen" if factor == chosen else ""
+                print(f"  {'x1/' + str(factor):8s} {ms:7.3f} ms/frame ({100 * share:3.0f}% capture)  "
+                      f"detected {detected}/{len(grabs)}  centroid error mean {mean_error:5.2f} max {max_error:5.2f} px  "
+                      f"speedup {base_ms / ms:5.2f}x{marker}")
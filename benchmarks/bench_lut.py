@@ -0,0 +1,49 @@
+"""
+LOOKUP TABLE SEGMENTATION
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import add_noise, crossing_frames
+from gait_pipeline import RESOLUTION, FrameSegmenter, LutSegmenter, build_segmentation_lut
+
+SETTINGS = {"MIN_AREA": 500, "LOWER_GREEN": [40, 50, 50], "UPPER_GREEN": [80, 255, 255], "VALUE_THRESHOLD": 180}
+
+# Mean milliseconds per call of fn over frames
+def time_per_frame(fn, frames, repeats=3):
+    fn(frames[0])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            fn(frame)
+    return 1000 * (time.perf_counter() - start) / (repeats * len(frames))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the HSV and lookup table color masks")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--width", type=int, default=1280, help="Native capture width")
+    parser.add_argument("--height", type=int, default=1024, help="Native capture height")
+    parser.add_argument("--noise", type=int, default=12, help="Per-pixel color noise added to the synthetic frames")
+    args = parser.parse_args()
+
+    frames = add_noise(crossing_frames(args.frames, (args.width, args.height), speed=8), args.noise)
+
+    start = time.perf_counter()
+    table = build_segmentation_lut(SETTINGS)
+    print(f"Table compiled in {time.perf_counter() - start:.2f} s")
+
+    for label, resolution in [(f"{RESOLUTION[0]}x{RESOLUTION[1]}", RESOLUTION), (f"native {args.width}x{args.height}", None)]:
+        hsv = FrameSegmenter(SETTINGS, resolution)
+        lut = LutSegmenter(SETTINGS, resolution, table=table)
+        mismatched = sum(int(np.count_nonzero(hsv.segment(frame) != lut.segment(frame))) for frame in frames)
+        # Time the color mask on already downscaled frames so only the classification differs
+        scaled = [cv2.resize(frame, resolution) for frame in frames] if resolution else frames
+        hsv_ms = time_per_frame(hsv.color_mask, scaled)
+        lut_ms = time_per_frame(lut.color_mask, scaled)
+        print(f"{label:20s} color mask: hsv {hsv_ms:6.3f} ms  lut {lut_ms:6.3f} ms  "
+              f"speedup {hsv_ms / lut_ms:5.2f}x  mismatched pixels {mismatched}")
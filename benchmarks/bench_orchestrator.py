@@ -0,0 +1,69 @@
+"""
+RIG ORCHESTRATOR SCALING
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from arenas import Arena, ArenaTracker, arena_settings
+from benchmarks.synthetic import add_noise, crossing_frames
+from frame_sources import ArrayFrameSource, CaptureScheduler
+from gait_pipeline import ANALYSIS_RATE, rodent_settings
+from orchestrator import RigOrchestrator
+
+RIG_SIZE = (640, 240)  # Side view of one rig; rigs are stacked vertically on the synthetic screen
+
+# Settings for rigs stacked one above the other, and the screen frames that show all of them
+# (each rig's rodent starts a little later than the one above)
+def stacked_rigs(count, frames, speed, noise):
+    width, height = RIG_SIZE
+    settings = rodent_settings("Black Rat")
+    settings["click_value"] = None
+    settings["arenas"] = [{"name": f"Rig {i + 1}", "top_left": [0, i * height], "bottom_right": [width, (i + 1) * height],
+                           "click": [0, 0]} for i in range(count)]
+    views = add_noise(crossing_frames(frames + 5 * count, RIG_SIZE, speed, (40, 20)), noise)
+    screens = [np.concatenate([views[i + 5 * (count - 1 - rig)] for rig in range(count)]) for i in range(frames)]
+    return settings, screens
+
+# Frames per second of the single-process ArenaTracker loop
+def run_in_process(settings, screens):
+    tracker = ArenaTracker([Arena(arena, frame_skip=1) for arena in arena_settings(settings)])
+    scheduler = CaptureScheduler(ArrayFrameSource(screens, ANALYSIS_RATE), frame_skip=1)
+    start = time.perf_counter()
+    while True:
+        grab = scheduler.next_frame()
+        if grab is None:
+            break
+        tracker.process(grab, scheduler.source.timestamp)
+    return len(screens) / (time.perf_counter() - start), {arena.name: arena.clicks for arena in tracker.arenas}
+
+# Frames per second of the orchestrator (including worker start-up and shutdown)
+def run_orchestrated(settings, screens):
+    orchestrator = RigOrchestrator(settings, frame_skip=1)
+    start = time.perf_counter()
+    orchestrator.run(ArrayFrameSource(screens, ANALYSIS_RATE))
+    return len(screens) / (time.perf_counter() - start), {name: len(events) for name, events in orchestrator.events.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frames per second of in-process vs process-per-rig tracking as rigs are added")
+    parser.add_argument("--rigs", type=int, nargs="+", default=None, help="Rig counts (default: 1, 2, 4, ... up to the core count)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--speed", type=float, default=6, help="Rodent speed in pixels per frame")
+    parser.add_argument("--noise", type=int, default=12, help="Per-pixel color noise")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    rig_counts = args.rigs or sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+    print(f"{cores} cores, {args.frames} frames of {RIG_SIZE[0]}x{RIG_SIZE[1]} per rig")
+    for count in rig_counts:
+        settings, screens = stacked_rigs(count, args.frames, args.speed, args.noise)
+        single_fps, single_clicks = run_in_process(settings, screens)
+        multi_fps, multi_clicks = run_orchestrated(settings, screens)
+        clicks = sum(single_clicks.values())
+        match = f"{clicks} clicks, same in both" if single_clicks == multi_clicks else f"CLICKS DIFFER {single_clicks} vs {multi_clicks}"
+        print(f"{count:3d} rigs: in-process {single_fps:7.1f} fps, process per rig {multi_fps:7.1f} fps "
+              f"({multi_fps / single_fps:.2f}x), {match}")
@@ -0,0 +1,88 @@
+"""
+ROLLING SPEED WINDOW
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from gait_pipeline import ANALYSIS_RATE, IN_RANGE_DURATION, MAX_SPEED, SPEED_RANGE_PERCENT, SPEEDS_CAP
+from speed_estimation import RollingSpeedWindow
+
+# Per-frame speed statistics as the trigger computed them before RollingSpeedWindow:
+# rebuild the list, np.mean over it and two all() scans
+class ListSpeedStats:
+    def __init__(self, speeds_cap=SPEEDS_CAP):
+        self.speeds_cap = speeds_cap
+        self.speeds = []
+
+    def update(self, speed):
+        if speed:
+            self.speeds.append(speed)
+            self.speeds = [s for s in self.speeds if s < MAX_SPEED]
+            if len(self.speeds) > self.speeds_cap:
+                self.speeds.pop(0)
+        else:
+            self.speeds = []
+        speeds = self.speeds
+        avg_speed = np.mean(speeds) if speeds else 0.0
+        lower_bound = avg_speed * (1 - (SPEED_RANGE_PERCENT / 100))
+        upper_bound = avg_speed * (1 + (SPEED_RANGE_PERCENT / 100))
+        all_within_range = all(lower_bound <= s <= upper_bound for s in speeds) if speeds else False
+        return float(avg_speed), all_within_range
+
+# The same statistics from a RollingSpeedWindow, optionally limited to the last window seconds
+class WindowSpeedStats:
+    def __init__(self, speeds_cap=SPEEDS_CAP, window=None):
+        self.window = window
+        self.speeds = RollingSpeedWindow(speeds_cap)
+
+    def update(self, speed, current_time=0.0):
+        speeds = self.speeds
+        if speed:
+            if speed < MAX_SPEED:
+                speeds.push(current_time, speed)
+            if self.window is not None:
+                speeds.expire(current_time, self.window)
+        else:
+            speeds.clear()
+        avg_speed = speeds.mean()
+        lower_bound = avg_speed * (1 - (SPEED_RANGE_PERCENT / 100))
+        upper_bound = avg_speed * (1 + (SPEED_RANGE_PERCENT / 100))
+        all_within_range = lower_bound <= speeds.min() and speeds.max() <= upper_bound if speeds else False
+        return avg_speed, all_within_range
+
+# Speeds in whole pixels per frame, like the frame_rate estimator, with the rodent lost now and then
+def speed_stream(count, rate=ANALYSIS_RATE, seed=0):
+    rng = np.random.default_rng(seed)
+    speeds = rng.integers(1, 25, count) * rate
+    speeds[rng.random(count) < 0.02] = 0
+    speeds[rng.random(count) < 0.01] = MAX_SPEED + rate
+    return [float(s) for s in speeds]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the list and rolling window speed statistics")
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--cap", type=int, default=SPEEDS_CAP, help="Max entries for speeds")
+    args = parser.parse_args()
+
+    speeds = speed_stream(args.frames)
+    times = [i / ANALYSIS_RATE for i in range(args.frames)]
+
+    results = {}
+    for label, stats in [("list", ListSpeedStats(args.cap)), ("window", WindowSpeedStats(args.cap))]:
+        start = time.perf_counter()
+        results[label] = [stats.update(speed) for speed in speeds]
+        microseconds = 1e6 * (time.perf_counter() - start) / args.frames
+        print(f"{label:28s} {microseconds:7.2f} us/frame")
+    mismatches = sum(a[1] != b[1] or not np.isclose(a[0], b[0]) for a, b in zip(results["list"], results["window"]))
+    print(f"Mismatched frames (cap only): {mismatches}")
+
+    stats = WindowSpeedStats(args.cap, IN_RANGE_DURATION)
+    start = time.perf_counter()
+    for speed, current_time in zip(speeds, times):
+        stats.update(speed, current_time)
+    microseconds = 1e6 * (time.perf_counter() - start) / args.frames
+    print(f"{f'window ({IN_RANGE_DURATION} s)':28s} {microseconds:7.2f} us/frame")
@@ -0,0 +1,139 @@
+"""
+PER-STAGE PIPELINE TIMING
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import add_noise, capture_frame, crossing_frames, profile_color
+from gait_pipeline import ANALYSIS_RATE, RESOLUTION, RODENT_CONFIGS, FrameSegmenter, GaitTrigger, rodent_settings
+
+STAGES = ["capture", "resize", "hsv", "masking", "morphology", "contours", "trigger"]
+CAPTURE_SIZES = ["640x480", "1280x400", "1280x1024", "1920x1080"]
+REGRESSION_THRESHOLD = 0.10  # Fractional slowdown of a stage's median reported by --compare
+
+# Time every stage of the live loop (FrameSegmenter's own stage methods, then GaitTrigger) over
+# raw capture frames; returns the per-stage seconds of every frame and the speeds measured
+def time_stages(settings, raw_frames, timestamps, resolution=RESOLUTION):
+    segmenter = FrameSegmenter(settings, resolution)
+    trigger = GaitTrigger(settings)
+    height, width = raw_frames[0].shape[:2]
+    bgr = np.empty((height, width, 3), np.uint8)
+    segmenter.segment(cv2.cvtColor(raw_frames[0], cv2.COLOR_RGBA2BGR, dst=bgr))  # Allocate the session buffers
+    seconds = {stage: np.empty(len(raw_frames)) for stage in STAGES}
+    speeds = []
+    clock = time.perf_counter
+    for i, (raw, current_time) in enumerate(zip(raw_frames, timestamps)):
+        t0 = clock()
+        cv2.cvtColor(raw, cv2.COLOR_RGBA2BGR, dst=bgr)
+        t1 = clock()
+        image = segmenter.downscale(bgr)
+        t2 = clock()
+        hsv = segmenter.to_hsv(image)
+        t3 = clock()
+        mask = segmenter.hsv_mask(hsv)
+        t4 = clock()
+        segmenter.morphology(mask)
+        t5 = clock()
+        blob = segmenter.largest_blob(mask)
+        centroid = segmenter.blob_centroid(blob) if blob else None
+        t6 = clock()
+        trigger.update(centroid, current_time)
+        t7 = clock()
+        for stage, start, end in zip(STAGES, (t0, t1, t2, t3, t4, t5, t6), (t1, t2, t3, t4, t5, t6, t7)):
+            seconds[stage][i] = end - start
+        if trigger.speed:
+            speeds.append(trigger.speed)
+    return seconds, speeds
+
+# Median / mean / p95 milliseconds of an array of per-frame seconds
+def summarize(seconds):
+    ms = 1000 * seconds
+    return {"median": float(np.median(ms)), "mean": float(ms.mean()), "p95": float(np.percentile(ms, 95))}
+
+def run_case(profile, capture_size, frames, speed, noise, repeats):
+    settings = rodent_settings(profile)
+    width, height = capture_size
+    body = (max(20, width // 20), max(10, height // 16))
+    raw_frames = [capture_frame(frame) for frame in
+                  add_noise(crossing_frames(frames, capture_size, speed, body, profile_color(profile)), noise)]
+    timestamps = [i / ANALYSIS_RATE for i in range(frames)]
+    runs = [time_stages(settings, raw_frames, timestamps) for _ in range(repeats)]
+    seconds = {stage: np.concatenate([run[0][stage] for run in runs]) for stage in STAGES}
+    speeds = runs[0][1]
+    # True speed in analysis pixels per second, with the rodent fully in view
+    true_speed = speed * (RESOLUTION[0] / width if RESOLUTION else 1) * ANALYSIS_RATE
+    return {
+        "profile": profile,
+        "capture_size": f"{width}x{height}",
+        "analysis_size": f"{RESOLUTION[0]}x{RESOLUTION[1]}" if RESOLUTION else f"{width}x{height}",
+        "frames": frames * repeats,
+        "stages_ms": {stage: summarize(seconds[stage]) for stage in STAGES},
+        "total_ms": summarize(sum(seconds.values())),
+        "true_speed": true_speed,
+        "median_speed": float(np.median(speeds)) if speeds else 0.0,
+    }
+
+# Stages whose median got slower than the baseline by more than threshold
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    previous = {(r["profile"], r["capture_size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["profile"], result["capture_size"]))
+        if before is None:
+            continue
+        for stage, stats in result["stages_ms"].items():
+            old = before["stages_ms"].get(stage, {}).get("median")
+            if old and stats["median"] > old * (1 + threshold):
+                regressions.append({"profile": result["profile"], "capture_size": result["capture_size"], "stage": stage,
+                                    "baseline_ms": old, "median_ms": stats["median"], "ratio": stats["median"] / old})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every stage of the tracking loop on synthetic side view frames")
+    parser.add_argument("--frames", type=int, default=100, help="Frames per case")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--sizes", nargs="+", default=CAPTURE_SIZES, help="Capture sizes as WIDTHxHEIGHT")
+    parser.add_argument("--profiles", nargs="+", default=list(RODENT_CONFIGS), choices=list(RODENT_CONFIGS), metavar="PROFILE")
+    parser.add_argument("--speed", type=float, default=12, help="Rodent speed in capture pixels per analyzed frame")
+    parser.add_argument("--noise", type=int, default=12, help="Per-pixel color noise")
+    parser.add_argument("--output", "-o", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier JSON results to check for stage regressions")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)  # Stable timings; the live loop analyzes one frame at a time
+    results = []
+    for size in args.sizes:
+        capture_size = tuple(int(n) for n in size.lower().split("x"))
+        for profile in args.profiles:
+            result = run_case(profile, capture_size, args.frames, args.speed, args.noise, args.repeats)
+            results.append(result)
+            stages = "  ".join(f"{stage} {result['stages_ms'][stage]['median']:.3f}" for stage in STAGES)
+            print(f"{size:>10s} {profile:22s} total {result['total_ms']['median']:6.3f} ms  ({stages})", file=sys.stderr)
+
+    report = {
+        "environment": {"python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__,
+                        "machine": platform.machine(), "system": platform.system(), "processor": platform.processor()},
+        "config": {"resolution": RESOLUTION, "analysis_rate": ANALYSIS_RATE, "frames": args.frames,
+                   "repeats": args.repeats, "speed": args.speed, "noise": args.noise},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["regressions"] = compare(results, json.load(f))
+        for regression in report["regressions"]:
+            print(f"Regression: {regression['capture_size']} {regression['profile']} {regression['stage']} "
+                  f"{regression['baseline_ms']:.3f} -> {regression['median_ms']:.3f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
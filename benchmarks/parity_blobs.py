@@ -0,0 +1,110 @@
+"""
+BLOB ENGINE PARITY
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import add_noise, crossing_frames
+from frame_sources import ArrayFrameSource, CaptureScheduler, open_frame_source
+from gait_pipeline import FRAME_SKIP, RESOLUTION, FrameSegmenter
+
+SETTINGS = {"MIN_AREA": 500, "LOWER_GREEN": [40, 50, 50], "UPPER_GREEN": [80, 255, 255], "VALUE_THRESHOLD": 180}
+
+# Run the contours and components engines over the same frames; returns a summary dict and the differing frames
+def compare_blob_engines(source, settings, resolution=RESOLUTION, frame_skip=FRAME_SKIP):
+    engines = {name: FrameSegmenter(settings, resolution, name) for name in ("contours", "components")}
+    seconds = dict.fromkeys(engines, 0.0)
+    scheduler = CaptureScheduler(source, frame_skip=frame_skip)
+    differences = []
+    frames = 0
+    while True:
+        frame = scheduler.next_frame()
+        if frame is None:
+            break
+        frames += 1
+        centroids = {}
+        for name, segmenter in engines.items():
+            start = time.perf_counter()
+            centroids[name] = segmenter.find_centroid(frame)
+            seconds[name] += time.perf_counter() - start
+        reference, candidate = centroids["contours"], centroids["components"]
+        if reference != candidate:
+            distance = None
+            if reference is not None and candidate is not None:
+                distance = float(np.hypot(reference[0] - candidate[0], reference[1] - candidate[1]))
+            differences.append({"time": source.timestamp, "contours": reference, "components": candidate, "distance": distance})
+
+    distances = [d["distance"] for d in differences if d["distance"] is not None]
+    summary = {
+        "frames": frames,
+        "differing_frames": len(differences),
+        "detection_mismatches": len(differences) - len(distances),
+        "max_distance": max(distances, default=0.0),
+        "mean_distance": float(np.mean(distances)) if distances else 0.0,
+        "ms_per_frame": {name: 1000 * s / max(1, frames) for name, s in seconds.items()},
+    }
+    return summary, differences
+
+# Show both engines single rodent-shaped blobs whose pixel count steps through MIN_AREA (ellipses of a fixed
+# height, one pixel longer each step); returns each size's pixel count, areas and whether each engine keeps it.
+# The components engine counts pixels, the contours engine measures the outline polygon, so the two disagree
+# on a band of sizes just above MIN_AREA.
+def compare_min_area(settings, resolution=RESOLUTION, steps=20):
+    engines = {name: FrameSegmenter(settings, resolution, name) for name in ("contours", "components")}
+    min_area = settings["MIN_AREA"]
+    half_height = max(2, round(np.sqrt(min_area / (2 * np.pi))))  # Half the height of a 2:1 ellipse of MIN_AREA
+    cases = []
+    for half_width in range(max(half_height, 2 * half_height - steps // 2), 2 * half_height + steps // 2):
+        mask = np.zeros((4 * half_height, 2 * half_width + 8), dtype=np.uint8)
+        cv2.ellipse(mask, (half_width + 4, 2 * half_height), (half_width, half_height), 0, 0, 360, 255, -1)
+        case = {"pixels": int(np.count_nonzero(mask))}
+        for name, segmenter in engines.items():
+            case[name] = segmenter.largest_blob(mask) is not None
+            case[f"{name}_area"] = segmenter.area
+        cases.append(case)
+    disagreeing = [case["pixels"] for case in cases if case["contours"] != case["components"]]
+    summary = {
+        "min_area": min_area,
+        "sizes": len(cases),
+        "disagreeing_sizes": len(disagreeing),
+        "disagreeing_pixels": [min(disagreeing), max(disagreeing)] if disagreeing else None,
+    }
+    return summary, cases
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report centroid differences between the contours and components blob engines")
+    parser.add_argument("recording", nargs="?", help="Video file, image directory or image glob (default: synthetic frames)")
+    parser.add_argument("--settings", help="Settings file saved by RGT (default: Black Rat profile)")
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--verbose", action="store_true", help="List every differing frame")
+    args = parser.parse_args()
+
+    settings = SETTINGS
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    if args.recording:
+        source, frame_skip = open_frame_source(args.recording, args.fps), FRAME_SKIP
+    else:
+        # Synthetic frames are generated already subsampled, so every one is analyzed
+        frames = add_noise(crossing_frames(120, (1280, 400), speed=12), 20)
+        source, frame_skip = ArrayFrameSource(frames), 1
+
+    with source:
+        summary, differences = compare_blob_engines(source, settings, frame_skip=frame_skip)
+    if args.verbose:
+        for difference in differences:
+            print(difference)
+    print(json.dumps(summary, indent=4))
+
+    boundary, cases = compare_min_area(settings)
+    if args.verbose:
+        for case in cases:
+            print(case)
+    print(json.dumps({"min_area_boundary": boundary}, indent=4))
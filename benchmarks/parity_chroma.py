@@ -0,0 +1,83 @@
+"""
+CHROMA KEY PARITY
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from benchmarks.synthetic import add_noise, crossing_frames, profile_color
+from frame_sources import ArrayFrameSource, CaptureScheduler, open_frame_source
+from gait_pipeline import (FRAME_SKIP, RESOLUTION, RODENT_CONFIGS, ChromaKeySegmenter, FrameSegmenter,
+                           chroma_key_parameters, rodent_settings)
+
+# Intersection over union of two masks; 1.0 when both are empty
+def iou(a, b):
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+# Run the HSV and chroma key engines over the same frames; returns a summary dict. The color masks
+# are compared before the morphology, the rodent masks after it, and the centroids at the end.
+def compare_chroma_key(source, settings, resolution=RESOLUTION, frame_skip=FRAME_SKIP):
+    hsv = FrameSegmenter(settings, resolution)
+    chroma = ChromaKeySegmenter(settings, resolution)
+    scheduler = CaptureScheduler(source, frame_skip=frame_skip)
+    color_ious, rodent_ious, distances = [], [], []
+    detection_mismatches = 0
+    while True:
+        frame = scheduler.next_frame()
+        if frame is None:
+            break
+        reference = hsv.downscale(frame)
+        candidate = chroma.downscale(frame)
+        hsv._allocate(reference.shape)
+        chroma._allocate(candidate.shape)
+        color_ious.append(iou(hsv.color_mask(reference) > 0, chroma.color_mask(candidate) > 0))
+        reference_mask = hsv.segment_region(reference)
+        candidate_mask = chroma.segment_region(candidate)
+        rodent_ious.append(iou(reference_mask > 0, candidate_mask > 0))
+        reference_blob = hsv.largest_blob(reference_mask)
+        candidate_blob = chroma.largest_blob(candidate_mask)
+        if (reference_blob is None) != (candidate_blob is None):
+            detection_mismatches += 1
+        elif reference_blob is not None:
+            a, b = hsv.blob_centroid(reference_blob), chroma.blob_centroid(candidate_blob)
+            distances.append(float(np.hypot(a[0] - b[0], a[1] - b[1])))
+
+    return {
+        "frames": len(color_ious),
+        "chroma_key": chroma_key_parameters(settings),
+        "color_mask_iou": {"mean": float(np.mean(color_ious)) if color_ious else 1.0, "min": min(color_ious, default=1.0)},
+        "rodent_mask_iou": {"mean": float(np.mean(rodent_ious)) if rodent_ious else 1.0, "min": min(rodent_ious, default=1.0)},
+        "detection_mismatches": detection_mismatches,
+        "max_distance": max(distances, default=0.0),
+        "mean_distance": float(np.mean(distances)) if distances else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the agreement (IoU) of the chroma key and HSV masks")
+    parser.add_argument("recording", nargs="?", help="Video file, image directory or image glob (default: synthetic frames)")
+    parser.add_argument("--settings", help="Settings file saved by RGT (default: every rodent profile)")
+    parser.add_argument("--fps", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.settings:
+        with open(args.settings, "r") as f:
+            profiles = {"settings": json.load(f)}
+    else:
+        profiles = {profile: rodent_settings(profile) for profile in RODENT_CONFIGS}
+
+    report = {}
+    for name, settings in profiles.items():
+        if args.recording:
+            source, frame_skip = open_frame_source(args.recording, args.fps), FRAME_SKIP
+        else:
+            # Synthetic frames are generated already subsampled, so every one is analyzed
+            color = profile_color(name) if name in RODENT_CONFIGS else profile_color("Black")
+            frames = add_noise(crossing_frames(120, (1280, 400), speed=12, color=color), 20)
+            source, frame_skip = ArrayFrameSource(frames), 1
+        with source:
+            report[name] = compare_chroma_key(source, settings, frame_skip=frame_skip)
+    print(json.dumps(report, indent=4))
@@ -0,0 +1,39 @@
+"""
+SYNTHETIC SIDE VIEW FRAMES
+"""
+
+import cv2
+import numpy as np
+
+GREEN_SCREEN_BGR = (40, 200, 40)  # Hue 60, inside every RODENT_CONFIGS green range
+RODENT_BGR = (25, 25, 25)
+# Coat colors by the first word of a RODENT_CONFIGS profile, each darker than that profile's VALUE_THRESHOLD
+COAT_BGR = {"Black": RODENT_BGR, "White": (115, 115, 120), "Brown": (40, 70, 110)}
+
+# One side view frame with a dark elliptical rodent (and thin tail) centred at x
+def side_view_frame(x, size=(640, 480), body=(60, 30), color=RODENT_BGR):
+    width, height = size
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[:] = GREEN_SCREEN_BGR
+    y = height // 2
+    cv2.ellipse(frame, (int(x), y), body, 0, 0, 360, color, -1)
+    cv2.line(frame, (int(x) - body[0], y), (int(x) - 2 * body[0], y + body[1] // 2), color, 2)
+    return frame
+
+# Frames of the rodent crossing the side view at speed pixels per frame
+def crossing_frames(count, size=(640, 480), speed=2.0, body=(60, 30), color=RODENT_BGR):
+    return [side_view_frame(-body[0] + i * speed, size, body, color) for i in range(count)]
+
+# Coat color to draw for a RODENT_CONFIGS profile name
+def profile_color(profile):
+    return COAT_BGR.get(profile.split()[0], RODENT_BGR)
+
+# Copies of frames with uniform per-pixel noise of +/- amount
+def add_noise(frames, amount, seed=0):
+    rng = np.random.default_rng(seed)
+    return [np.clip(frame.astype(np.int16) + rng.integers(-amount, amount + 1, frame.shape), 0, 255).astype(np.uint8)
+            for frame in frames]
+
+# Raw 4-channel screen grab that the live capture conversion (COLOR_RGBA2BGR) turns back into frame
+def capture_frame(frame):
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
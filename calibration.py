@@ -0,0 +1,145 @@
+"""
+ARENA CALIBRATION
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from arenas import arena_region, arena_settings, region_window, union_region
+from frame_sources import CroppedFrameSource, MssFrameSource, open_frame_source
+from gait_pipeline import FrameSegmenter
+
+# CONFIGURATION
+CALIBRATION = True  # Crop and mask live side views with the saved calibration of their coordinates
+CALIBRATION_FILE = "calibration.npz"  # Saved calibrations, next to coordinates.json
+CALIBRATION_FRAMES = 10  # Empty-arena frames to learn from
+CALIBRATION_INTERVAL = 0.2  # Seconds between live calibration grabs
+CALIBRATION_MARGIN = 12  # Side view pixels kept around the green screen, for the rodent's outline and feet
+CALIBRATION_EDGE = 3  # Side view pixels also dropped around static rodent-colored objects (anti-aliased edges)
+
+
+
+# MASKS
+
+# Calibrations are keyed to an arena's coordinates, green range and VALUE_THRESHOLD (which decides
+# the static objects left out), so new coordinates or another profile never pick up a stale mask
+def calibration_key(settings):
+    key = [list(map(int, settings["top_left"])), list(map(int, settings["bottom_right"])),
+           list(map(int, settings["LOWER_GREEN"])), list(map(int, settings["UPPER_GREEN"])),
+           int(settings["VALUE_THRESHOLD"])]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()[:16]
+
+# Where the rodent can appear, learned from side views of the empty arena. The rodent is only seen
+# against the green screen, so pixels further than margin from any green are left out (frame borders,
+# walls above the walkway); so is anything the profile's color mask already calls rodent in most of
+# the empty frames (dark overlays, fixtures), grown by edge. Returns a uint8 mask (255 = rodent
+# possible) at side view size.
+def learn_calibration(frames, settings, margin=CALIBRATION_MARGIN, edge=CALIBRATION_EDGE):
+    if not frames:
+        raise ValueError("No calibration frames")
+    lower_green = np.array(settings["LOWER_GREEN"], np.uint8)
+    upper_green = np.array(settings["UPPER_GREEN"], np.uint8)
+    segmenter = FrameSegmenter(settings, resolution=None)
+    green = np.zeros(frames[0].shape[:2], np.uint8)
+    static = np.zeros(frames[0].shape[:2], np.uint16)  # Frames in which each pixel looked like rodent
+    for frame in frames:
+        segmenter._allocate(frame.shape)
+        cv2.bitwise_or(green, cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), lower_green, upper_green), dst=green)
+        static += segmenter.color_mask(frame) > 0
+    if not cv2.countNonZero(green):
+        raise ValueError(f"{settings.get('name', 'Side view')}: no green screen found in the calibration frames")
+    allowed = cv2.dilate(green, cv2.getStructuringElement(cv2.MORPH_RECT, (2 * margin + 1,) * 2))
+    excluded = np.where(2 * static > len(frames), 255, 0).astype(np.uint8)
+    excluded = cv2.dilate(excluded, cv2.getStructuringElement(cv2.MORPH_RECT, (2 * edge + 1,) * 2))
+    return cv2.bitwise_and(allowed, cv2.bitwise_not(excluded))
+
+# Saved calibration of an arena's coordinates, or None
+def load_calibration(settings, path=CALIBRATION_FILE):
+    if not os.path.exists(path):
+        return None
+    try:
+        key = calibration_key(settings)
+        with np.load(path) as saved:
+            if f"mask_{key}" not in saved.files:
+                return None
+            return np.unpackbits(saved[f"mask_{key}"], axis=1, count=saved[f"width_{key}"].item()) * 255
+    except Exception as e:
+        print(f"Error loading calibration {path}: {e}")
+        return None
+
+# Add (or replace) the calibration of an arena's coordinates, keeping the others
+def save_calibration(settings, mask, path=CALIBRATION_FILE):
+    saved = {}
+    if os.path.exists(path):
+        with np.load(path) as f:
+            saved = {name: f[name] for name in f.files}
+    key = calibration_key(settings)
+    saved[f"mask_{key}"] = np.packbits(mask > 0, axis=1)
+    saved[f"width_{key}"] = np.array(mask.shape[1])
+    np.savez_compressed(path, **saved)
+
+# Band and masked share of a calibration, for printing
+def describe_calibration(mask):
+    height, width = mask.shape
+    x, y, w, h = cv2.boundingRect(mask)
+    inside = mask[y:y + h, x:x + w]
+    return (f"band {w}x{h} at ({x}, {y}) of {width}x{height} ({100 * w * h / (width * height):.0f}% of the side view), "
+            f"{100 * (1 - cv2.countNonZero(inside) / max(1, w * h)):.0f}% of the band masked")
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn where the rodent can appear from frames of the empty arena(s)")
+    parser.add_argument("recording", nargs="?", help="Recording of the empty screen to learn from (default: live screen capture)")
+    parser.add_argument("--settings", default="rgt_settings.json", help="Settings file saved by RGT (default: rgt_settings.json)")
+    parser.add_argument("--coordinates", default="coordinates.json", help="Coordinates file, if the settings have none (default: coordinates.json)")
+    parser.add_argument("--arenas", default="arenas.json", help="Arenas file, used when it exists (default: arenas.json)")
+    parser.add_argument("--frames", type=int, default=CALIBRATION_FRAMES, help=f"Frames to learn from (default: {CALIBRATION_FRAMES})")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the recording (default: from the file)")
+    args = parser.parse_args()
+
+    with open(args.settings, "r") as f:
+        settings = json.load(f)
+    if os.path.exists(args.arenas):
+        with open(args.arenas, "r") as f:
+            settings["arenas"] = json.load(f)
+    elif "top_left" not in settings:
+        with open(args.coordinates, "r") as f:
+            settings.update(json.load(f))
+    arenas = arena_settings(settings)
+    region = union_region([arena_region(arena) for arena in arenas])
+    left, top, width, height = region
+
+    if args.recording:
+        source = CroppedFrameSource(open_frame_source(args.recording, args.fps), region)
+    else:
+        source = MssFrameSource({"top": top, "left": left, "width": width, "height": height})
+        print(f"Grabbing {args.frames} frames; keep the arena(s) empty")
+    grabs = []
+    with source:
+        while len(grabs) < args.frames:
+            grab = source.read()
+            if grab is None:
+                break
+            grabs.append(grab.copy())
+            if source.live:
+                time.sleep(CALIBRATION_INTERVAL)
+    if not grabs:
+        parser.error("No frames to learn from")
+
+    for arena in arenas:
+        window = region_window(arena_region(arena), region)
+        mask = learn_calibration([grab[window] for grab in grabs], arena)
+        save_calibration(arena, mask)
+        print(f"{arena['name']}: {describe_calibration(mask)}")
+    print(f"Calibration of {len(arenas)} arena(s) from {len(grabs)} frames saved to {CALIBRATION_FILE}")
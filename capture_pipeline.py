@@ -0,0 +1,172 @@
+"""
+CAPTURE PIPELINE
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+# Queue policies when analysis falls behind capture
+DROP_OLDEST = "drop_oldest"  # Overwrite the oldest queued frame; capture never waits
+BLOCK = "block"  # Capture waits for analysis to free a buffer
+
+FRAME_POOL_SIZE = 4  # Preallocated frame buffers shared by capture and analysis
+QUEUE_POLICY = DROP_OLDEST  # Policy for live capture; recorded sources always block so no frame is lost
+
+
+
+# Producer thread grabs frames from a CaptureScheduler into a fixed pool of preallocated
+# buffers; the analysis loop takes them in order through get() and hands them back with release().
+# With threaded=False, get() grabs inline so both modes share the same calling code.
+class FramePipeline:
+    def __init__(self, scheduler, pool_size=FRAME_POOL_SIZE, policy=None, threaded=True):
+        if policy is None:
+            policy = QUEUE_POLICY if scheduler.source.live else BLOCK
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.scheduler = scheduler
+        self.pool_size = max(2, pool_size)
+        self.policy = policy
+        self.threaded = threaded
+
+        self.buffers = None  # Allocated once the first frame's shape is known
+        self.timestamps = [0.0] * self.pool_size
+        self.free = deque(range(self.pool_size))
+        self.ready = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.exhausted = False
+        self.thread = None
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_analyzed = 0
+        self.max_queue_depth = 0
+        self.stage_seconds = {"capture": 0.0}  # Cumulative seconds per stage
+
+    def start(self):
+        self.running = True
+        if self.threaded:
+            self.thread = threading.Thread(target=self._produce, name="RGT capture", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _allocate(self, frame):
+        self.buffers = [np.empty_like(frame) for _ in range(self.pool_size)]
+
+    # Grab one frame into a free slot; returns the slot, or None once the source is exhausted
+    def _capture(self, slot):
+        grab_before = self.scheduler.grab_seconds
+        if self.buffers is None:
+            frame = self.scheduler.next_frame()
+            if frame is None:
+                return None
+            self._allocate(frame)
+            np.copyto(self.buffers[slot], frame)
+        else:
+            frame = self.scheduler.next_frame(out=self.buffers[slot])
+            if frame is None:
+                return None
+            if frame is not self.buffers[slot]:
+                # The source returned its own array (e.g. cvtColor reallocates a dst of the wrong shape)
+                if frame.shape == self.buffers[slot].shape and frame.dtype == self.buffers[slot].dtype:
+                    np.copyto(self.buffers[slot], frame)
+                else:
+                    # The frame size changed: this slot takes the new size; the others follow as they are reused
+                    self.buffers[slot] = frame.copy()
+        # Grab/convert time only, not the scheduler's pacing sleep
+        self.stage_seconds["capture"] += self.scheduler.grab_seconds - grab_before
+        self.timestamps[slot] = self.scheduler.source.timestamp
+        self.frames_captured += 1
+        return slot
+
+    def _take_free_slot(self):
+        with self.condition:
+            while self.running:
+                if self.free:
+                    return self.free.popleft()
+                if self.policy == DROP_OLDEST and self.ready:
+                    self.frames_dropped += 1
+                    return self.ready.popleft()
+                self.condition.wait(0.1)
+        return None
+
+    def _produce(self):
+        while self.running:
+            slot = self._take_free_slot()
+            if slot is None:
+                break
+            if self._capture(slot) is None:
+                with self.condition:
+                    self.free.append(slot)
+                    self.exhausted = True
+                    self.condition.notify_all()
+                break
+            with self.condition:
+                self.ready.append(slot)
+                self.max_queue_depth = max(self.max_queue_depth, len(self.ready))
+                self.condition.notify_all()
+
+    # Next frame to analyze as (slot, frame, capture timestamp). Returns None if no frame arrived
+    # within timeout; check exhausted to tell a slow source from the end of a recording.
+    def get(self, timeout=0.05):
+        if not self.threaded:
+            slot = self.free.popleft()
+            if self._capture(slot) is None:
+                self.free.append(slot)
+                self.exhausted = True
+                return None
+            return slot, self.buffers[slot], self.timestamps[slot]
+        with self.condition:
+            if not self.ready and not self.exhausted:
+                self.condition.wait(timeout)
+            if not self.ready:
+                return None
+            slot = self.ready.popleft()
+            return slot, self.buffers[slot], self.timestamps[slot]
+
+    # Return a slot to the pool once its frame has been analyzed
+    def release(self, slot):
+        with self.condition:
+            self.frames_analyzed += 1
+            self.free.append(slot)
+            self.condition.notify_all()
+
+    # Add time spent in an analysis stage (e.g. "segmentation", "trigger", "gui")
+    def record(self, stage, seconds):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def queue_depth(self):
+        return len(self.ready)
+
+    # Mean milliseconds per frame for each stage
+    def stage_ms(self):
+        stage_ms = {}
+        for stage, seconds in self.stage_seconds.items():
+            frames = self.frames_captured if stage == "capture" else self.frames_analyzed
+            stage_ms[stage] = 1000 * seconds / max(1, frames)
+        return stage_ms
+
+    def stats(self):
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+            "frames_analyzed": self.frames_analyzed,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+            "stage_ms": self.stage_ms(),
+        }
+
+    def report(self):
+        stages = ", ".join(f"{stage} {ms:.2f}" for stage, ms in self.stage_ms().items())
+        return (f"Captured {self.frames_captured} frames, dropped {self.frames_dropped} "
+                f"(max queue depth {self.max_queue_depth}); ms/frame: {stages}")
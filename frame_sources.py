@@ -0,0 +1,315 @@
+"""
+FRAME SOURCES
+"""
+
+import glob
+import os
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from gait_pipeline import ANALYSIS_RATE, FRAME_RATE, FRAME_SKIP, area_resize
+from instrumentation import NULL_METRICS
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+RATE_WINDOW = 120  # Latest capture times kept for CaptureScheduler.recent_rate()
+
+
+
+# CLOCKS
+
+# Wall clock, used for live capture
+class RealClock:
+    def time(self):
+        return time.time()
+
+# Clock that follows the timestamp of the last frame read from a source,
+# so recorded sessions replay as fast as the CPU allows
+class VirtualClock:
+    def __init__(self, source):
+        self.source = source
+
+    def time(self):
+        return self.source.timestamp
+
+
+
+# SOURCES
+
+# Base class: read() returns the next BGR frame, or None once the source is exhausted
+class FrameSource:
+    timestamp = 0.0
+    live = False  # Live sources are paced in real time, recorded ones are skipped through
+    metrics = NULL_METRICS  # Stage timers (grab, convert) when instrumentation is on
+
+    def read(self):
+        raise NotImplementedError
+
+    # Read the next frame into a preallocated buffer of the same shape. Returns out, or a new array
+    # when the frame no longer has out's shape (callers check which they got)
+    def read_into(self, out):
+        frame = self.read()
+        if frame is None or frame.shape != out.shape:
+            return frame
+        np.copyto(out, frame)
+        return out
+
+    # Advance past count frames without decoding them; returns False once the source is exhausted
+    def skip(self, count):
+        for _ in range(count):
+            if self.read() is None:
+                return False
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+# Live screen capture of the PFV4 side view
+class MssFrameSource(FrameSource):
+    live = True
+
+    # decimation > 1 shrinks the raw screenshot by that factor (area averaging) before the color
+    # conversion, so neither the conversion nor anything after it sees the full resolution. With raw,
+    # frames are the 4-channel screenshot itself, unconverted (for a segmenter that reads_raw_capture).
+    # Without sct, the mss instance is opened on the first grab: mss keeps its handles per thread, so
+    # it has to be opened by the thread that grabs (the capture thread of a FramePipeline).
+    def __init__(self, monitor, sct=None, decimation=1, raw=False):
+        self.owns_sct = sct is None
+        self.sct = sct
+        self.monitor = monitor
+        self.decimation = decimation
+        self.decimated = None
+        self.raw = raw
+
+    # Wrap the raw BGRA screenshot without copying it
+    def _grab(self):
+        if self.sct is None:
+            import mss
+            self.sct = mss.mss()
+        start = self.metrics.clock()
+        shot = self.sct.grab(self.monitor)
+        self.timestamp = time.time()
+        raw = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        self.metrics.lap("grab", start)
+        if self.decimation > 1:
+            start = self.metrics.clock()
+            size = (max(1, shot.width // self.decimation), max(1, shot.height // self.decimation))
+            if self.decimated is None or self.decimated.shape[:2] != size[::-1]:
+                self.decimated = np.empty((size[1], size[0], 4), np.uint8)
+            raw = area_resize(raw, size, dst=self.decimated)
+            self.metrics.lap("decimate", start)  # Capture thread stage, apart from the analysis "resize"
+        return raw
+
+    def read(self):
+        raw = self._grab()
+        start = self.metrics.clock()
+        frame = raw.copy() if self.raw else cv2.cvtColor(raw, cv2.COLOR_RGBA2BGR)
+        self.metrics.lap("convert", start)
+        return frame
+
+    def read_into(self, out):
+        raw = self._grab()
+        start = self.metrics.clock()
+        if self.raw:
+            if raw.shape == out.shape:
+                np.copyto(out, raw)
+                frame = out
+            else:
+                frame = raw.copy()  # The monitor changed size
+        else:
+            frame = cv2.cvtColor(raw, cv2.COLOR_RGBA2BGR, dst=out)
+        self.metrics.lap("convert", start)
+        return frame
+
+    def close(self):
+        if self.owns_sct and self.sct is not None:
+            self.sct.close()
+            self.sct = None
+
+# Recorded video file; timestamps come from the frame index and the video frame rate
+class VideoFileFrameSource(FrameSource):
+    def __init__(self, path, fps=None):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open video {path}")
+        self.fps = fps or self.capture.get(cv2.CAP_PROP_FPS) or FRAME_RATE
+        self.index = 0
+
+    def read(self):
+        ok, frame = self.capture.read()
+        if not ok:
+            return None
+        self.timestamp = self.index / self.fps
+        self.index += 1
+        return frame
+
+    def skip(self, count):
+        for _ in range(count):
+            if not self.capture.grab():  # Demux only, no decode
+                return False
+            self.index += 1
+        return True
+
+    def close(self):
+        self.capture.release()
+
+# Directory (or glob pattern) of still images, read in sorted order
+class ImageSequenceFrameSource(FrameSource):
+    def __init__(self, path, fps=FRAME_RATE):
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            files = glob.glob(path)
+        self.files = sorted(files)
+        if not self.files:
+            raise IOError(f"No images found at {path}")
+        self.fps = fps
+        self.index = 0
+
+    def read(self):
+        while self.index < len(self.files):
+            frame = cv2.imread(self.files[self.index], cv2.IMREAD_COLOR)
+            self.timestamp = self.index / self.fps
+            self.index += 1
+            if frame is not None:
+                return frame
+            print(f"Skipping unreadable image {self.files[self.index - 1]}")
+        return None
+
+    def skip(self, count):
+        self.index += count
+        return self.index < len(self.files)
+
+# In-memory frames (a list or an N x H x W x C array), BGR or raw 4-channel mss grabs
+# (converted the same way as live capture)
+class ArrayFrameSource(FrameSource):
+    def __init__(self, frames, fps=FRAME_RATE):
+        self.frames = frames
+        self.fps = fps
+        self.index = 0
+
+    def read(self):
+        if self.index >= len(self.frames):
+            return None
+        frame = self.frames[self.index]
+        self.timestamp = self.index / self.fps
+        self.index += 1
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+        return frame
+
+    def skip(self, count):
+        self.index += count
+        return self.index < len(self.frames)
+
+# Crops every frame of another source to a region (x, y, width, height); frames are views, not copies
+class CroppedFrameSource(FrameSource):
+    def __init__(self, source, region):
+        self.source = source
+        self.live = source.live
+        x, y, width, height = region
+        self.window = (slice(y, y + height), slice(x, x + width))
+
+    @property
+    def timestamp(self):
+        return self.source.timestamp
+
+    def read(self):
+        frame = self.source.read()
+        return None if frame is None else frame[self.window]
+
+    def skip(self, count):
+        return self.source.skip(count)
+
+    def close(self):
+        self.source.close()
+
+# Pick a recorded source for a path: image directories/globs or a video file
+def open_frame_source(path, fps=None):
+    if os.path.isdir(path) or any(ch in path for ch in "*?["):
+        return ImageSequenceFrameSource(path, fps or FRAME_RATE)
+    return VideoFileFrameSource(path, fps)
+
+
+
+# CAPTURE SCHEDULING
+
+# Hands out only the frames that will be analyzed. Live sources are grabbed at target_hz,
+# sleeping between grabs; recorded sources skip frame_skip - 1 frames without decoding them.
+class CaptureScheduler:
+    def __init__(self, source, target_hz=ANALYSIS_RATE, frame_skip=FRAME_SKIP, rate_window=RATE_WINDOW):
+        self.source = source
+        self.target_hz = target_hz
+        self.period = 1.0 / target_hz
+        self.frame_skip = frame_skip
+        self.next_due = None
+        self.frames = 0  # Frames handed out so far
+        self.first_timestamp = None  # Capture time of the first of them
+        self.last_timestamp = None  # and of the latest
+        self.recent = deque(maxlen=rate_window)  # Capture times of the latest frames
+        self.grab_seconds = 0.0  # Time spent grabbing/skipping/decoding, excluding pacing sleeps
+        self.slots_skipped = 0  # Live capture slots that passed without a grab because the caller fell behind
+
+    # Returns the next frame to analyze (written into out if given), or None once the source is exhausted
+    def next_frame(self, out=None):
+        if self.source.live:
+            now = time.perf_counter()
+            if self.next_due is None:
+                self.next_due = now
+            delay = self.next_due - now
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                self.slots_skipped += int(-delay / self.period)
+                self.next_due = now  # Fell behind; don't burst to catch up
+            self.next_due += self.period
+        start = time.perf_counter()
+        if not self.source.live and not self.source.skip(self.frame_skip - 1):
+            return None
+        frame = self.source.read() if out is None else self.source.read_into(out)
+        self.grab_seconds += time.perf_counter() - start
+        if frame is not None:
+            timestamp = self.source.timestamp
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp
+            self.last_timestamp = timestamp
+            self.recent.append(timestamp)
+            self.frames += 1
+        return frame
+
+    # Change the live capture rate, e.g. to slow down while nothing is moving
+    def set_rate(self, target_hz):
+        self.target_hz = target_hz
+        self.period = 1.0 / target_hz
+
+    # Frames per second over the whole session
+    def achieved_rate(self):
+        if self.frames < 2 or self.last_timestamp <= self.first_timestamp:
+            return 0.0
+        return (self.frames - 1) / (self.last_timestamp - self.first_timestamp)
+
+    # Frames per second over the latest rate_window frames
+    def recent_rate(self):
+        if len(self.recent) < 2 or self.recent[-1] <= self.recent[0]:
+            return 0.0
+        return (len(self.recent) - 1) / (self.recent[-1] - self.recent[0])
+
+    def report(self):
+        return (f"Analyzed {self.frames} frames at {self.achieved_rate():.1f} Hz, {self.recent_rate():.1f} Hz over the last "
+                f"{len(self.recent)} (target {self.target_hz:.1f} Hz)")
@@ -0,0 +1,912 @@
+"""
+GAIT PIPELINE
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from instrumentation import NULL_METRICS
+from speed_estimation import AlphaBetaFilter, RollingSpeedWindow
+
+# CONFIGURATION
+# Camera
+FRAME_RATE = 500  # Photron camera frame rate
+FRAME_SKIP = 25  # Determines fps (FRAME_RATE/FRAME_SKIP)
+RESOLUTION = (640, 480)  # Downscale resolution (set to None for original)
+DOWNSCALE = "resize"  # "resize" (stretch every side view to RESOLUTION) or "pyramid" (keep the aspect ratio, area decimation from the raw capture)
+DOWNSCALE_MIN_AREA = 150  # "pyramid": pixels a rodent of the profile's MIN_AREA must still cover at the chosen scale
+DOWNSCALE_MAX_FACTOR = 8  # "pyramid": largest decimation factor
+ANALYSIS_RATE = FRAME_RATE / FRAME_SKIP  # Frames analyzed per second (Hz) during live capture
+REUSE_BUFFERS = True  # Segment into buffers allocated once per session instead of per frame
+SEGMENTATION_ENGINE = "hsv"  # "hsv" (OpenCV HSV conversion), "lut" (precompiled color lookup table; pays off on downscaled frames only) or "chroma" (channel comparisons on the raw capture)
+BLOB_ENGINE = "contours"  # "contours" (erode/dilate + findContours) or "components" (single erode/dilate + connectedComponentsWithStats)
+CENTROID_METHOD = "bbox"  # "bbox" (integer bounding box centre) or "moments" (sub-pixel image moments centroid)
+ERODE_ITERATIONS = 5  # 3x3 erosions that remove the tail
+DILATE_ITERATIONS = 2  # 3x3 dilations that restore the body afterwards
+LUT_CACHE_DIR = "lut_cache"  # Directory for compiled lookup tables, keyed by a hash of the profile
+ROI_TRACKING = True  # Segment only a window around the last detected rodent
+ROI_MARGIN = 24  # Pixels added around the last bounding rectangle
+ROI_LEAD = 2.0  # Extra window ahead of the rodent, in multiples of its last per-frame displacement
+ROI_MAX_MISSES = 1  # Consecutive window misses before falling back to a full-frame search
+MOTION_GATING = True  # Reuse the last result while a small grayscale copy of the side view is unchanged
+MOTION_CELL = 8  # Side view pixels (each way) averaged into one pixel of the copy compared between frames
+MOTION_PIXEL_DELTA = 12  # Gray level change that counts a pixel of the copy as changed
+MOTION_MIN_AREA = 64  # Side view area (pixels) whose copy pixels must change to count as motion
+MOTION_REFRESH = 20  # Frames a result can be reused before segmenting again anyway
+MOTION_IDLE_RATE = 5  # Live capture rate (Hz) while every arena is idle (None: always ANALYSIS_RATE)
+# Speed/tracking
+SPEED_ESTIMATOR = "frame_rate"  # "frame_rate" (dx * FRAME_RATE / FRAME_SKIP) or "filtered" (alpha-beta filter on capture timestamps)
+SPEED_RANGE_PERCENT = 50  # 50% range for speed trigger
+IN_RANGE_DURATION = 0.5  # Seconds to maintain speed range before click
+SPEED_WINDOW = "in_range_duration"  # Seconds of speeds checked against the range ("in_range_duration": the duration in use, None: the last SPEEDS_CAP entries only)
+SPEEDS_CAP = 30  # Max entries for speeds
+MAX_SPEED = 4000  # Speeds at or above this (px/s) are detection glitches and discarded
+
+
+
+"""
+FUNCTIONS
+"""
+
+# RODENT PROFILES
+
+RODENT_CONFIGS = {
+    "Black Rat": {
+        "MIN_AREA": 500, # Minimum contour area for mouse
+        "LOWER_GREEN": np.array([40, 50, 50]), # HSV range for green screen
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 180, # Max Value (HSV) to exclude lighter tail
+        "MIN_CLICK_INTERVAL": 4  # Minimum seconds between clicks
+    },
+    "White Rat": {
+        "MIN_AREA": 500,
+        "LOWER_GREEN": np.array([40, 50, 50]),
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 150,
+        "MIN_CLICK_INTERVAL": 4
+    },
+    "Black and White Rat": {
+        "MIN_AREA": 500,
+        "LOWER_GREEN": np.array([40, 50, 50]),
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 180,
+        "MIN_CLICK_INTERVAL": 4
+    },
+    "Brown Rat": {
+        "MIN_AREA": 500,
+        "LOWER_GREEN": np.array([35, 50, 50]),
+        "UPPER_GREEN": np.array([85, 255, 255]),
+        "VALUE_THRESHOLD": 170,
+        "MIN_CLICK_INTERVAL": 4
+    },
+    "Black Mouse": {
+        "MIN_AREA": 200,
+        "LOWER_GREEN": np.array([40, 50, 50]),
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 180,
+        "MIN_CLICK_INTERVAL": 2.5
+    },
+    "White Mouse": {
+        "MIN_AREA": 200,
+        "LOWER_GREEN": np.array([40, 50, 50]),
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 150,
+        "MIN_CLICK_INTERVAL": 2.5
+    },
+    "Brown Mouse": {
+        "MIN_AREA": 200,
+        "LOWER_GREEN": np.array([35, 50, 50]),
+        "UPPER_GREEN": np.array([85, 255, 255]),
+        "VALUE_THRESHOLD": 170,
+        "MIN_CLICK_INTERVAL": 2.5
+    },
+    "Black and White Mouse": {
+        "MIN_AREA": 200,
+        "LOWER_GREEN": np.array([40, 50, 50]),
+        "UPPER_GREEN": np.array([80, 255, 255]),
+        "VALUE_THRESHOLD": 180,
+        "MIN_CLICK_INTERVAL": 2.5
+    }
+}
+
+# Settings for a rodent profile in the JSON-friendly form saved to rgt_settings.json
+def rodent_settings(rodent):
+    config = RODENT_CONFIGS[rodent]
+    return {
+        "MIN_AREA": config["MIN_AREA"],
+        "LOWER_GREEN": config["LOWER_GREEN"].tolist(),
+        "UPPER_GREEN": config["UPPER_GREEN"].tolist(),
+        "VALUE_THRESHOLD": config["VALUE_THRESHOLD"],
+        "MIN_CLICK_INTERVAL": config["MIN_CLICK_INTERVAL"],
+    }
+
+
+
+# SEGMENTATION
+
+# Find the rodent centroid in a BGR side view frame, or None if no rodent is found
+def find_centroid(side_view, settings, resolution=RESOLUTION):
+    # Downscale side_view if specified
+    if resolution:
+        side_view = cv2.resize(side_view, resolution)
+
+    # Green screen segmentation on side view
+    hsv = cv2.cvtColor(side_view, cv2.COLOR_BGR2HSV)
+    lower_green = np.array(settings["LOWER_GREEN"], dtype=np.uint8)
+    upper_green = np.array(settings["UPPER_GREEN"], dtype=np.uint8)
+    mask = cv2.inRange(hsv, lower_green, upper_green)
+    mask = cv2.bitwise_not(mask)  # Invert to keep mouse
+    # Filter out lighter tail based on Value channel
+    value_mask = cv2.inRange(hsv[:, :, 2], 0, settings["VALUE_THRESHOLD"])
+    mask = cv2.bitwise_and(mask, value_mask)
+    # Morphological operations to remove tail
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv2.erode(mask, kernel, iterations=5)  # Aggressive erosion for thin tail
+    mask = cv2.dilate(mask, kernel, iterations=2)  # Restore body shape
+
+    # Find mouse contour and centroid in side view
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    centroid = None
+    if contours:
+        largest = max(contours, key=cv2.contourArea)
+        area = cv2.contourArea(largest)
+        if area > settings["MIN_AREA"]:
+            x, y, w, h = cv2.boundingRect(largest)
+            centroid = (x + w//2, y + h//2)
+            # Uncomment if you want to see the window showing the green box around the rat (1/2)
+            # cv2.rectangle(side_view, (x, y), (x+w, y+h), (0, 255, 0), 2)
+    return centroid
+
+# Same segmentation as find_centroid(), but every stage writes into buffers allocated once
+# per session (and again only if a larger frame or region arrives), so the hot loop doesn't allocate
+class FrameSegmenter:
+    metrics = NULL_METRICS  # Stage timers (resize, segment, morph, contour) when instrumentation is on
+    area = 0.0  # Pixel area of the largest blob in the last mask searched, whether or not it passed MIN_AREA
+    reads_raw_capture = False  # Segments raw 4-channel screen grabs, so live capture can skip the color conversion
+
+    def __init__(self, settings, resolution=RESOLUTION, blob_engine=BLOB_ENGINE, centroid_method=CENTROID_METHOD,
+                 erode_iterations=ERODE_ITERATIONS, dilate_iterations=DILATE_ITERATIONS, calibration=None,
+                 interpolation=cv2.INTER_LINEAR):
+        if blob_engine not in ("contours", "components"):
+            raise ValueError(f"Unknown blob engine: {blob_engine}")
+        if centroid_method not in ("bbox", "moments"):
+            raise ValueError(f"Unknown centroid method: {centroid_method}")
+        self.resolution = resolution
+        self.blob_engine = blob_engine
+        self.centroid_method = centroid_method
+        self.min_area = settings["MIN_AREA"]
+        self.lower_green = np.array(settings["LOWER_GREEN"], dtype=np.uint8)
+        self.upper_green = np.array(settings["UPPER_GREEN"], dtype=np.uint8)
+        # Value-only range as a 3-channel bound, so no per-frame copy of the V plane is needed
+        self.lower_value = np.array([0, 0, 0], dtype=np.uint8)
+        self.upper_value = np.array([255, 255, settings["VALUE_THRESHOLD"]], dtype=np.uint8)
+        self.kernel = np.ones((3, 3), np.uint8)
+        self.erode_iterations = erode_iterations
+        self.dilate_iterations = dilate_iterations
+        # erode xN / dilate xM with the 3x3 kernel, as one pass each with a (2N+1)^2 / (2M+1)^2 element
+        self.erode_element = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * erode_iterations + 1,) * 2)
+        self.dilate_element = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * dilate_iterations + 1,) * 2)
+        self.interpolation = interpolation
+        self.storage = {}
+        self.region_shape = None
+        self.resized = None
+        # Static arena calibration (see calibration.py): 255 where the rodent can appear, at side view size.
+        # Frames are cropped to the band enclosing it, and the rest is painted as green screen.
+        self.calibration = calibration
+        self.band = None  # (y0, y1, x0, x1) of the band in the downscaled side view
+        self.calibration_shape = None  # Side view size the band was computed for
+        self.offset = (0, 0)  # Band origin, added to every centroid
+        self.background = np.array(settings["LOWER_GREEN"], np.uint16) + settings["UPPER_GREEN"]  # Centre of the green range (HSV)
+
+    # Contiguous buffer of the given shape carved from storage that only ever grows
+    def _buffer(self, name, shape, dtype=np.uint8):
+        size = int(np.prod(shape))
+        flat = self.storage.get(name)
+        if flat is None or flat.size < size:
+            flat = self.storage[name] = np.empty(size, dtype)
+        return flat[:size].reshape(shape)
+
+    def _allocate(self, region_shape):
+        self.region_shape = region_shape
+        height, width = region_shape[:2]
+        self.hsv = self._buffer("hsv", (height, width, 3))
+        self.mask = self._buffer("mask", (height, width))
+        self.value_mask = self._buffer("value_mask", (height, width))
+        self.eroded = self._buffer("eroded", (height, width))
+
+    # Downscale side_view if specified, then crop and mask it to the calibrated band if there is one
+    def downscale(self, side_view):
+        if not self.resolution:
+            return side_view if self.calibration is None else self.apply_calibration(side_view, copy=True)
+        if self.resized is None or self.resized.shape[2] != side_view.shape[2]:
+            width, height = self.resolution
+            self.resized = np.empty((height, width, side_view.shape[2]), np.uint8)
+        start = self.metrics.clock()
+        if self.interpolation == cv2.INTER_AREA:
+            resized = area_resize(side_view, self.resolution, dst=self.resized)
+        else:
+            resized = cv2.resize(side_view, self.resolution, dst=self.resized, interpolation=self.interpolation)
+        if self.calibration is not None:
+            resized = self.apply_calibration(resized)
+        self.metrics.lap("resize", start)
+        return resized
+
+    # The band of image (a view, or a copy when image is the caller's frame), with every pixel
+    # outside the calibrated mask set to green screen so no segmentation path can find a blob there
+    def apply_calibration(self, image, copy=False):
+        if image.shape[:2] != self.calibration_shape:
+            self._prepare_calibration(image.shape)
+        y0, y1, x0, x1 = self.band
+        band = image[y0:y1, x0:x1]
+        if copy:
+            band = self._buffer("band", band.shape)
+            np.copyto(band, image[y0:y1, x0:x1])
+        cv2.copyTo(self.fill, self.excluded, band)
+        return band
+
+    def _prepare_calibration(self, shape):
+        height, width = shape[:2]
+        allowed = self.calibration
+        if allowed.shape != (height, width):
+            allowed = cv2.resize(allowed, (width, height), interpolation=cv2.INTER_NEAREST)
+        x, y, w, h = cv2.boundingRect(allowed)
+        if w == 0 or h == 0:
+            x, y, w, h = 0, 0, width, height
+        self.calibration_shape = (height, width)
+        self.band = (y, y + h, x, x + w)
+        self.offset = (x, y)
+        self.excluded = cv2.bitwise_not(allowed[y:y + h, x:x + w])
+        background = (self.background // 2).astype(np.uint8).reshape(1, 1, 3)
+        fill = cv2.cvtColor(background, cv2.COLOR_HSV2BGR)[0, 0].tolist()
+        if shape[2] == 4:  # Raw screen grab, in the channel order the live conversion reads it (see ChromaKeySegmenter)
+            fill = fill[::-1] + [255]
+        self.fill = np.empty((h, w, shape[2]), np.uint8)
+        self.fill[:] = fill
+
+    # Per-pixel color classification: rodent (255) vs green screen or light tail (0)
+    def color_mask(self, image):
+        return self.hsv_mask(self.to_hsv(image))
+
+    # First half of color_mask: the HSV conversion, into the session buffer
+    def to_hsv(self, image):
+        return cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=self.hsv)
+
+    # Color mask from an image already converted by to_hsv()
+    def hsv_mask(self, hsv):
+        mask = cv2.inRange(hsv, self.lower_green, self.upper_green, dst=self.mask)
+        cv2.bitwise_not(mask, dst=mask)  # Invert to keep mouse
+        # Filter out lighter tail based on Value channel
+        value_mask = cv2.inRange(hsv, self.lower_value, self.upper_value, dst=self.value_mask)
+        cv2.bitwise_and(mask, value_mask, dst=mask)
+        return mask
+
+    # Segment an already downscaled image (or a region of one) and return the mask,
+    # which stays valid until the next call
+    def segment_region(self, image):
+        if image.shape != self.region_shape:
+            self._allocate(image.shape)
+
+        # Green screen segmentation on side view
+        start = self.metrics.clock()
+        mask = self.color_mask(image)
+        start = self.metrics.lap("segment", start)
+        self.morphology(mask)
+        self.metrics.lap("morph", start)
+        return mask
+
+    # Morphological operations to remove tail, in place on a color mask
+    def morphology(self, mask):
+        if self.blob_engine == "components":
+            cv2.erode(mask, self.erode_element, dst=self.eroded)
+            cv2.dilate(self.eroded, self.dilate_element, dst=mask)
+        else:
+            cv2.erode(mask, self.kernel, dst=self.eroded, iterations=self.erode_iterations)  # Aggressive erosion for thin tail
+            cv2.dilate(self.eroded, self.kernel, dst=mask, iterations=self.dilate_iterations)  # Restore body shape
+        return mask
+
+    # Pixels a blob edge can move through the morphology: each iteration of the 3x3 kernel moves it one
+    @property
+    def morphology_reach(self):
+        return (self.kernel.shape[0] // 2) * (self.erode_iterations + self.dilate_iterations)
+
+    def segment(self, side_view):
+        return self.segment_region(self.downscale(side_view))
+
+    # Largest blob as (x, y, w, h, cx, cy), its bounding rectangle plus its sub-pixel moments
+    # centroid, if it passes MIN_AREA, else None
+    def largest_blob(self, mask):
+        start = self.metrics.clock()
+        blob = self._largest_blob(mask)
+        self.metrics.lap("contour", start)
+        return blob
+
+    def _largest_blob(self, mask):
+        self.area = 0.0
+        if self.blob_engine == "components":
+            # Labelling cost scales with the pixels scanned, so only label the box around the mask
+            x0, y0, width, height = cv2.boundingRect(mask)
+            if width == 0 or height == 0:
+                return None
+            labels = self._buffer("labels", (height, width), np.int32)
+            # Area, bounding box and centroid of every blob in one pass. The area is a pixel count, larger
+            # than the contours engine's contourArea of the same blob by about half its outline (the polygon
+            # runs through the outline pixel centers), so blobs just under MIN_AREA there pass here (see
+            # benchmarks/parity_blobs.py)
+            count, _, stats, centroids = cv2.connectedComponentsWithStats(mask[y0:y0 + height, x0:x0 + width], labels=labels, connectivity=8)
+            if count > 1:
+                largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+                self.area = float(stats[largest, cv2.CC_STAT_AREA])
+                if self.area > self.min_area:
+                    x, y, w, h = stats[largest, :4]
+                    cx, cy = centroids[largest]
+                    return int(x) + x0, int(y) + y0, int(w), int(h), float(cx) + x0, float(cy) + y0
+            return None
+
+        # Find mouse contour in side view
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if contours:
+            largest = max(contours, key=cv2.contourArea)
+            self.area = area = cv2.contourArea(largest)
+            if area > self.min_area:
+                x, y, w, h = cv2.boundingRect(largest)
+                moments = cv2.moments(largest)
+                if moments["m00"] > 0:
+                    return x, y, w, h, moments["m10"] / moments["m00"], moments["m01"] / moments["m00"]
+                return x, y, w, h, x + w / 2, y + h / 2
+        return None
+
+    # Centroid of a blob from largest_blob(), per CENTROID_METHOD
+    def blob_centroid(self, blob):
+        x, y, w, h, cx, cy = blob
+        ox, oy = self.offset
+        if self.centroid_method == "moments":
+            return (cx + ox, cy + oy)
+        return (x + w//2 + ox, y + h//2 + oy)
+
+    def find_centroid(self, side_view):
+        blob = self.largest_blob(self.segment(side_view))
+        if blob is None:
+            return None
+        return self.blob_centroid(blob)
+
+# Color lookup table: since the color mask is a pure function of pixel color, each profile is
+# compiled once into a 256^3 table indexed by B | G << 8 | R << 16, i.e. a BGRA pixel read as a
+# little-endian uint32 with the alpha byte masked off
+def lut_cache_key(settings):
+    profile = [list(map(int, settings["LOWER_GREEN"])), list(map(int, settings["UPPER_GREEN"])),
+               int(settings["VALUE_THRESHOLD"]), cv2.__version__]
+    return hashlib.sha1(json.dumps(profile).encode()).hexdigest()[:16]
+
+def build_segmentation_lut(settings):
+    colors = np.empty((256, 256, 256, 3), np.uint8)  # Indexed [R, G, B], so the flat index is B | G << 8 | R << 16
+    levels = np.arange(256, dtype=np.uint8)
+    colors[..., 0] = levels[None, None, :]
+    colors[..., 1] = levels[None, :, None]
+    colors[..., 2] = levels[:, None, None]
+    segmenter = FrameSegmenter(settings, resolution=None)
+    segmenter._allocate((4096, 4096))
+    return segmenter.color_mask(colors.reshape(4096, 4096, 3)).reshape(-1).copy()
+
+# Load the profile's table from the cache directory (as packed bits), compiling it on a miss
+def load_segmentation_lut(settings, cache_dir=LUT_CACHE_DIR):
+    path = os.path.join(cache_dir, f"lut_{lut_cache_key(settings)}.npy")
+    if os.path.exists(path):
+        try:
+            return np.unpackbits(np.load(path), bitorder='little').astype(np.uint8) * 255
+        except Exception as e:
+            print(f"Error loading lookup table {path}: {e}")
+    table = build_segmentation_lut(settings)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(path, np.packbits(table > 0, bitorder='little'))
+        print(f"Lookup table saved to {path}")
+    except Exception as e:
+        print(f"Error saving lookup table: {e}")
+    return table
+
+# FrameSegmenter whose color classification is a table lookup per pixel. Forming the index takes
+# two passes of its own (BGRA conversion, alpha mask) and the gathers from the 16 MB table miss the
+# cache, so it only beats the HSV conversion on downscaled frames (RESOLUTION); at native capture
+# sizes it is slower (python -m benchmarks.bench_lut)
+class LutSegmenter(FrameSegmenter):
+    def __init__(self, settings, resolution=RESOLUTION, blob_engine=BLOB_ENGINE, centroid_method=CENTROID_METHOD,
+                 erode_iterations=ERODE_ITERATIONS, dilate_iterations=DILATE_ITERATIONS, table=None, calibration=None,
+                 interpolation=cv2.INTER_LINEAR):
+        super().__init__(settings, resolution, blob_engine, centroid_method, erode_iterations, dilate_iterations,
+                         calibration=calibration, interpolation=interpolation)
+        self.table = load_segmentation_lut(settings) if table is None else table
+
+    def _allocate(self, region_shape):
+        super()._allocate(region_shape)
+        height, width = region_shape[:2]
+        self.bgra = self._buffer("bgra", (height, width, 4))
+        self.index = self._buffer("index", (height, width), np.uint32)
+        self.packed = self.bgra.view(np.uint32).reshape(height, width)
+
+    def color_mask(self, image):
+        cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=self.bgra)
+        np.bitwise_and(self.packed, 0xFFFFFF, out=self.index)
+        return np.take(self.table, self.index, out=self.mask, mode='clip')
+
+# Chroma key: for a pixel whose largest channel is G, each bound of the profile's green range is a
+# linear bound on one channel in terms of the others (hue 60 +/- d means the smaller of R and B is at
+# most d/30 of the way from the other one to G; saturation s means min(R, B) <= (1 - s/255) G; value
+# is G itself), so the HSV range becomes comparisons between channel planes. The tail threshold is a
+# cap on the largest channel, which is what VALUE_THRESHOLD bounds. Hue is rounded to whole steps in
+# the HSV conversion, hence the half step added to each bound (and the bounds are rounded down, as
+# the channels are whole numbers).
+def chroma_key_parameters(settings):
+    lower_hue, lower_saturation, lower_value = map(int, settings["LOWER_GREEN"])
+    upper_hue, upper_saturation, upper_value = map(int, settings["UPPER_GREEN"])
+    if not 30 <= lower_hue <= 60 <= upper_hue <= 90 or (upper_saturation, upper_value) != (255, 255):
+        raise ValueError(f"Chroma key needs a green range with hues from 30-60 to 60-90 and no upper saturation or "
+                         f"value bound, not {[lower_hue, lower_saturation, lower_value]}-{[upper_hue, upper_saturation, upper_value]}")
+    return {
+        "below_weight": min(1.0, (60.5 - lower_hue) / 30),  # Hue down to lower_hue: R <= w G + (1 - w) B
+        "above_weight": min(1.0, (upper_hue + 0.5 - 60) / 30),  # Hue up to upper_hue: B <= w G + (1 - w) R
+        "saturation_scale": (255.5 - lower_saturation) / 255,  # min(R, B) <= scale G
+        "min_green": lower_value,  # G >= min_green
+        "max_value": int(settings["VALUE_THRESHOLD"]),  # max(B, G, R) <= max_value for rodent
+    }
+
+# FrameSegmenter that classifies pixels with the chroma key above instead of an HSV conversion. It
+# also takes raw 4-channel screen grabs, so live capture skips its conversion too.
+class ChromaKeySegmenter(FrameSegmenter):
+    reads_raw_capture = True
+
+    def __init__(self, settings, resolution=RESOLUTION, blob_engine=BLOB_ENGINE, centroid_method=CENTROID_METHOD,
+                 erode_iterations=ERODE_ITERATIONS, dilate_iterations=DILATE_ITERATIONS, calibration=None,
+                 interpolation=cv2.INTER_LINEAR):
+        super().__init__(settings, resolution, blob_engine, centroid_method, erode_iterations, dilate_iterations,
+                         calibration=calibration, interpolation=interpolation)
+        self.key = chroma_key_parameters(settings)
+
+    def _allocate(self, region_shape):
+        self.region_shape = region_shape
+        height, width = region_shape[:2]
+        self.planes = [self._buffer(f"plane{i}", (height, width)) for i in range(region_shape[2])]
+        self.mask = self._buffer("mask", (height, width))
+        self.value_mask = self._buffer("value_mask", (height, width))
+        self.eroded = self._buffer("eroded", (height, width))
+        self.weighted = self._buffer("weighted", (height, width))
+        self.test = self._buffer("test", (height, width))
+        self.extreme = self._buffer("extreme", (height, width))
+
+    def color_mask(self, image):
+        key = self.key
+        cv2.split(image, self.planes)
+        if len(self.planes) == 4:
+            # Raw screen grab, read in the channel order the live conversion (COLOR_RGBA2BGR) gives the other engines
+            red, green, blue = self.planes[:3]
+        else:
+            blue, green, red = self.planes
+        # Green screen: hue within range on both sides of G, saturated and bright enough
+        green_screen = self.mask
+        cv2.addWeighted(green, key["below_weight"], blue, 1 - key["below_weight"], -0.5, dst=self.weighted)
+        cv2.compare(red, self.weighted, cv2.CMP_LE, dst=green_screen)
+        cv2.addWeighted(green, key["above_weight"], red, 1 - key["above_weight"], -0.5, dst=self.weighted)
+        cv2.compare(blue, self.weighted, cv2.CMP_LE, dst=self.test)
+        cv2.bitwise_and(green_screen, self.test, dst=green_screen)
+        cv2.min(red, blue, dst=self.extreme)
+        cv2.convertScaleAbs(green, dst=self.weighted, alpha=key["saturation_scale"], beta=-0.5)
+        cv2.compare(self.extreme, self.weighted, cv2.CMP_LE, dst=self.test)
+        cv2.bitwise_and(green_screen, self.test, dst=green_screen)
+        cv2.threshold(green, key["min_green"] - 1, 255, cv2.THRESH_BINARY, dst=self.test)
+        cv2.bitwise_and(green_screen, self.test, dst=green_screen)
+        # Filter out lighter tail: the largest channel is the HSV Value
+        cv2.max(red, blue, dst=self.extreme)
+        cv2.max(self.extreme, green, dst=self.extreme)
+        cv2.threshold(self.extreme, key["max_value"], 255, cv2.THRESH_BINARY_INV, dst=self.value_mask)
+        mask = cv2.bitwise_not(green_screen, dst=self.mask)  # Invert to keep mouse
+        cv2.bitwise_and(mask, self.value_mask, dst=mask)
+        return mask
+
+SEGMENTERS = {"hsv": FrameSegmenter, "lut": LutSegmenter, "chroma": ChromaKeySegmenter}
+
+
+
+# REGION OF INTEREST
+
+# Wraps a segmenter so that, once the rodent has been found, only a window around its last
+# bounding rectangle (grown in the direction of travel) is segmented. A blob touching the
+# window edge, or ROI_MAX_MISSES misses in a row, sends the search back to the full frame.
+class RoiTracker:
+    def __init__(self, segmenter, margin=ROI_MARGIN, lead=ROI_LEAD, max_misses=ROI_MAX_MISSES):
+        self.segmenter = segmenter
+        self.margin = margin
+        self.lead = lead
+        self.max_misses = max_misses
+        self.reset()
+        # Counters
+        self.roi_frames = 0
+        self.full_frames = 0
+        self.pixels_processed = 0
+        self.pixels_full = 0
+
+    def reset(self):
+        self.window = None
+        self.last_rect = None
+        self.misses = 0
+
+    def _update_window(self, rect, image_shape):
+        x, y, w, h = rect[:4]
+        dx = 0
+        if self.last_rect is not None:
+            dx = (x + w / 2) - (self.last_rect[0] + self.last_rect[2] / 2)
+        ahead = int(abs(dx) * self.lead)
+        height, width = image_shape[:2]
+        x0 = max(0, x - self.margin - (ahead if dx < 0 else 0))
+        x1 = min(width, x + w + self.margin + (ahead if dx > 0 else 0))
+        y0 = max(0, y - self.margin)
+        y1 = min(height, y + h + self.margin)
+        self.window = (x0, y0, x1, y1)
+        self.last_rect = rect
+
+    # True if the blob may continue past a window edge that isn't also an image edge
+    def _touches_edge(self, rect, image_shape):
+        x, y, w, h = rect[:4]
+        x0, y0, x1, y1 = self.window
+        height, width = image_shape[:2]
+        reach = self.segmenter.morphology_reach
+        return ((x0 > 0 and x < reach) or (y0 > 0 and y < reach) or
+                (x1 < width and x + w > x1 - x0 - reach) or (y1 < height and y + h > y1 - y0 - reach))
+
+    def _search_full(self, image):
+        self.full_frames += 1
+        self.pixels_processed += image.shape[0] * image.shape[1]
+        rect = self.segmenter.largest_blob(self.segmenter.segment_region(image))
+        if rect is None:
+            self.reset()
+        else:
+            self.misses = 0
+            self._update_window(rect, image.shape)
+        return rect
+
+    def find_centroid(self, side_view):
+        image = self.segmenter.downscale(side_view)
+        self.pixels_full += image.shape[0] * image.shape[1]
+
+        rect = None
+        if self.window is not None:
+            x0, y0, x1, y1 = self.window
+            self.roi_frames += 1
+            self.pixels_processed += (x1 - x0) * (y1 - y0)
+            rect = self.segmenter.largest_blob(self.segmenter.segment_region(image[y0:y1, x0:x1]))
+            if rect is not None and self._touches_edge(rect, image.shape):
+                rect = self._search_full(image)
+            elif rect is not None:
+                x, y, w, h, cx, cy = rect
+                rect = (x + x0, y + y0, w, h, cx + x0, cy + y0)
+                self.misses = 0
+                self._update_window(rect, image.shape)
+            else:
+                self.misses += 1
+                if self.misses >= self.max_misses:
+                    rect = self._search_full(image)
+        else:
+            rect = self._search_full(image)
+
+        if rect is None:
+            return None
+        return self.segmenter.blob_centroid(rect)
+
+    @property
+    def area(self):
+        return self.segmenter.area
+
+    def report(self):
+        frames = max(1, self.roi_frames + self.full_frames)
+        return (f"ROI path {self.roi_frames} frames, full-frame path {self.full_frames} frames "
+                f"({100 * self.roi_frames / frames:.0f}% ROI); "
+                f"processed {100 * self.pixels_processed / max(1, self.pixels_full):.1f}% of full-frame pixels")
+
+# MOTION GATING
+
+# Wraps a segmenter so a frame is only segmented when it differs from the frame last segmented.
+# Both are shrunk to grayscale copies of one pixel per MOTION_CELL x MOTION_CELL block, so the
+# thresholds mean the same area whatever the side view size, and compared with absdiff; while
+# changed copy pixels cover less than MOTION_MIN_AREA of the side view, the frame is gated: the
+# last centroid is returned as is and gated is set, so the caller measures nothing on it (see
+# GaitTrigger.skip_frame()). The shrink is a bilinear resize to twice the copy size and a 2x2
+# area average, which smooths sensor noise at a fraction of the cost of one area resize from the
+# full side view.
+class MotionGate:
+    metrics = NULL_METRICS  # Stage timer (motion) when instrumentation is on
+
+    def __init__(self, segmenter, cell=MOTION_CELL, pixel_delta=MOTION_PIXEL_DELTA, min_area=MOTION_MIN_AREA,
+                 refresh=MOTION_REFRESH):
+        self.segmenter = segmenter
+        self.cell = cell
+        self.pixel_delta = pixel_delta
+        self.min_pixels = max(1, round(min_area / cell ** 2))  # Changed copy pixels that count as motion
+        self.refresh = refresh
+        self.shape = None  # Side view shape the copies are allocated for
+        self.reset()
+        # Counters
+        self.frames = 0
+        self.gated_frames = 0
+        self.gate_seconds = 0.0  # Spent on the motion check, every frame
+        self.segment_seconds = 0.0  # Spent on the full path, segmented frames only
+
+    def reset(self):
+        self.has_reference = False
+        self.centroid = None
+        self.reused = 0
+        self.moving = True  # Whether the last frame differed from the reference
+        self.gated = False  # Whether the last result was reused rather than measured
+
+    def _allocate(self, shape):
+        self.shape = shape
+        height, width = shape[:2]
+        self.size = (max(1, width // self.cell), max(1, height // self.cell))
+        small_width, small_height = self.size
+        channels = shape[2:]  # Raw 4-channel grabs too (see ChromaKeySegmenter)
+        self.sample = np.empty((2 * small_height, 2 * small_width) + channels, np.uint8)
+        self.small = np.empty((small_height, small_width) + channels, np.uint8)
+        self.gray = np.empty((small_height, small_width), np.uint8)
+        self.reference = np.empty((small_height, small_width), np.uint8)
+        self.diff = np.empty((small_height, small_width), np.uint8)
+        self.has_reference = False
+
+    def _changed(self, side_view):
+        if side_view.shape != self.shape:
+            self._allocate(side_view.shape)
+        cv2.resize(side_view, (2 * self.size[0], 2 * self.size[1]), dst=self.sample, interpolation=cv2.INTER_LINEAR)
+        cv2.resize(self.sample, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY if self.small.shape[2] == 3 else cv2.COLOR_RGBA2GRAY, dst=self.gray)
+        if not self.has_reference:
+            return True
+        cv2.absdiff(self.gray, self.reference, dst=self.diff)
+        cv2.threshold(self.diff, self.pixel_delta, 255, cv2.THRESH_BINARY, dst=self.diff)
+        return cv2.countNonZero(self.diff) >= self.min_pixels
+
+    def find_centroid(self, side_view):
+        self.frames += 1
+        start = time.perf_counter()
+        self.moving = self._changed(side_view)
+        self.metrics.lap("motion", start)
+        self.gate_seconds += time.perf_counter() - start
+        self.gated = not self.moving and self.reused < self.refresh
+        if self.gated:
+            self.reused += 1
+            self.gated_frames += 1
+            return self.centroid
+
+        start = time.perf_counter()
+        self.centroid = self.segmenter.find_centroid(side_view)
+        self.segment_seconds += time.perf_counter() - start
+        np.copyto(self.reference, self.gray)
+        self.has_reference = True
+        self.reused = 0
+        return self.centroid
+
+    # Blob area of the last segmented frame (reused along with its centroid)
+    @property
+    def area(self):
+        return self.segmenter.area
+
+    # Estimated time saved: gated frames at the mean full-path cost, less the cost of every motion check
+    def seconds_saved(self):
+        segmented = self.frames - self.gated_frames
+        if not segmented:
+            return 0.0
+        return self.gated_frames * self.segment_seconds / segmented - self.gate_seconds
+
+    def report(self):
+        frames = max(1, self.frames)
+        spent = self.gate_seconds + self.segment_seconds
+        saved = self.seconds_saved()
+        line = (f"Motion gate skipped {self.gated_frames}/{self.frames} frames ({100 * self.gated_frames / frames:.0f}%); "
+                f"saved ~{1000 * saved:.0f} ms of segmentation ({100 * saved / max(spent + saved, 1e-9):.0f}%), "
+                f"check {1000 * self.gate_seconds / frames:.3f} ms/frame")
+        if isinstance(self.segmenter, RoiTracker):
+            line += "\n" + self.segmenter.report()
+        return line
+
+# Calls find_centroid() per frame, allocating as it goes (REUSE_BUFFERS off)
+class ReferenceSegmenter:
+    area = float('nan')  # Not measured
+
+    def __init__(self, settings, resolution=RESOLUTION):
+        self.settings = settings
+        self.resolution = resolution
+
+    def find_centroid(self, side_view):
+        return find_centroid(side_view, self.settings, self.resolution)
+
+# Area-averaged downscale of image to size (width, height), into dst if given. Halves the image
+# while it is at least twice the size: OpenCV averages exact 2x2 blocks far faster than arbitrary
+# area ratios, so a power-of-two "pyramid" factor costs a few halvings instead of one slow resize.
+def area_resize(image, size, dst=None):
+    width, height = size
+    while True:
+        image_height, image_width = image.shape[:2]
+        half = (image_width // 2, image_height // 2)
+        if half[0] < width or half[1] < height or half == (width, height):
+            break
+        image = cv2.resize(image, half, interpolation=cv2.INTER_AREA)
+    return cv2.resize(image, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+# Decimation factor for a side view of size (width, height) under DOWNSCALE = "pyramid": the largest
+# power of two at which a rodent of the profile's MIN_AREA (measured at resolution, like every profile)
+# still covers min_area pixels. Each factor of two quarters the pixels every later stage touches.
+def pyramid_factor(settings, size, resolution=RESOLUTION, min_area=DOWNSCALE_MIN_AREA, max_factor=DOWNSCALE_MAX_FACTOR):
+    width, height = size
+    native_area = settings["MIN_AREA"]
+    if resolution:
+        native_area *= width * height / (resolution[0] * resolution[1])
+    factor = 1
+    while 2 * factor <= min(max_factor, width, height) and native_area / (2 * factor) ** 2 >= min_area:
+        factor *= 2
+    return factor
+
+# Segmenter for side views of size (width, height), analyzed per downscale at scale times its
+# analysis size. Returns it with the factors that map its centroids to resolution pixels, in which
+# speeds and every profile setting are given (None when it already works in them). Away from
+# resolution, MIN_AREA and the morphology are scaled with the pixel size. factor overrides the
+# "pyramid" decimation factor; input_decimation is how far the side views passed in are already
+# decimated (by the capture), so none is resized to the size it already has.
+def make_scaled_segmenter(settings, size, resolution=RESOLUTION, downscale=DOWNSCALE, scale=1.0, factor=None,
+                          input_decimation=1, **options):
+    width, height = size
+    reference = resolution or (width, height)
+    if downscale == "pyramid":
+        factor = factor or pyramid_factor(settings, size, resolution)
+        analysis_size = (width // factor, height // factor) if factor > 1 or scale != 1.0 else None
+        options["interpolation"] = cv2.INTER_AREA
+    else:
+        analysis_size = resolution
+    to_reference = None
+    if scale != 1.0 or analysis_size != resolution:
+        analysis_width, analysis_height = analysis_size or size
+        analysis_size = (max(1, round(analysis_width * scale)), max(1, round(analysis_height * scale)))
+        to_reference = (reference[0] / analysis_size[0], reference[1] / analysis_size[1])
+        area_ratio = 1 / (to_reference[0] * to_reference[1])
+        settings = dict(settings, MIN_AREA=settings["MIN_AREA"] * area_ratio)
+        options.setdefault("erode_iterations", max(1, round(ERODE_ITERATIONS * area_ratio ** 0.5)))
+        options.setdefault("dilate_iterations", max(1, round(DILATE_ITERATIONS * area_ratio ** 0.5)))
+        if analysis_size == (width // input_decimation, height // input_decimation):
+            analysis_size = None  # Side views arrive at the analysis size, nothing to resize
+    return make_segmenter(settings, analysis_size, **options), to_reference
+
+# Per-session segmenter for the selected engine, wrapped in a RoiTracker when ROI_TRACKING is set
+# and in a MotionGate when MOTION_GATING is set
+def make_segmenter(settings, resolution=RESOLUTION, engine=SEGMENTATION_ENGINE, roi_tracking=ROI_TRACKING,
+                   reuse_buffers=REUSE_BUFFERS, blob_engine=BLOB_ENGINE, centroid_method=CENTROID_METHOD, metrics=None,
+                   motion_gating=MOTION_GATING, erode_iterations=ERODE_ITERATIONS, dilate_iterations=DILATE_ITERATIONS,
+                   roi_margin=ROI_MARGIN, roi_max_misses=ROI_MAX_MISSES, calibration=None, interpolation=cv2.INTER_LINEAR):
+    if (not reuse_buffers and engine == "hsv" and blob_engine == "contours" and centroid_method == "bbox" and not roi_tracking
+            and (erode_iterations, dilate_iterations) == (5, 2) and calibration is None and interpolation == cv2.INTER_LINEAR):
+        segmenter = ReferenceSegmenter(settings, resolution)
+    else:
+        segmenter = SEGMENTERS[engine](settings, resolution, blob_engine, centroid_method, erode_iterations, dilate_iterations,
+                                       calibration=calibration, interpolation=interpolation)
+        if metrics is not None:
+            segmenter.metrics = metrics
+        if roi_tracking:
+            segmenter = RoiTracker(segmenter, roi_margin, max_misses=roi_max_misses)
+    if motion_gating:
+        segmenter = MotionGate(segmenter)
+        if metrics is not None:
+            segmenter.metrics = metrics
+    return segmenter
+
+
+
+# SPEED TRIGGER
+
+# Seconds of speeds the window holds while in_range_duration is in use (None: no time limit)
+def speed_window_seconds(speed_window, in_range_duration):
+    return in_range_duration if speed_window == "in_range_duration" else speed_window
+
+# Speed/in-range/click decision logic shared by the live tracker and offline replay
+class GaitTrigger:
+    def __init__(self, settings, frame_rate=FRAME_RATE, frame_skip=FRAME_SKIP, speeds_cap=SPEEDS_CAP,
+                 speed_estimator=SPEED_ESTIMATOR, speed_window=SPEED_WINDOW):
+        if speed_estimator not in ("frame_rate", "filtered"):
+            raise ValueError(f"Unknown speed estimator: {speed_estimator}")
+        self.min_click_interval = settings["MIN_CLICK_INTERVAL"]
+        self.frame_rate = frame_rate
+        self.frame_skip = frame_skip
+        self.speed_window = speed_window
+        self.speeds = RollingSpeedWindow(speeds_cap)
+        self.in_range_timestamps = deque()
+        self.filter = AlphaBetaFilter() if speed_estimator == "filtered" else None
+        self.reset()
+
+    def reset(self):
+        if self.filter is not None:
+            self.filter.reset()
+        self.last_centroid = None
+        self.skipped = 0  # Frames since the last update() on which nothing was measured
+        self.speeds.clear()
+        self.last_click_time = float('-inf')
+        self.in_range_timestamps.clear()
+        self.is_in_range_for_duration = False
+        self.in_range = False  # Whether the last frame passed the range and significance checks
+        self.speed = 0
+        self.avg_speed = 0.0
+        self.lower_bound = self.upper_bound = 0.0
+
+    # Drop the last centroid so no speed is measured across a gap in capture (e.g. after idling)
+    def forget_position(self):
+        self.last_centroid = None
+        self.skipped = 0
+        if self.filter is not None:
+            self.filter.reset()
+
+    # Note a processed frame on which nothing was measured (gated by MotionGate): no speed, no range
+    # check, and the next speed is the displacement since the last measured frame over the frames between
+    def skip_frame(self):
+        self.skipped += 1
+
+    # Feed one processed frame; returns a click event dict when a click should be simulated, else None
+    def update(self, centroid, current_time, speed_range_percent=SPEED_RANGE_PERCENT, in_range_duration=IN_RANGE_DURATION):
+        click = None
+
+        # Calculate speed
+        speed = 0
+        velocity = None
+        if self.filter is not None:
+            # Filtered velocity from capture timestamps; restarts whenever the rodent is lost
+            if centroid:
+                velocity = self.filter.update(centroid[0], current_time)
+            else:
+                self.filter.reset()
+        if centroid and self.last_centroid is not None:
+            if self.filter is not None:
+                speed = abs(velocity) if velocity is not None else 0
+            else:
+                dx = centroid[0] - self.last_centroid[0]
+                speed = abs(dx) * self.frame_rate / (self.frame_skip * (1 + self.skipped))
+            if speed < MAX_SPEED:
+                self.speeds.push(current_time, speed)
+            window = speed_window_seconds(self.speed_window, in_range_duration)
+            if window is not None:
+                self.speeds.expire(current_time, window)
+        else:
+            self.speeds.clear()
+        speeds = self.speeds
+
+        # Calculate average speed
+        avg_speed = speeds.mean()
+
+        # Check if all speed measurements are within speed_range_percent
+        lower_bound = avg_speed * (1 - (speed_range_percent / 100))
+        upper_bound = avg_speed * (1 + (speed_range_percent / 100))
+
+        # The extremes decide the range check; significance looks at the latest speed
+        all_within_range = lower_bound <= speeds.min() and speeds.max() <= upper_bound if speeds else False
+        all_significant = 50 <= speed if speeds else False
+
+        if all_significant and all_within_range:
+            self.in_range_timestamps.append(current_time)
+            # Check if speed has been in range for in_range_duration
+            if self.in_range_timestamps and (current_time - self.in_range_timestamps[0]) >= in_range_duration:
+                self.is_in_range_for_duration = True
+            # Remove timestamps older than in_range_duration
+            while current_time - self.in_range_timestamps[0] > in_range_duration:
+                self.in_range_timestamps.popleft()
+        else:
+            # Speed is out of range, clear timestamps to reset timer
+            self.in_range_timestamps.clear()
+            # Click if speed was in range for in_range_duration and there's been MIN_CLICK_INTERVAL seconds between clicks
+            if self.is_in_range_for_duration and (current_time - self.last_click_time) >= self.min_click_interval:
+                click = {"time": current_time, "avg_speed": float(avg_speed),
+                         "lower_bound": float(lower_bound), "upper_bound": float(upper_bound)}
+                self.last_click_time = current_time
+                self.is_in_range_for_duration = False  # Reset flag after click
+
+        self.last_centroid = centroid
+        self.skipped = 0
+        self.in_range = all_significant and all_within_range
+        self.speed = speed
+        self.avg_speed = avg_speed
+        self.lower_bound, self.upper_bound = lower_bound, upper_bound
+        return click
@@ -0,0 +1,221 @@
+"""
+INSTRUMENTATION
+"""
+
+import importlib
+import os
+import time
+from bisect import bisect_left
+
+# CONFIGURATION
+INSTRUMENTATION = False  # Time every stage of the tracking loop into latency histograms
+METRICS_EXPORT = "csv"  # "csv" (rotating CSV of per-stage percentiles), "prometheus" (text file) or None
+METRICS_FILE = "rgt_metrics"  # Export path without extension (.csv or .prom is added)
+METRICS_INTERVAL = 10.0  # Seconds between exports
+METRICS_MAX_BYTES = 1_000_000  # CSV size before it is rotated to .1, .2, ...
+METRICS_BACKUPS = 3  # Rotated CSV files kept
+
+# Each stage is recorded by one thread only (grab, decimate and convert by the capture thread when the
+# capture pipeline runs one), so histograms need no lock
+STAGES = ["grab", "decimate", "convert", "motion", "resize", "segment", "morph", "contour", "trigger", "gui", "loop"]
+# Bucket upper bounds in seconds: 10 us to ~13 s, each 25% above the last
+BUCKET_BOUNDS = tuple(1e-5 * 1.25 ** i for i in range(64))
+CSV_FIELDS = ["time", "stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms", "loop_hz"]
+
+
+
+# Latency histogram with fixed buckets, so recording is a bisect and an increment and
+# percentiles are read from the bucket counts (to within one bucket's width)
+class LatencyHistogram:
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket catches everything above the top bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    # Value below which a fraction q of samples fall, interpolated within its bucket
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+# Stage timers and histograms for one tracking session. Timers use the monotonic perf_counter;
+# lap() records the time since start under a stage and returns the new start.
+class Instrumentation:
+    enabled = True
+
+    def __init__(self, export=METRICS_EXPORT, path=METRICS_FILE, interval=METRICS_INTERVAL):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.export_format = export
+        self.path = f"{path}.prom" if export == "prometheus" else f"{path}.csv"
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.next_export = self.started + interval
+        self.last_tick = None
+
+    clock = staticmethod(time.perf_counter)
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def lap(self, stage, start):
+        now = time.perf_counter()
+        self.record(stage, now - start)
+        return now
+
+    # Call once per loop iteration: records the loop period and exports when due
+    def tick(self):
+        now = time.perf_counter()
+        if self.last_tick is not None:
+            self.histograms["loop"].add(now - self.last_tick)
+        self.last_tick = now
+        if self.export_format and now >= self.next_export:
+            self.next_export = now + self.interval
+            try:
+                self.export()
+            except OSError as e:
+                print(f"Error exporting metrics: {e}")
+
+    def loop_rate(self):
+        loop = self.histograms["loop"]
+        return 1 / loop.mean() if loop.count else 0.0
+
+    # Per-stage (count, mean, p50, p95, p99, max) in milliseconds, for stages that have samples
+    def snapshot(self):
+        rows = {}
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                rows[stage] = (histogram.count, 1000 * histogram.mean(), 1000 * histogram.quantile(0.50),
+                               1000 * histogram.quantile(0.95), 1000 * histogram.quantile(0.99), 1000 * histogram.max)
+        return rows
+
+    def export(self):
+        if self.export_format == "prometheus":
+            self._export_prometheus()
+        elif self.export_format == "csv":
+            self._export_csv()
+
+    def _export_csv(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= METRICS_MAX_BYTES:
+            for i in range(METRICS_BACKUPS - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        new_file = not os.path.exists(self.path)
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        loop_hz = self.loop_rate()
+        with open(self.path, "a") as f:
+            if new_file:
+                f.write(",".join(CSV_FIELDS) + "\n")
+            for stage, row in self.snapshot().items():
+                f.write(f"{now},{stage},{row[0]}," + ",".join(f"{ms:.4f}" for ms in row[1:]) + f",{loop_hz:.2f}\n")
+
+    # Prometheus text exposition format (e.g. for node_exporter's textfile collector), replaced atomically
+    def _export_prometheus(self):
+        lines = ["# HELP rgt_stage_seconds Time spent in each tracking loop stage",
+                 "# TYPE rgt_stage_seconds histogram"]
+        for stage, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            cumulative = 0
+            for bound, n in zip(histogram.bounds, histogram.counts):
+                cumulative += n
+                lines.append(f'rgt_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'rgt_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'rgt_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'rgt_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines += ["# HELP rgt_loop_rate_hz Tracking loop iterations per second",
+                  "# TYPE rgt_loop_rate_hz gauge",
+                  f"rgt_loop_rate_hz {self.loop_rate():.3f}"]
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, self.path)
+
+    # Short per-stage table for the control panel
+    def summary(self):
+        lines = [f"{'stage':8s} {'p50':>6s} {'p95':>6s} {'p99':>6s} ms"]
+        for stage, row in self.snapshot().items():
+            lines.append(f"{stage:8s} {row[2]:6.2f} {row[3]:6.2f} {row[4]:6.2f}")
+        lines.append(f"loop rate {self.loop_rate():.1f} Hz")
+        return "\n".join(lines)
+
+    def report(self):
+        stages = ", ".join(f"{stage} {row[2]:.2f}/{row[3]:.2f}/{row[4]:.2f}" for stage, row in self.snapshot().items())
+        return f"Stage p50/p95/p99 ms: {stages}; loop rate {self.loop_rate():.1f} Hz"
+
+# Startup timeline for --profile-startup: steps on the main thread and module imports
+# (timed on whichever thread runs them), relative to when the script started
+class StartupProfile:
+    def __init__(self, launched=None):
+        self.launched = time.perf_counter() if launched is None else launched
+        self.last = self.launched
+        self.steps = []  # (label, ms since launch, ms since the previous step)
+        self.imports = []  # (module, ms to import, including anything it imported first)
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.steps.append((label, 1000 * (now - self.launched), 1000 * (now - self.last)))
+        self.last = now
+
+    def time_import(self, name):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports.append((name, 1000 * (time.perf_counter() - start)))
+        return module
+
+    def report(self):
+        lines = ["Startup (ms since launch / ms for step):"]
+        lines += [f"  {label:30s} {at:8.1f} {took:8.1f}" for label, at, took in self.steps]
+        lines.append("Background imports (ms):")
+        lines += [f"  {name:30s} {took:8.1f}" for name, took in self.imports]
+        return "\n".join(lines)
+
+# Stand-in used when instrumentation is off: every call is a no-op that skips the clock
+class NullInstrumentation:
+    enabled = False
+
+    def clock(self):
+        return 0.0
+
+    def record(self, stage, seconds):
+        pass
+
+    def lap(self, stage, start):
+        return 0.0
+
+    def tick(self):
+        pass
+
+    def export(self):
+        pass
+
+NULL_METRICS = NullInstrumentation()
+
+# Instrumentation for a session, or the no-op stand-in when INSTRUMENTATION is off
+def make_instrumentation(enabled=INSTRUMENTATION):
+    return Instrumentation() if enabled else NULL_METRICS
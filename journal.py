@@ -0,0 +1,237 @@
+"""
+TELEMETRY JOURNAL
+"""
+
+import argparse
+import json
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+# CONFIGURATION
+JOURNAL = False  # Record every analyzed frame of a tracking session to a journal file
+JOURNAL_DIR = "journals"  # Directory for session journals
+JOURNAL_CHUNK = 4096  # Records the file grows by when it fills up
+JOURNAL_MAX_MB = 256  # Size at which a journal stops recording (about 6 million records)
+JOURNAL_KEEP = 20  # Session journals kept in JOURNAL_DIR; older ones are deleted when a session starts
+
+# One fixed-size record per analyzed frame and arena. x, y are NaN when no rodent was detected;
+# area is the largest blob even when it was too small to count as the rodent. Positions and areas
+# are in RESOLUTION pixels (the reference frame of the settings), whatever size was analyzed.
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),  # Capture time (s)
+    ("arena", "<u2"),  # Index into the arena names in the header
+    ("x", "<f4"), ("y", "<f4"),  # Centroid in RESOLUTION pixels
+    ("area", "<f4"),  # RESOLUTION pixels
+    ("speed", "<f4"), ("avg_speed", "<f4"),  # px/s
+    ("lower_bound", "<f4"), ("upper_bound", "<f4"),
+    ("in_range", "?"),  # This frame passed the range and significance checks
+    ("armed", "?"),  # In range for IN_RANGE_DURATION: the next out-of-range frame clicks
+    ("click", "?"),
+    ("gated", "?"),  # The motion gate reused the last centroid: nothing was measured (trigger fields unchanged)
+])
+
+MAGIC = b"RGTJRNL1"
+HEADER_SIZE = 4096  # Magic, record count (uint64) and a JSON description, padded to one page
+COUNT_OFFSET = len(MAGIC)
+
+
+
+# WRITER
+
+# Append-only journal in a memory-mapped file: a header page, then RECORD_DTYPE records. The record
+# count in the header is updated after every append, so another process can read a consistent
+# prefix while the session is still running (see read_journal). Appending is a store into the
+# mapping; the OS writes the pages back, so the tracking loop never waits on the disk. Once half of
+# the last chunk is used, a background thread extends the file and maps it again, and append swaps
+# that mapping in when the current one is full. Recording stops at max_mb.
+class TelemetryJournal:
+    def __init__(self, path, arena_names=("Arena 1",), chunk=JOURNAL_CHUNK, info=None, max_mb=JOURNAL_MAX_MB, start=0.0):
+        self.path = path
+        self.chunk = chunk
+        self.max_records = int(max_mb * 1024 * 1024 - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        self.capacity = 0
+        self.count = 0
+        self.full = False  # max_records reached; later records are dropped
+        self.growing = None  # Thread extending the file
+        self.extended = None  # (capacity, records mapping) it made, swapped in by append
+        description = json.dumps({"dtype": RECORD_DTYPE.descr, "arenas": list(arena_names), "info": info or {},
+                                  "start": start}).encode()
+        if COUNT_OFFSET + 8 + len(description) > HEADER_SIZE:
+            raise ValueError("Journal description does not fit in the header")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(MAGIC + np.uint64(0).tobytes() + description)
+            f.truncate(HEADER_SIZE)
+        self.capacity = min(chunk, self.max_records)
+        self._resize(self.capacity)
+        self.header = np.memmap(self.path, np.uint64, "r+", offset=COUNT_OFFSET, shape=(1,))
+        self.records = self._map(self.capacity)
+
+    # Journal named after the session start time in JOURNAL_DIR. The oldest journals there are
+    # deleted so that, with this one, keep remain (None keeps them all). Live capture times are
+    # epoch seconds, so the session start is recorded as the time base for reading it back.
+    @classmethod
+    def for_session(cls, arena_names, directory=JOURNAL_DIR, keep=JOURNAL_KEEP, **kwargs):
+        kwargs.setdefault("start", time.time())
+        if keep is not None:
+            journals = sorted(glob.glob(os.path.join(directory, "rgt_*.rgtj")), key=os.path.getmtime)
+            for old in journals[:max(0, len(journals) - (keep - 1))]:
+                os.remove(old)
+        stem = os.path.join(directory, time.strftime("rgt_%Y%m%d_%H%M%S"))
+        path, restart = stem + ".rgtj", 1
+        while os.path.exists(path):  # A restart within the same second
+            restart += 1
+            path = f"{stem}_{restart}.rgtj"
+        return cls(path, arena_names, **kwargs)
+
+    def _resize(self, capacity):
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+
+    def _map(self, capacity):
+        return np.memmap(self.path, RECORD_DTYPE, "r+", offset=HEADER_SIZE, shape=(capacity,))
+
+    # Background thread: extend the file to capacity records and map the whole of it. Both mappings
+    # share the page cache, so records appended meanwhile show through the new one.
+    def _extend(self, capacity):
+        self._resize(capacity)
+        self.extended = (capacity, self._map(capacity))
+
+    def _grow(self):
+        capacity = min(self.capacity + self.chunk, self.max_records)
+        if capacity > self.capacity:
+            self.growing = threading.Thread(target=self._extend, args=(capacity,), name="RGT journal", daemon=True)
+            self.growing.start()
+
+    # Swap in the bigger mapping (normally long ready; waits for the thread otherwise)
+    def _swap(self):
+        self.growing.join()
+        self.growing = None
+        self.capacity, self.records = self.extended
+        self.extended = None
+
+    def append(self, timestamp, arena, centroid, area, speed, avg_speed, lower_bound, upper_bound, in_range, armed, click,
+               gated=False):
+        if self.count == self.capacity:
+            if self.growing is None:
+                self._grow()  # Not started early (a chunk of one record)
+            if self.growing is None:
+                if not self.full:
+                    self.full = True
+                    print(f"Journal: {self.path} reached {self.count} records; no longer recording")
+                return
+            self._swap()
+        elif self.growing is None and self.count == self.capacity - self.chunk // 2:
+            self._grow()
+        x, y = centroid if centroid is not None else (np.nan, np.nan)
+        self.records[self.count] = (timestamp, arena, x, y, area, speed, avg_speed, lower_bound, upper_bound,
+                                    in_range, armed, click, gated)
+        self.count += 1
+        self.header[0] = self.count  # Publish the record after it is complete
+
+    # Append the state of a GaitTrigger after its update() for this frame (or its skip_frame(), when gated)
+    def record(self, timestamp, arena, centroid, area, trigger, click, gated=False):
+        self.append(timestamp, arena, centroid, area, trigger.speed, trigger.avg_speed, trigger.lower_bound,
+                    trigger.upper_bound, trigger.in_range and not gated, trigger.is_in_range_for_duration,
+                    click is not None, gated)
+
+    # Flush and trim the unused part of the last chunk
+    def close(self):
+        if self.records is None:
+            return
+        if self.growing is not None:
+            self.growing.join()
+            self.growing = self.extended = None
+        self.records.flush()
+        self.header.flush()
+        self.records = self.header = None
+        self._resize(self.count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+# READER
+
+# Records written so far (a read-only memory-mapped array) and the journal description
+# ({"arenas": [...], "info": {...}, "start": ...}); safe to call while the journal is being written
+def read_journal(path):
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if header[:COUNT_OFFSET] != MAGIC:
+        raise ValueError(f"{path} is not an RGT journal")
+    count = int(np.frombuffer(header, np.uint64, 1, COUNT_OFFSET)[0])
+    description = json.loads(header[COUNT_OFFSET + 8:].rstrip(b"\0"))
+    dtype = np.dtype([tuple(field) for field in description["dtype"]])  # As written, for journals of older versions
+    if count == 0:
+        return np.empty(0, dtype), description
+    return np.memmap(path, dtype, "r", offset=HEADER_SIZE, shape=(count,)), description
+
+# Write journal records as CSV, with arena names instead of indices
+def export_csv(records, description, path):
+    names = description["arenas"]
+    fields = [name for name in RECORD_DTYPE.names if name != "arena"]
+    with open(path, "w") as f:
+        f.write(",".join(["arena"] + fields) + "\n")
+        for record in records:
+            f.write(",".join([names[record["arena"]]] + [str(record[field].item()) for field in fields]) + "\n")
+
+# Capture time the journal's session started: record times minus this are seconds into the session
+# (0 for replays, whose times already are; journals of older versions didn't record it)
+def session_start(description):
+    return description.get("start", 0.0)
+
+# Records within window seconds of around, in seconds into the session
+def records_around(records, description, around, window=1.0):
+    return records[np.abs(records["time"] - session_start(description) - around) <= window]
+
+def summary(records, description):
+    start = session_start(description)
+    lines = [f"{len(records)} records"]
+    for index, name in enumerate(description["arenas"]):
+        arena = records[records["arena"] == index]
+        if not len(arena):
+            continue
+        detected = np.count_nonzero(~np.isnan(arena["x"]))
+        lines.append(f"  {name}: {len(arena)} frames from {arena['time'][0] - start:.3f}s to {arena['time'][-1] - start:.3f}s, "
+                     f"detected in {detected}, in range in {np.count_nonzero(arena['in_range'])}, "
+                     f"{np.count_nonzero(arena['click'])} clicks")
+    return "\n".join(lines)
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize or export an RGT telemetry journal")
+    parser.add_argument("journal", help="Journal file (.rgtj), e.g. from the journals directory")
+    parser.add_argument("--csv", help="Write every record to this CSV file")
+    parser.add_argument("--around", type=float, help="Print the records within --window seconds of this many seconds into the session")
+    parser.add_argument("--window", type=float, default=1.0, help="Seconds either side of --around (default: 1.0)")
+    args = parser.parse_args()
+
+    records, description = read_journal(args.journal)
+    print(summary(records, description))
+    if args.around is not None:
+        names, start = description["arenas"], session_start(description)
+        for record in records_around(records, description, args.around, args.window):
+            print(f"{record['time'] - start:.3f}s {names[record['arena']]}: centroid ({record['x']:.1f}, {record['y']:.1f}) "
+                  f"area {record['area']:.0f}, speed {record['speed']:.1f}, avg {record['avg_speed']:.1f} "
+                  f"[{record['lower_bound']:.1f}, {record['upper_bound']:.1f}]"
+                  f"{' in range' if record['in_range'] else ''}{' armed' if record['armed'] else ''}"
+                  f"{' CLICK' if record['click'] else ''}")
+    if args.csv:
+        export_csv(records, description, args.csv)
+        print(f"Wrote {args.csv}")
@@ -0,0 +1,182 @@
+"""
+NOTIFICATIONS
+"""
+
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+# CONFIGURATION
+CONFIG_FILE = "config.json"  # Email settings: sender_email, app_password, recipient_email (and the smtp_ overrides)
+SMTP_HOST = "smtp.gmail.com"  # Overridden by "smtp_host" in config.json (e.g. "localhost" for a local test server)
+SMTP_PORT = 587  # Overridden by "smtp_port" in config.json
+SMTP_STARTTLS = True  # Overridden by "smtp_starttls" in config.json; login is skipped when app_password is empty
+SMTP_TIMEOUT = 10  # Seconds before a connection attempt or command gives up
+SMTP_KEEPALIVE = 60  # Seconds between NOOPs that keep an idle connection open
+SMTP_IDLE_CLOSE = 600  # Seconds without a message before the connection is closed
+SEND_RETRIES = 3  # Attempts per message before it is dropped
+RETRY_BACKOFF = 2.0  # Seconds before the first retry, doubled after each failure
+
+_STOP = object()  # Queue sentinel that ends the worker
+
+# Load the email settings from path; None (after printing why) when missing or incomplete
+def load_email_config(path=CONFIG_FILE):
+    if not os.path.exists(path):
+        print(f"Error: {path} not found. Please create it with email settings.")
+        return None
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+        required_keys = ["sender_email", "app_password", "recipient_email"]
+        if not all(key in config for key in required_keys):
+            print(f"Error: {path} missing required keys: {required_keys}")
+            return None
+        return config
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+        return None
+
+
+
+# Sends email notifications from a background thread so the tracking loop only enqueues them.
+# The config is loaded once through load_config and cached; the SMTP connection is opened on
+# the first message, kept alive with NOOPs while idle and reused for later messages.
+class NotificationWorker:
+    def __init__(self, load_config, host=SMTP_HOST, port=SMTP_PORT, starttls=SMTP_STARTTLS):
+        self.load_config = load_config
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.config = None
+        self.server = None
+        self.last_activity = 0.0
+        self.queue = queue.Queue()
+        self.stopping = threading.Event()
+        self.thread = None
+
+        # Counters
+        self.sent = 0
+        self.failed = 0
+
+    def start(self):
+        if self.thread is None:
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self._run, name="RGT notifications", daemon=True)
+            self.thread.start()
+        return self
+
+    # Queue an email; returns immediately
+    def notify(self, subject, body):
+        self.queue.put((subject, body))
+
+    # Drop the cached config so the next message reloads it (e.g. after the recipient changes)
+    def reload_config(self):
+        self.queue.put(None)
+
+    # Try once more to send whatever is queued (no retry backoff once stopping), then close the
+    # connection and end the thread
+    def stop(self, timeout=30.0):
+        if self.thread is None:
+            return
+        self.stopping.set()  # Cuts short a retry backoff in progress
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            print(f"Notifications: gave up waiting, {self.queue.qsize()} message(s) not sent")
+        self.thread = None
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=SMTP_KEEPALIVE)
+            except queue.Empty:
+                self._keepalive()
+                continue
+            if item is _STOP:
+                break
+            if item is None:
+                self.config = None
+                continue
+            self._send(*item)
+        self._close()
+
+    def _settings(self):
+        if self.config is None:
+            self.config = self.load_config()
+        return self.config
+
+    def _connect(self, config):
+        host = config.get("smtp_host", self.host)
+        port = int(config.get("smtp_port", self.port))
+        server = smtplib.SMTP(host, port, timeout=SMTP_TIMEOUT)
+        try:
+            if config.get("smtp_starttls", self.starttls):
+                server.starttls()
+            if config.get("app_password"):
+                server.login(config["sender_email"], config["app_password"])
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+
+    def _close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                self.server.close()
+            self.server = None
+
+    # Keep an idle connection open, or close it once it has been idle for SMTP_IDLE_CLOSE
+    def _keepalive(self):
+        if self.server is None:
+            return
+        if time.monotonic() - self.last_activity >= SMTP_IDLE_CLOSE:
+            self._close()
+            return
+        try:
+            self.server.noop()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+            self.server = None
+
+    def _send(self, subject, body):
+        config = self._settings()
+        if not config:
+            print("Email not sent: No valid email configuration")
+            self.failed += 1
+            return
+        msg = EmailMessage()
+        msg.set_content(body)
+        msg['Subject'] = subject
+        msg['From'] = config["sender_email"]
+        msg['To'] = config["recipient_email"]
+
+        delay = RETRY_BACKOFF
+        for attempt in range(1, SEND_RETRIES + 1):
+            try:
+                if self.server is None:
+                    self._connect(config)
+                self.server.send_message(msg)
+                self.last_activity = time.monotonic()
+                self.sent += 1
+                print("Email sent successfully")
+                return
+            except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused) as e:
+                # Retrying won't help until the config is fixed
+                print(f"Error sending email: {e}")
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                print(f"Error sending email (attempt {attempt}/{SEND_RETRIES}): {e}")
+                if self.server is not None:
+                    self.server.close()
+                    self.server = None
+                if attempt < SEND_RETRIES and not self.stopping.wait(delay):
+                    delay *= 2
+                    continue
+                break
+        self.failed += 1
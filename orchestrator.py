@@ -0,0 +1,335 @@
+"""
+RIG ORCHESTRATOR
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from arenas import Arena, arena_region, arena_settings, region_window, union_region
+from frame_sources import CaptureScheduler, CroppedFrameSource, MssFrameSource, open_frame_source
+from gait_pipeline import FRAME_SKIP, IN_RANGE_DURATION, RESOLUTION, SPEED_RANGE_PERCENT
+
+# CONFIGURATION
+RING_SLOTS = 8  # Frames held in shared memory; capture waits (skipping grabs, when live) once all are in use
+RESULT_TIMEOUT = 0.05  # Seconds to wait for worker results while no slot is free
+SHUTDOWN_TIMEOUT = 5.0  # Seconds to wait for workers to report their stats when stopping
+
+
+
+# SHARED MEMORY
+
+# Fixed ring of frames in one shared memory block. The process that creates it owns (and unlinks)
+# it; workers attach by name, so a frame is handed over as a slot number instead of a pickled array.
+class SharedFrameRing:
+    def __init__(self, shape, slots=RING_SLOTS, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = name is None
+        size = slots * int(np.prod(self.shape))
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.frames = np.ndarray((slots, *self.shape), np.uint8, buffer=self.memory.buf)
+
+    # What a worker needs to attach: (name, shape, slots)
+    def spec(self):
+        return self.memory.name, self.shape, self.slots
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, slots = spec
+        return cls(shape, slots, name)
+
+    def close(self):
+        self.frames = None  # Drop the view so the buffer can be released
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+
+# WORKERS
+
+# Worker process for one rig: runs that rig's segmentation and trigger on its slice of every frame
+# published to the ring. Inbox messages are ("frame", slot, timestamp, frame number),
+# ("settings", (speed_range_percent, in_range_duration)) or None to stop; results go back as
+# ("click", rig, event), ("done", rig, slot), ("error", rig, message) and finally ("stats", rig, stats).
+def rig_worker(index, settings, ring_spec, enclosing, resolution, frame_skip, inbox, results):
+    cv2.setNumThreads(1)  # One core per rig
+    ring = SharedFrameRing.attach(ring_spec)
+    arena = Arena(settings, resolution, frame_skip)
+    arena.window = region_window(arena.region, enclosing)
+    speed_range_percent, in_range_duration = SPEED_RANGE_PERCENT, IN_RANGE_DURATION
+    try:
+        while True:
+            message = inbox.get()
+            if message is None:
+                break
+            if message[0] == "settings":
+                speed_range_percent, in_range_duration = message[1]
+                continue
+            _, slot, timestamp, number = message
+            if not arena.done:
+                click = arena.process(ring.frames[slot], timestamp, speed_range_percent, in_range_duration)
+                if click:
+                    click["frame"] = number
+                    results.put(("click", index, click))
+            results.put(("done", index, slot))
+    except Exception as e:
+        results.put(("error", index, str(e)))
+    finally:
+        results.put(("stats", index, arena.stats()))
+        ring.close()
+
+
+
+# ORCHESTRATOR
+
+# Captures the rectangle enclosing every rig once per frame into a SharedFrameRing and fans the
+# slot out to one worker process per rig. Clicks come back on one results queue and are acted on
+# by actuate(rig settings, event) in this process, so clicking and notifications stay in one place.
+class RigOrchestrator:
+    def __init__(self, settings, resolution=RESOLUTION, frame_skip=FRAME_SKIP, slots=RING_SLOTS):
+        self.rigs = arena_settings(settings)
+        self.region = union_region([arena_region(rig) for rig in self.rigs])
+        self.resolution = resolution
+        self.frame_skip = frame_skip
+        self.slots = max(2, slots)
+        self.context = multiprocessing.get_context()
+        self.results = self.context.Queue()
+        self.inboxes = []
+        self.workers = []
+        self.ring = None  # Allocated once the first frame's shape is known
+        self.free = deque(range(self.slots))
+        self.pending = [set() for _ in range(self.slots)]  # Rigs still reading each slot
+        self.active = set(range(len(self.rigs)))  # Rigs that still get frames
+        self.stopping = threading.Event()
+        self.speed_range_percent = SPEED_RANGE_PERCENT  # Trigger parameters of every rig (see send_settings)
+        self.in_range_duration = IN_RANGE_DURATION
+
+        # Results and counters
+        self.events = {rig["name"]: [] for rig in self.rigs}
+        self.stats = {}
+        self.errors = {}
+        self.frames_published = 0
+        self.grabs_skipped = 0  # Live capture slots that passed while every ring slot was in use
+
+    # mss monitor for the enclosing rectangle
+    def monitor(self):
+        left, top, width, height = self.region
+        return {"top": top, "left": left, "width": width, "height": height}
+
+    # Source cropped to the enclosing rectangle, for recordings of the whole screen
+    def crop(self, source):
+        return CroppedFrameSource(source, self.region)
+
+    # Stop after the frame being published (safe to call from another thread)
+    def stop(self):
+        self.stopping.set()
+
+    # New trigger parameters for every rig, from the next frame they are sent (workers started
+    # later get them first)
+    def send_settings(self, speed_range_percent, in_range_duration):
+        self.speed_range_percent, self.in_range_duration = speed_range_percent, in_range_duration
+        for inbox in self.inboxes:
+            inbox.put(("settings", (speed_range_percent, in_range_duration)))
+
+    def _start(self, shape):
+        self.ring = SharedFrameRing(shape, self.slots)
+        for index, rig in enumerate(self.rigs):
+            inbox = self.context.Queue()
+            inbox.put(("settings", (self.speed_range_percent, self.in_range_duration)))
+            worker = self.context.Process(target=rig_worker, name=f"RGT rig {rig['name']}", daemon=True,
+                                          args=(index, rig, self.ring.spec(), self.region, self.resolution,
+                                                self.frame_skip, inbox, self.results))
+            worker.start()
+            self.inboxes.append(inbox)
+            self.workers.append(worker)
+
+    def _release(self, slot, index):
+        if index in self.pending[slot]:
+            self.pending[slot].discard(index)
+            if not self.pending[slot]:
+                self.free.append(slot)
+
+    # Handle worker results, waiting up to timeout seconds for the first one
+    def _collect(self, actuate, timeout=0.0):
+        while True:
+            try:
+                kind, index, value = self.results.get(timeout=timeout) if timeout else self.results.get_nowait()
+            except queue.Empty:
+                return
+            timeout = 0.0
+            rig = self.rigs[index]
+            if kind == "done":
+                self._release(value, index)
+            elif kind == "click":
+                events = self.events[rig["name"]]
+                events.append(value)
+                actuate(rig, value)
+                if len(events) >= (rig.get("click_value") or float('inf')):
+                    self.active.discard(index)
+            elif kind == "error":
+                self._fail(index, f"worker error: {value}")
+            elif kind == "stats":
+                self.stats[rig["name"]] = value
+
+    # Stop sending frames to a rig whose worker failed and free the slots it still held
+    def _fail(self, index, message):
+        rig = self.rigs[index]
+        print(f"{rig['name']}: {message}")
+        self.errors[rig["name"]] = message
+        self.active.discard(index)
+        for slot in range(self.slots):
+            self._release(slot, index)
+
+    # A worker that exited without reporting (killed, or crashed inside native code) never
+    # releases its slots, so it is failed like one that reported an error
+    def _reap(self):
+        for index, worker in enumerate(self.workers):
+            if worker.exitcode is not None and self.rigs[index]["name"] not in self.errors:
+                if index in self.active or any(index in pending for pending in self.pending):
+                    self._fail(index, f"worker exited unexpectedly (exit code {worker.exitcode})")
+
+    # Capture and publish frames until every rig has reached its click limit (returns
+    # "Click Limit Reached"), the source is exhausted or stop() is called (returns None)
+    def run(self, source, actuate=None):
+        if actuate is None:
+            actuate = lambda rig, event: None
+        scheduler = CaptureScheduler(source, frame_skip=self.frame_skip)
+        try:
+            while self.active and not self.stopping.is_set():
+                self._collect(actuate)
+                if not self.free:
+                    self._collect(actuate, RESULT_TIMEOUT)
+                    self._reap()
+                    if not self.free:
+                        continue  # Workers are behind; live grabs due meanwhile are skipped by the scheduler
+                slot = self.free.popleft()
+                if self.ring is None:
+                    frame = scheduler.next_frame()
+                    if frame is None:
+                        break
+                    self._start(frame.shape)
+                    np.copyto(self.ring.frames[slot], frame)
+                else:
+                    frame = scheduler.next_frame(out=self.ring.frames[slot])
+                    if frame is None:
+                        break
+                    if frame is not self.ring.frames[slot]:
+                        # The source returned its own array; the ring (and every worker's window) is fixed
+                        # at the first frame's size, so only a frame of that size can be published
+                        if frame.shape != self.ring.shape:
+                            raise ValueError(f"Capture size changed from {self.ring.shape} to {frame.shape}")
+                        np.copyto(self.ring.frames[slot], frame)
+                self.frames_published += 1
+                number = scheduler.frames * self.frame_skip
+                self.pending[slot] = set(self.active)
+                for index in self.active:
+                    self.inboxes[index].put(("frame", slot, source.timestamp, number))
+        finally:
+            self.grabs_skipped = scheduler.slots_skipped
+            self._shutdown(actuate)
+        return None if self.active else "Click Limit Reached"
+
+    # Let the workers finish what they were sent, collect their results and free the ring
+    def _shutdown(self, actuate):
+        for inbox in self.inboxes:
+            inbox.put(None)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while len(self.stats) < len(self.workers) and time.monotonic() < deadline:
+            self._collect(actuate, RESULT_TIMEOUT)
+            if not any(worker.is_alive() for worker in self.workers) and self.results.empty():
+                break  # Nothing more can come: the rest died without reporting
+        for worker in self.workers:
+            worker.join(timeout=1.0)
+            if worker.is_alive():
+                worker.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def report(self):
+        left, top, width, height = self.region
+        lines = [f"Published {self.frames_published} frames of {width}x{height} at ({left}, {top}) to "
+                 f"{len(self.rigs)} rig process(es); {self.grabs_skipped} grabs skipped while workers were behind"]
+        for rig in self.rigs:
+            stats = self.stats.get(rig["name"])
+            if stats is None:
+                lines.append(f"  {rig['name']}: no stats")
+                continue
+            lines.append(f"  {rig['name']}: {stats['clicks']} clicks, detected in {stats['detections']}/{stats['frames']} "
+                         f"frames, {stats['ms_per_frame']:.2f} ms/frame")
+        return "\n".join(lines)
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Track several rigs from one capture, one worker process per rig")
+    parser.add_argument("recording", nargs="?", help="Video file, image directory or image glob (default: live screen capture)")
+    parser.add_argument("--settings", default="rgt_settings.json", help="Settings file saved by RGT (default: rgt_settings.json)")
+    parser.add_argument("--arenas", default="arenas.json", help="Arenas file listing the rigs (default: arenas.json)")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the recording (default: from the file)")
+    parser.add_argument("--speed-range", type=float, default=SPEED_RANGE_PERCENT, help=f"Speed range %% (default: {SPEED_RANGE_PERCENT})")
+    parser.add_argument("--in-range-duration", type=float, default=IN_RANGE_DURATION,
+                        help=f"Seconds the speed must stay in range (default: {IN_RANGE_DURATION})")
+    parser.add_argument("--email", action="store_true",
+                        help="Email the recipient in config.json when a rig reaches its click limit (live capture only)")
+    args = parser.parse_args()
+
+    with open(args.settings, "r") as f:
+        settings = json.load(f)
+    with open(args.arenas, "r") as f:
+        settings["arenas"] = json.load(f)
+    orchestrator = RigOrchestrator(settings)
+    orchestrator.send_settings(args.speed_range, args.in_range_duration)
+    notifier = None  # Email NotificationWorker, with --email
+
+    if args.recording:
+        # Replay: report the clicks instead of performing them
+        def actuate(rig, event):
+            print(f"{rig['name']}: {event['time']:.3f}s: Avg speed {event['avg_speed']:.2f} outside range "
+                  f"[{event['lower_bound']:.2f}, {event['upper_bound']:.2f}] - Click")
+        source = orchestrator.crop(open_frame_source(args.recording, args.fps))
+    else:
+        import pyautogui
+        pyautogui.FAILSAFE = True  # Move mouse to top-left corner to abort
+        if args.email:
+            from notifications import NotificationWorker, load_email_config
+            notifier = NotificationWorker(load_email_config).start()
+
+        def actuate(rig, event):
+            print(f"{rig['name']}: Avg speed {event['avg_speed']:.2f} outside range "
+                  f"[{event['lower_bound']:.2f}, {event['upper_bound']:.2f}] - Simulating click")
+            pyautogui.click(x=rig["click"][0], y=rig["click"][1])
+            # Queue the email once the rig reaches its click limit; the notifier thread sends it
+            if notifier is not None and len(orchestrator.events[rig["name"]]) == rig.get("click_value"):
+                print(f"Sending {rig['name']}: click limit email")
+                email_subject = f"RGT Video Limit Reached at {time.ctime()}"
+                email_body = f"{rig['name']}: {rig['click_value']} videos recorded at {time.ctime()}.\nRGT has stopped recording, so you will need to process those videos then restart the program."
+                notifier.notify(email_subject, email_body)
+        source = MssFrameSource(orchestrator.monitor())
+
+    start = time.perf_counter()
+    try:
+        with source:
+            ending = orchestrator.run(source, actuate)
+    except KeyboardInterrupt:
+        ending = "Stopped"
+    elapsed = time.perf_counter() - start
+    if notifier is not None:
+        notifier.stop()  # Send any queued email before exiting
+    print(orchestrator.report())
+    print(f"{ending or 'Finished'} after {elapsed:.1f}s")
@@ -0,0 +1,129 @@
+"""
+QUALITY LADDER
+"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from gait_pipeline import BLOB_ENGINE, FRAME_RATE, FRAME_SKIP, ROI_MARGIN, ROI_MAX_MISSES
+
+# CONFIGURATION
+QUALITY_CONTROL = True  # Step down the ladder below while live analysis can't keep up with the capture rate
+QUALITY_BUDGET = 0.6  # Fraction of the frame period the analysis of one frame may take
+QUALITY_WINDOW = 40  # Frames measured before each decision
+QUALITY_PERCENTILE = 90  # Percentile of the window compared with the budget
+QUALITY_RECOVER = 0.5  # Step back up once that percentile is below this fraction of the budget
+QUALITY_MAX_BACKOFF = 16  # Max multiple of QUALITY_WINDOW to wait before retrying a level that overran
+
+# Analysis settings from full quality (level 0) down. Each level is cheaper than the one above:
+# the blob engine first, then the analysis resolution (MIN_AREA and the morphology scale with it,
+# the ROI window is kept tighter and falls back to a full search later), then the sampling rate.
+QUALITY_LADDER = [
+    {"scale": 1.0, "skip_factor": 1, "blob_engine": BLOB_ENGINE, "roi_margin": ROI_MARGIN, "roi_max_misses": ROI_MAX_MISSES},
+    {"scale": 1.0, "skip_factor": 1, "blob_engine": "components", "roi_margin": ROI_MARGIN, "roi_max_misses": ROI_MAX_MISSES},
+    {"scale": 0.75, "skip_factor": 1, "blob_engine": "components", "roi_margin": 16, "roi_max_misses": 2},
+    {"scale": 0.5, "skip_factor": 1, "blob_engine": "components", "roi_margin": 12, "roi_max_misses": 3},
+    {"scale": 0.5, "skip_factor": 2, "blob_engine": "components", "roi_margin": 12, "roi_max_misses": 3},
+]
+
+
+
+# CONTROLLER
+
+# Closed loop over the measured per-frame analysis cost. Every QUALITY_WINDOW frames the
+# QUALITY_PERCENTILE cost is compared with QUALITY_BUDGET of the frame period at the current
+# level: above it, the controller steps down one level; comfortably below it for long enough, it
+# tries one level up. A level that overran right after a step up is retried after twice as long
+# each time (up to QUALITY_MAX_BACKOFF windows), so a machine at its limit doesn't oscillate.
+class QualityController:
+    def __init__(self, ladder=QUALITY_LADDER, budget=QUALITY_BUDGET, window=QUALITY_WINDOW,
+                 percentile=QUALITY_PERCENTILE, recover=QUALITY_RECOVER, frame_skip=FRAME_SKIP):
+        self.ladder = ladder
+        self.budget = budget
+        self.window = window
+        self.percentile = percentile
+        self.recover = recover
+        self.base_frame_skip = frame_skip
+        self.level = 0
+        self.costs = deque(maxlen=window)
+        self.backoff = 1  # Windows to stay under the recovery threshold before stepping up
+        self.calm = 0  # Frames in a row under the recovery threshold
+        self.stepped_up = False  # The last change was a step up, not yet confirmed by a full window
+        self.started = time.monotonic()
+
+        # Counters
+        self.level_frames = [0] * len(ladder)
+        self.changes = []  # (seconds since start, from level, to level, p-cost in ms, budget in ms)
+
+    @property
+    def settings(self):
+        return self.ladder[self.level]
+
+    def frame_skip(self):
+        return self.base_frame_skip * self.settings["skip_factor"]
+
+    # Analysis rate (Hz) of the current level
+    def rate(self):
+        return FRAME_RATE / self.frame_skip()
+
+    # Seconds one frame's analysis may take at the current level
+    def frame_budget(self):
+        return self.budget / self.rate()
+
+    # Record one frame's analysis time in seconds; returns True when the level changed
+    def record(self, seconds):
+        self.level_frames[self.level] += 1
+        self.costs.append(seconds)
+        if len(self.costs) < self.window:
+            return False
+        cost = np.percentile(self.costs, self.percentile)
+        budget = self.frame_budget()
+        if cost > budget:
+            if self.level == len(self.ladder) - 1:
+                self.costs.clear()
+                return False
+            if self.stepped_up:
+                self.backoff = min(2 * self.backoff, QUALITY_MAX_BACKOFF)
+            return self._step(self.level + 1, cost, budget)
+        self.stepped_up = False
+        if cost < self.recover * budget and self.level > 0:
+            self.calm += self.window
+            self.costs.clear()
+            if self.calm >= self.window * self.backoff:
+                return self._step(self.level - 1, cost, budget, up=True)
+            return False
+        self.calm = 0
+        self.costs.clear()
+        if self.backoff > 1:
+            self.backoff = max(1, self.backoff // 2)  # Stable at this level: let retries come sooner again
+        return False
+
+    def _step(self, level, cost, budget, up=False):
+        change = (time.monotonic() - self.started, self.level, level, 1000 * cost, 1000 * budget)
+        self.changes.append(change)
+        self.level = level
+        self.stepped_up = up
+        self.calm = 0
+        self.costs.clear()
+        settings = self.settings
+        print(f"Quality {change[1]} -> {level} at {change[0]:.1f}s: p{self.percentile} analysis "
+              f"{change[3]:.2f} ms vs budget {change[4]:.2f} ms; scale {settings['scale']}, "
+              f"{self.rate():.0f} Hz, {settings['blob_engine']}, ROI margin {settings['roi_margin']}")
+        return True
+
+    def report(self):
+        total = max(1, sum(self.level_frames))
+        shares = ", ".join(f"{level}: {100 * frames / total:.0f}%" for level, frames in enumerate(self.level_frames) if frames)
+        return f"Quality: {len(self.changes)} level change(s), frames per level {shares}; ended at level {self.level}"
+
+
+# Segmenter options (for make_segmenter) of a ladder level; Arena.set_quality() scales MIN_AREA and
+# the morphology with the resolution itself
+def segmenter_options(settings):
+    return {
+        "blob_engine": settings["blob_engine"],
+        "roi_margin": settings["roi_margin"],
+        "roi_max_misses": settings["roi_max_misses"],
+    }
@@ -0,0 +1,108 @@
+"""
+OFFLINE REPLAY
+"""
+
+import argparse
+import json
+import time
+
+from arenas import Arena, ArenaTracker, arena_settings
+from calibration import load_calibration
+from frame_sources import CaptureScheduler, CroppedFrameSource, VirtualClock, open_frame_source
+from gait_pipeline import FRAME_SKIP, IN_RANGE_DURATION, RESOLUTION, SPEED_RANGE_PERCENT
+from journal import TelemetryJournal
+
+# Run a recorded side view through the same Arena.process() that track_session() runs on every
+# arena, returning the click events it would have produced (and recording every frame to journal,
+# if given). The whole recording is the arena. With calibrate, the saved calibration of the
+# settings' coordinates (see calibration.py) crops and masks every frame.
+def replay_session(source, settings, clock=None, frame_skip=FRAME_SKIP, resolution=RESOLUTION,
+                   speed_range_percent=SPEED_RANGE_PERCENT, in_range_duration=IN_RANGE_DURATION, journal=None,
+                   calibrate=False):
+    if clock is None:
+        clock = VirtualClock(source)
+    scheduler = CaptureScheduler(source, frame_skip=frame_skip)
+    calibration = load_calibration(settings) if calibrate else None  # Keyed by the settings' own coordinates
+    arena = None  # Built for the size of the first frame
+
+    while arena is None or not arena.done:
+        side_view = scheduler.next_frame()
+        if side_view is None:
+            break
+
+        if arena is None:
+            height, width = side_view.shape[:2]
+            view = dict(settings, name="Side view", top_left=[0, 0], bottom_right=[width, height])
+            view.setdefault("click", None)
+            arena = Arena(view, resolution, frame_skip, calibration=calibration)
+            arena.journal = journal
+        click = arena.process(side_view, clock.time(), speed_range_percent, in_range_duration)
+        if click:
+            del click["arena"]  # A single side view: events carry no arena name
+            click["frame"] = scheduler.frames * frame_skip
+    return [] if arena is None else arena.events
+
+# Replay a recording that shows several walkways, each settings["arenas"] entry giving one arena's
+# coordinates in recording pixels; returns the click events of every arena, keyed by arena name
+def replay_arenas(source, settings, clock=None, frame_skip=FRAME_SKIP, resolution=RESOLUTION,
+                  speed_range_percent=SPEED_RANGE_PERCENT, in_range_duration=IN_RANGE_DURATION, journal=None,
+                  calibrate=False):
+    if clock is None:
+        clock = VirtualClock(source)
+    tracker = ArenaTracker([Arena(arena, resolution, frame_skip, calibration=load_calibration(arena) if calibrate else None)
+                            for arena in arena_settings(settings)], journal)
+    scheduler = CaptureScheduler(CroppedFrameSource(source, tracker.region), frame_skip=frame_skip)  # Same grab as live
+
+    while not tracker.done:
+        grab = scheduler.next_frame()
+        if grab is None:
+            break
+
+        for arena, click in tracker.process(grab, clock.time(), speed_range_percent, in_range_duration):
+            click["frame"] = scheduler.frames * frame_skip
+    return {arena.name: arena.events for arena in tracker.arenas}
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded side view through the RGT trigger logic")
+    parser.add_argument("recording", help="Video file, image directory or image glob")
+    parser.add_argument("--settings", default="rgt_settings.json", help="Settings file saved by RGT (default: rgt_settings.json)")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the recording (default: from the file)")
+    parser.add_argument("--arenas", help="Arenas file (like arenas.json, in recording pixels) to track several walkways at once")
+    parser.add_argument("--journal", help="Record every analyzed frame to this telemetry journal (.rgtj)")
+    parser.add_argument("--calibrated", action="store_true",
+                        help="Crop and mask frames with the calibration saved for the settings' coordinates (see calibration.py)")
+    args = parser.parse_args()
+
+    with open(args.settings, "r") as f:
+        settings = json.load(f)
+    if args.arenas:
+        with open(args.arenas, "r") as f:
+            settings["arenas"] = json.load(f)
+    journal = None
+    if args.journal:
+        names = [arena["name"] for arena in arena_settings(settings)] if args.arenas else ["Side view"]
+        journal = TelemetryJournal(args.journal, names, info={"recording": args.recording})
+
+    start = time.perf_counter()
+    with open_frame_source(args.recording, args.fps) as source:
+        if args.arenas:
+            events = [event for arena_events in replay_arenas(source, settings, journal=journal, calibrate=args.calibrated).values() for event in arena_events]
+            events.sort(key=lambda event: event["time"])
+        else:
+            events = replay_session(source, settings, journal=journal, calibrate=args.calibrated)
+        duration = source.timestamp
+    elapsed = time.perf_counter() - start
+    if journal is not None:
+        journal.close()
+
+    for event in events:
+        prefix = f"{event['arena']}: " if "arena" in event else ""
+        print(f"{prefix}{event['time']:.3f}s: Avg speed {event['avg_speed']:.2f} outside range "
+              f"[{event['lower_bound']:.2f}, {event['upper_bound']:.2f}] - Click")
+    print(f"Replayed {duration:.1f}s of footage in {elapsed:.1f}s ({len(events)} clicks)")
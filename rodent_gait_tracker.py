@@ -2,45 +2,60 @@
 RODENT GAIT TRACKER (RGT)
 """
 
-import cv2
-import numpy as np
 import time
+LAUNCHED = time.perf_counter()  # Start of the startup timeline (--profile-startup)
 import threading
-import mss
-import pyautogui
 import tkinter as tk
 from tkinter import messagebox, ttk
 import sys
 import json
 import os
-import smtplib
-from email.message import EmailMessage
+
+from instrumentation import NULL_METRICS, StartupProfile, make_instrumentation
+from tracker_thread import STATUS_POLL_MS, TrackerThread
+
+# Only light modules are imported above so the setup dialogs appear immediately; the rest
+# (OpenCV, NumPy, the pipeline, mss, pyautogui, SMTP) is imported by preload_modules() on a
+# background thread while the dialogs are up, and again (instantly) where it is used
+startup = StartupProfile(LAUNCHED)
+startup.mark("imports")
 
 # CONFIGURATION
-# Camera
-FRAME_RATE = 500  # Photron camera frame rate
-FRAME_SKIP = 25  # Determines fps (FRAME_RATE/FRAME_SKIP)
-RESOLUTION = (640, 480)  # Downscale resolution (set to None for original)
-# Speed/tracking
-SPEED_RANGE_PERCENT = 50  # 50% range for speed trigger
-IN_RANGE_DURATION = 0.5  # Seconds to maintain speed range before click
+# Camera and speed/tracking settings live in gait_pipeline.py
 # Files
 COORDINATES_FILE = "coordinates.json" # File to store coordinates
 CONFIG_FILE = "config.json" # File to store email settings
+ARENAS_FILE = "arenas.json" # Optional list of arenas (walkways) tracked from one screen grab
 
-SPEEDS_CAP = 30  # Max entries for speeds
-
-time_expired_event = threading.Event() # Initialize as a threading.Event
 send_email_flag = False
 
-# Screen capture/clicking
-sct = mss.mss()
-MONITOR_SIDEVIEW = {}
-CLICK_POSITION = (0, 0)
-pyautogui.FAILSAFE = True  # Move mouse to top-left corner to abort
-pyautogui.PAUSE = 0.01  # Small delay for each action
+# Heavy modules imported in the background at startup, in dependency order
+PRELOAD_MODULES = ["numpy", "cv2", "gait_pipeline", "arenas", "calibration", "quality", "journal", "frame_sources", "capture_pipeline",
+                   "mss", "pyautogui", "smtplib", "email.message", "notifications"]
 
 initial_settings = {}
+session = None  # The running TrackingSession
+notifier = None  # Email NotificationWorker, started once setup is complete
+
+
+
+"""
+STARTUP
+"""
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            startup.time_import(name)
+        except Exception as e:
+            print(f"Error preloading {name}: {e}")
+
+# pyautogui for screen clicking, configured on first use
+def get_pyautogui():
+    import pyautogui
+    pyautogui.FAILSAFE = True  # Move mouse to top-left corner to abort
+    pyautogui.PAUSE = 0.01  # Small delay for each action
+    return pyautogui
 
 
 
@@ -50,65 +65,6 @@ FUNCTIONS
 
 # RODENT SELECTION
 
-RODENT_CONFIGS = {
-    "Black Rat": {
-        "MIN_AREA": 500, # Minimum contour area for mouse
-        "LOWER_GREEN": np.array([40, 50, 50]), # HSV range for green screen
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 180, # Max Value (HSV) to exclude lighter tail
-        "MIN_CLICK_INTERVAL": 4  # Minimum seconds between clicks
-    },
-    "White Rat": {
-        "MIN_AREA": 500,
-        "LOWER_GREEN": np.array([40, 50, 50]),
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 150,
-        "MIN_CLICK_INTERVAL": 4
-    },
-    "Black and White Rat": {
-        "MIN_AREA": 500,
-        "LOWER_GREEN": np.array([40, 50, 50]),
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 180,
-        "MIN_CLICK_INTERVAL": 4
-    },
-    "Brown Rat": {
-        "MIN_AREA": 500,
-        "LOWER_GREEN": np.array([35, 50, 50]),
-        "UPPER_GREEN": np.array([85, 255, 255]),
-        "VALUE_THRESHOLD": 170,
-        "MIN_CLICK_INTERVAL": 4
-    },
-    "Black Mouse": {
-        "MIN_AREA": 200,
-        "LOWER_GREEN": np.array([40, 50, 50]),
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 180,
-        "MIN_CLICK_INTERVAL": 2.5
-    },
-    "White Mouse": {
-        "MIN_AREA": 200,
-        "LOWER_GREEN": np.array([40, 50, 50]),
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 150,
-        "MIN_CLICK_INTERVAL": 2.5
-    },
-    "Brown Mouse": {
-        "MIN_AREA": 200,
-        "LOWER_GREEN": np.array([35, 50, 50]),
-        "UPPER_GREEN": np.array([85, 255, 255]),
-        "VALUE_THRESHOLD": 170,
-        "MIN_CLICK_INTERVAL": 2.5
-    },
-    "Black and White Mouse": {
-        "MIN_AREA": 200,
-        "LOWER_GREEN": np.array([40, 50, 50]),
-        "UPPER_GREEN": np.array([80, 255, 255]),
-        "VALUE_THRESHOLD": 180,
-        "MIN_CLICK_INTERVAL": 2.5
-    }
-}
-
 # Create pop-up window for rodent selection
 def create_rodent_selection_popup():
     popup = tk.Toplevel()
@@ -222,6 +178,20 @@ def load_coordinates():
         print(f"Error loading coordinates: {e}")
         return None
 
+# Load the arenas to track together, validated against the selected rodent profile (None for a single arena)
+def load_arenas():
+    if not os.path.exists(ARENAS_FILE):
+        return None
+    try:
+        with open(ARENAS_FILE, 'r') as f:
+            entries = json.load(f)
+        from arenas import arena_settings
+        arena_settings({**initial_settings, "arenas": entries})
+        return entries
+    except Exception as e:
+        print(f"Error loading arenas: {e}")
+        return None
+
 # Create pop-up window for choosing coordinates
 def create_side_view_and_click_selection_popup():
     popup = tk.Toplevel()
@@ -250,7 +220,7 @@ def create_side_view_and_click_selection_popup():
             popup.bind("<t>", lambda e: save_top_left())
             ok_button.config(state="disabled")
         def save_top_left():
-            top_left[0] = pyautogui.position()
+            top_left[0] = get_pyautogui().position()
             print(f"Top-left: {top_left[0]}")
             update_instruction(f"Captured top-left: {top_left[0]}. Click OK to proceed to bottom-right.")
             ok_button.config(command=get_bottom_right, state="normal")
@@ -265,7 +235,7 @@ def create_side_view_and_click_selection_popup():
             popup.bind("<b>", lambda e: save_bottom_right())
             ok_button.config(state="disabled")
         def save_bottom_right():
-            bottom_right[0] = pyautogui.position()
+            bottom_right[0] = get_pyautogui().position()
             print(f"Bottom-right: {bottom_right[0]}")
             update_instruction(f"Captured bottom-right: {bottom_right[0]}. Click OK to proceed to click position.")
             ok_button.config(command=get_click, state="normal")
@@ -280,7 +250,7 @@ def create_side_view_and_click_selection_popup():
             popup.bind("<c>", lambda e: save_click())
             ok_button.config(state="disabled")
         def save_click():
-            click[0] = pyautogui.position()
+            click[0] = get_pyautogui().position()
             print(f"Click position: {click[0]}")
             update_instruction(f"Captured click: {click[0]}. Click OK to finish.")
             ok_button.config(command=finish, state="normal")
@@ -549,20 +519,8 @@ def create_email_selection_popup(config):
 
 # Load email configuration
 def load_email_config():
-    if not os.path.exists(CONFIG_FILE):
-        print(f"Error: {CONFIG_FILE} not found. Please create it with email settings.")
-        return None
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-        required_keys = ["sender_email", "app_password", "recipient_email"]
-        if not all(key in config for key in required_keys):
-            print(f"Error: {CONFIG_FILE} missing required keys: {required_keys}")
-            return None
-        return config
-    except Exception as e:
-        print(f"Error loading {CONFIG_FILE}: {e}")
-        return None
+    from notifications import load_email_config as load_config_file
+    return load_config_file(CONFIG_FILE)
 
 # Save email
 def save_email(config, new_email):
@@ -571,29 +529,14 @@ def save_email(config, new_email):
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f, indent=4)
         print(f"{config["recipient_email"]} saved to {CONFIG_FILE}")
+        if notifier is not None:
+            notifier.reload_config()
     except Exception as e:
         print(f"Error saving email: {e}")
 
-# Send email notification
+# Queue email notification; the notifier thread sends it so tracking never waits on SMTP
 def send_email(subject, body):
-    config = load_email_config()
-    if not config:
-        print("Email not sent: No valid email configuration")
-        return None
-    try:
-        msg = EmailMessage()
-        msg.set_content(body)
-        msg['Subject'] = subject
-        msg['From'] = config["sender_email"]
-        msg['To'] = config["recipient_email"]
-        
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(config["sender_email"], config["app_password"])
-            server.send_message(msg)
-        print("Email sent successfully")
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    notifier.notify(subject, body)
 
 
 
@@ -613,20 +556,17 @@ def create_restart_window(ending):
     def on_restart():
         print("Restart initiated")
         popup.destroy()
-        # Save settings and restart
+        # Save settings and start a new session once this one has closed
         with open("rgt_settings.json", "w") as f:
             json.dump(initial_settings, f)
-        os.execl(sys.executable, sys.executable, *sys.argv)
+        session.restart = True
         
     def on_cancel():
         print("\"Cancel\" selected, deleting settings and exiting")
         if os.path.exists("rgt_settings.json"):
             os.remove("rgt_settings.json")
             print("rgt_settings.json deleted")
-        global should_stop
-        should_stop = True
-        if 'timer' in globals():
-            timer.cancel()
+        session.cancel_timer()
         popup.destroy()
 
     button_frame = tk.Frame(popup)
@@ -664,9 +604,8 @@ def create_stop_button_window():
     stop_window.geometry(f"{window_width}x{window_height}+{int(x_position)}+{int(y_position)}")
     
     def on_stop():
-        global should_stop
         print("Stop button clicked")
-        should_stop = True
+        session.send("stop")
         if os.path.exists("rgt_settings.json"):
             os.remove("rgt_settings.json")
             print("rgt_settings.json deleted")
@@ -678,7 +617,7 @@ def create_stop_button_window():
     def on_cancel():
         stop_window.destroy()
         print("Stop window closed — recreating...")
-        create_stop_button_window()
+        session.stop_window = create_stop_button_window()
     
     stop_window.protocol("WM_DELETE_WINDOW", on_cancel)
 
@@ -689,6 +628,7 @@ def create_stop_button_window():
 
     stop_window.update()  # Force window to render
     print("Stop window created")
+    return stop_window
 
 
 
@@ -714,13 +654,13 @@ def create_control_panel():
     
     duration_frame = tk.Frame(control_panel)
     duration_frame.pack()
-    speed_duration = tk.StringVar(value=str(IN_RANGE_DURATION))
+    speed_duration = tk.StringVar(value=str(session.in_range_duration))
     tk.Label(duration_frame, text="Speed Duration (sec):").pack(pady=10, side='left')
     tk.Entry(duration_frame, textvariable=speed_duration, width=4).pack(pady=2, padx=5, side='left')
     
     tolerance_frame = tk.Frame(control_panel)
     tolerance_frame.pack()
-    speed_tolerance = tk.StringVar(value=str(SPEED_RANGE_PERCENT))
+    speed_tolerance = tk.StringVar(value=str(session.speed_range_percent))
     tk.Label(tolerance_frame, text="Speed Range %:").pack(pady=5, side='left')
     tk.Entry(tolerance_frame, textvariable=speed_tolerance, width=4).pack(pady=2, padx=5, side='left')
     
@@ -730,11 +670,11 @@ def create_control_panel():
             new_tolerance_value = float(speed_tolerance.get())
             if new_duration_value <= 0 or new_tolerance_value < 0 or new_tolerance_value > 100:
                 raise ValueError("• All values must be positive\n• Duration must be greater than 0\n• % must be between 0-100")
-            global IN_RANGE_DURATION, SPEED_RANGE_PERCENT
-            IN_RANGE_DURATION = new_duration_value
-            SPEED_RANGE_PERCENT = new_tolerance_value
+            session.in_range_duration = new_duration_value
+            session.speed_range_percent = new_tolerance_value
             print(f"IN_RANGE_DURATION set for {new_duration_value} seconds")
             print(f"SPEED_RANGE_PERCENT set for {new_tolerance_value} percent")
+            session.send("settings", (new_tolerance_value, new_duration_value))
             save_button.config(bg="green", fg="white")
             root.after(200, lambda: save_button.config(bg="white", fg="black"))
         except ValueError as e:
@@ -743,6 +683,35 @@ def create_control_panel():
     save_button = tk.Button(control_panel, text="Save", command=lambda: on_save(save_button))
     save_button.pack(pady=10)
 
+    # Live stage latencies when instrumentation is on
+    metrics = session.metrics
+    if metrics.enabled:
+        control_panel.geometry(f"{window_width}x{window_height + 190}+{int(x_position)}+{int(y_position - 190)}")
+        window_height += 190
+        y_position -= 190
+        metrics_label = tk.Label(control_panel, font=("Courier", 9), justify="left")
+        metrics_label.pack(pady=5)
+
+        def refresh_metrics():
+            if control_panel.winfo_exists():
+                metrics_label.config(text=metrics.summary())
+                control_panel.after(1000, refresh_metrics)
+        refresh_metrics()
+
+    # Clicks and average speed of every arena when several are tracked
+    if len(session.arenas) > 1:
+        arenas_height = 20 * len(session.arenas) + 10
+        control_panel.geometry(f"{window_width}x{window_height + arenas_height}+{int(x_position)}+{int(y_position - arenas_height)}")
+        arenas_label = tk.Label(control_panel, font=("Courier", 9), justify="left")
+        arenas_label.pack(pady=5)
+
+        def refresh_arenas():
+            if control_panel.winfo_exists():
+                if session.arena_tracker is not None:
+                    arenas_label.config(text=session.arena_tracker.summary())
+                control_panel.after(1000, refresh_arenas)
+        refresh_arenas()
+
     control_panel.update()
     return control_panel
 
@@ -759,6 +728,7 @@ try:
 except Exception as e:
     print(f"Tkinter initialization error: {e}")
     sys.exit(1)
+startup.mark("Tk root")
 
 # Get the icon to show on every window
 if hasattr(sys, '_MEIPASS'):
@@ -780,161 +750,216 @@ def center_window(popup, window_width, window_height):
 
 
 
-# GAIT TRACKER FUNCTION
+# TRACKING SESSION
+
+# Per-run state: everything Restart has to reset. The settings (rodent profile, coordinates,
+# limits) carry over, so Restart runs a fresh session in this process instead of re-executing RGT.
+class TrackingSession:
+    def __init__(self, settings):
+        from arenas import arena_settings
+        from gait_pipeline import IN_RANGE_DURATION, SPEED_RANGE_PERCENT
+        self.settings = settings
+        self.arenas = arena_settings(settings)  # One walkway, or every entry of settings["arenas"]
+        self.arena_tracker = None  # Per-arena state and counters, once tracking has started
+        self.speed_range_percent = SPEED_RANGE_PERCENT  # Adjustable from the control panel
+        self.in_range_duration = IN_RANGE_DURATION
+        self.time_expired_event = threading.Event()
+        self.timer = None
+        self.tracker = None  # Tracker thread, with its command and status channels
+        self.metrics = NULL_METRICS  # Stage timers (see instrumentation.py)
+        self.stop_window = None
+        self.restart = False  # Set by the restart window's Restart button
+
+    # Run tracking on its own thread while Tk keeps the stop, adjust and restart windows responsive.
+    # Returns once tracking has finished and any restart window has closed; True if Restart was chosen.
+    def run(self, source=None):
+        self.metrics = make_instrumentation()
+        self.stop_window = create_stop_button_window()
+        
+        # Start timer if set
+        if (self.settings.get("timer_value") or 0) > 0:
+            timer_duration = self.settings["timer_value"] * 60
+            self.timer = threading.Timer(timer_duration, lambda: time_expiration(self.time_expired_event))
+            self.timer.daemon = True
+            self.timer.start()
+        
+        self.tracker = TrackerThread(track_session, self, source).start()
+        root.after(STATUS_POLL_MS, self.poll)
+        root.mainloop()
+        self.tracker.join(timeout=2.0)
+        return self.restart
+
+    # Send a command to the tracker thread
+    def send(self, command, value=None):
+        if self.tracker is not None:
+            self.tracker.send(command, value)
+
+    def cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+
+    # Check the tracker's status channel from the Tk main loop
+    def poll(self):
+        stage_start = time.perf_counter()
+        for kind, value in self.tracker.poll():
+            if kind == "error":
+                messagebox.showerror("RGT", f"Tracking stopped: {value}")
+            elif kind == "finished":
+                self.finish(value)
+                return
+        self.metrics.record("gui", time.perf_counter() - stage_start)
+        root.after(STATUS_POLL_MS, self.poll)
+
+    # Close the stop window and, if tracking ended by itself, offer a restart; then leave the Tk main loop
+    def finish(self, ending):
+        try:
+            self.stop_window.destroy()
+        except tk.TclError:
+            pass
+        self.cancel_timer()
+        if ending:
+            create_restart_window(ending)
+        root.quit()
 
-def gait_tracker():
-    global should_stop, timer
-    time_expired_event.clear()
-    
-    # Camera variables
-    frame_count = 0
-    last_centroid = None
-    # Speed/tracking variables
-    speeds = []
-    last_click_time = 0
-    in_range_timestamps = []
-    is_in_range_for_duration = False
-    click_counter = 0
-    
-    # Start timer if set
-    if initial_settings.get("timer_value", 0) > 0:
-        timer_duration = initial_settings["timer_value"] * 60
-        timer = threading.Timer(timer_duration, lambda: time_expiration(time_expired_event))
-        timer.start()
-    
-    while not should_stop:
+# Tracking loop; runs on the session's tracker thread and never touches Tk.
+# Returns the ending shown in the restart window, or None if tracking was stopped.
+def track_session(tracker, session, source=None):
+    from arenas import Arena, ArenaTracker
+    from calibration import CALIBRATION, describe_calibration, load_calibration
+    from capture_pipeline import FramePipeline
+    from frame_sources import CaptureScheduler, MssFrameSource
+    from gait_pipeline import (ANALYSIS_RATE, MOTION_IDLE_RATE, RESOLUTION, SEGMENTATION_ENGINE, SEGMENTERS, MotionGate,
+                               RoiTracker)
+    from journal import JOURNAL, TelemetryJournal
+    from quality import QUALITY_CONTROL, QualityController, segmenter_options
+    pyautogui = get_pyautogui()
+    metrics = session.metrics
+    speed_range_percent, in_range_duration = session.speed_range_percent, session.in_range_duration
+    
+    # Every analyzed frame is recorded to a journal, so any click (or missing click) can be explained afterwards
+    journal = TelemetryJournal.for_session([settings["name"] for settings in session.arenas]) if JOURNAL else None
+    # Read frames from the live side views (one grab covering every arena) unless another source
+    # (e.g. a recording of that rectangle) is given
+    live = source is None
+    # Static masks learned from the empty arenas by calibration.py, for the saved coordinates
+    calibrations = [load_calibration(settings) if CALIBRATION and live else None for settings in session.arenas]
+    # Segmentation buffers and speed/tracking variables, per arena
+    arenas = ArenaTracker([Arena(settings, RESOLUTION, metrics=metrics, calibration=calibration)
+                           for settings, calibration in zip(session.arenas, calibrations)], journal, decimate_capture=live)
+    session.arena_tracker = arenas
+    several = len(arenas.arenas) > 1
+    for arena in arenas.arenas:
+        if arena.calibration is not None:
+            print(f"{arena.name}: calibrated {describe_calibration(arena.calibration)}")
+    if live:
+        # Decimated before conversion under DOWNSCALE = "pyramid"; not converted at all for the "chroma" engine
+        source = MssFrameSource(arenas.monitor(), decimation=arenas.decimation,
+                                raw=SEGMENTERS[SEGMENTATION_ENGINE].reads_raw_capture)
+    
+    # Stage timers; a no-op stand-in unless INSTRUMENTATION is set
+    source.metrics = metrics
+    # Camera variables: capture runs on its own thread, paced to ANALYSIS_RATE
+    scheduler = CaptureScheduler(source)
+    pipeline = FramePipeline(scheduler).start()
+    # Live capture drops to MOTION_IDLE_RATE while no arena sees motion; spaced stays set until
+    # frames arrive at the full rate again, so no speed is measured across the longer gaps
+    idle_rate = MOTION_IDLE_RATE if live else None
+    slowed = spaced = False
+    last_time = None
+    # Live analysis steps down the quality ladder while it can't keep up (replays stay at full quality)
+    controller = QualityController() if QUALITY_CONTROL and live else None
+    full_rate = ANALYSIS_RATE  # Capture rate while anything moves, lowered by the bottom quality levels
+    ending = None
+    
+    while True:
+        # Apply commands from the GUI
+        commands = tracker.take_commands()
+        if ("stop", None) in commands:
+            break
+        for command, value in commands:
+            if command == "settings":
+                speed_range_percent, in_range_duration = value
+        
         # Check to see if timer has expired
-        if time_expired_event.is_set():
-            should_stop = True
-            try:
-                stop_window.destroy()
-                create_restart_window("Timer Expired")
-            except NameError:
-                root.quit()
-                root.destroy()
-                break
+        if session.time_expired_event.is_set():
+            ending = "Timer Expired"
+            break
         
-        # Format side view
-        side_view = np.array(sct.grab(MONITOR_SIDEVIEW))
-        side_view = cv2.cvtColor(side_view, cv2.COLOR_RGBA2BGR)
-
-        # Reduce frame count
-        frame_count += 1
-        if frame_count % FRAME_SKIP != 0:
+        # Take the next captured side view
+        frame = pipeline.get()
+        if frame is None:
+            if pipeline.exhausted:  # Recording exhausted
+                break
             continue
-
-        # Downscale side_view if specified
-        if RESOLUTION:
-            side_view = cv2.resize(side_view, RESOLUTION)
-
-        # Green screen segmentation on side view
-        hsv = cv2.cvtColor(side_view, cv2.COLOR_BGR2HSV)
-        lower_green = np.array(initial_settings["LOWER_GREEN"], dtype=np.uint8)
-        upper_green = np.array(initial_settings["UPPER_GREEN"], dtype=np.uint8)
-        mask = cv2.inRange(hsv, lower_green, upper_green)
-        mask = cv2.bitwise_not(mask)  # Invert to keep mouse
-        # Filter out lighter tail based on Value channel
-        value_mask = cv2.inRange(hsv[:, :, 2], 0, initial_settings["VALUE_THRESHOLD"])
-        mask = cv2.bitwise_and(mask, value_mask)
-        # Morphological operations to remove tail
-        kernel = np.ones((3, 3), np.uint8)
-        mask = cv2.erode(mask, kernel, iterations=5)  # Aggressive erosion for thin tail
-        mask = cv2.dilate(mask, kernel, iterations=2)  # Restore body shape
-
-        # Find mouse contour and centroid in side view
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        centroid = None
-        if contours:
-            largest = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest)
-            if area > initial_settings["MIN_AREA"]:
-                x, y, w, h = cv2.boundingRect(largest)
-                centroid = (x + w//2, y + h//2)
-                # Uncomment if you want to see the window showing the green box around the rat (1/2)
-                # cv2.rectangle(side_view, (x, y), (x+w, y+h), (0, 255, 0), 2)
-        # Calculate speed
-        speed = 0
-        current_time = time.time()
-        if centroid and last_centroid is not None:
-            dx = centroid[0] - last_centroid[0]
-            speed = abs(dx) * FRAME_RATE / FRAME_SKIP
-            speeds.append(speed)
-            speeds = [s for s in speeds if current_time - time.time() <= IN_RANGE_DURATION and s < 4000]
-            if len(speeds) > SPEEDS_CAP:
-                speeds.pop(0)
-        else:
-            speeds = []
-
-        # Calculate average speed
-        avg_speed = np.mean(speeds) if speeds else 0.0
-
-        # Check if all speed measurements are within SPEED_RANGE_PERCENT
-        lower_bound = avg_speed * (1 - (SPEED_RANGE_PERCENT / 100))
-        upper_bound = avg_speed * (1 + (SPEED_RANGE_PERCENT / 100))
-
-        all_within_range = all(lower_bound <= speed <= upper_bound for speed in speeds) if speeds else False
-        all_significant = all(50 <= speed for s in speeds) if speeds else False
-
-        if all_significant and all_within_range:
-            in_range_timestamps.append(current_time)
-            # Check if speed has been in range for IN_RANGE_DURATION
-            if in_range_timestamps and (current_time - in_range_timestamps[0]) >= IN_RANGE_DURATION:
-                is_in_range_for_duration = True
-            # Remove timestamps older than IN_RANGE_DURATION
-            in_range_timestamps = [t for t in in_range_timestamps if current_time - t <= IN_RANGE_DURATION]
-        else:
-            # Speed is out of range, clear timestamps to reset timer
-            in_range_timestamps = []
+        slot, grab, current_time = frame  # current_time is when the frame was grabbed
+        metrics.tick()
+
+        # Find mouse centroid in each arena's side view (a view of the grab), calculate speed and check the trigger condition
+        stage_start = time.perf_counter()
+        gap = last_time is not None and current_time - last_time > 1.5 / full_rate
+        last_time = current_time
+        clicks = arenas.process(grab, current_time, speed_range_percent, in_range_duration, after_gap=spaced and gap)
+        pipeline.release(slot)
+        analysis_seconds = time.perf_counter() - stage_start
+        pipeline.record("analysis", analysis_seconds)
+        if controller and not arenas.idle and controller.record(analysis_seconds):
+            quality = controller.settings
+            arenas.set_quality(quality["scale"], controller.frame_skip(), **segmenter_options(quality))
+            full_rate = controller.rate()
+            if not slowed:
+                scheduler.set_rate(full_rate)
+        if idle_rate:
+            if arenas.idle != slowed:
+                slowed = arenas.idle
+                scheduler.set_rate(idle_rate if slowed else full_rate)
+            spaced = slowed or (spaced and gap)
+
+        stage_start = time.perf_counter()
+        for arena, click in clicks:
             # Simulate click if speed was in range for IN_RANGE_DURATION and there's been MIN_CLICK_INTERVAL seconds between clicks
-            if is_in_range_for_duration and (current_time - last_click_time) >= initial_settings["MIN_CLICK_INTERVAL"]:
-                print(f"Avg speed {avg_speed:.2f} outside range [{lower_bound:.2f}, {upper_bound:.2f}] - Simulating click")
-                pyautogui.click(x=CLICK_POSITION[0], y=CLICK_POSITION[1])
-                last_click_time = current_time
-                is_in_range_for_duration = False  # Reset flag after click
-                click_counter += 1
-                if click_counter == initial_settings['click_value'] and send_email_flag:  # Send email if click limit is reached
-                    print("Sending click limit email")
-                    email_subject = f"RGT Video Limit Reached at {time.ctime()}"
-                    email_body = f"{initial_settings['click_value']} videos recorded at {time.ctime()}.\nRGT has stopped recording, so you will need to process those videos then restart the program."
-                    send_email(email_subject, email_body)
-                if click_counter >= initial_settings.get("click_value", float('inf')):  # Pause program if click limit is reached
-                    should_stop = True
-                    try:
-                        stop_window.destroy()
-                        if 'timer' in globals():
-                            timer.cancel()
-                        create_restart_window("Click Limit Reached")
-                    except (NameError, tk.TclError):
-                        root.quit()
-                        root.destroy()
-                        break
-
-        last_centroid = centroid
+            prefix = f"{arena.name}: " if several else ""
+            print(f"{prefix}Avg speed {click['avg_speed']:.2f} outside range [{click['lower_bound']:.2f}, {click['upper_bound']:.2f}] - Simulating click")
+            pyautogui.click(x=arena.click_position[0], y=arena.click_position[1])
+            if arena.clicks == arena.settings['click_value'] and send_email_flag:  # Send email if click limit is reached
+                print(f"Sending {prefix}click limit email")
+                email_subject = f"RGT Video Limit Reached at {time.ctime()}"
+                email_body = f"{prefix}{arena.settings['click_value']} videos recorded at {time.ctime()}.\nRGT has stopped recording, so you will need to process those videos then restart the program."
+                send_email(email_subject, email_body)
+        if arenas.done:  # Pause program once every arena has reached its click limit
+            ending = "Click Limit Reached"
+            break
+        pipeline.record("clicks", time.perf_counter() - stage_start)
         
         # Uncomment if you want to see the window showing the green box around the rat (2/2)
         # # Display speed, average speed, set speed range, and in-range status on side view
+        # import cv2
+        # trigger, side_view = arenas.arenas[0].trigger, grab[arenas.arenas[0].window]
+        # speed, avg_speed, is_in_range_for_duration = trigger.speed, trigger.avg_speed, trigger.is_in_range_for_duration
         # cv2.putText(side_view, f"Speed: {speed:.2f} px/s", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         # cv2.putText(side_view, f"Avg Speed: {avg_speed:.2f} px/s", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         # status_text = "In Range for 2.0s: Yes" if is_in_range_for_duration else "In Range for 2.0s: No"
         # cv2.putText(side_view, status_text, (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
         # cv2.imshow('Mouse Speed Tracker (Side View)', side_view)
-        
-        try:
-            if not should_stop:
-                root.update()
-        except Exception as e:
-            print(f"Tkinter update error: {e}")
-            break
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):  # Emergency off button
-            should_stop = True
-            try:
-                stop_window.destroy()
-                if 'timer' in globals():
-                    timer.cancel()
-            except (NameError, tk.TclError):
-                pass
-            break
+        # cv2.waitKey(1)
+
+    pipeline.stop()
+    if live:
+        source.close()
+    print(scheduler.report())
+    print(pipeline.report())
+    print(arenas.report())
+    if controller:
+        print(controller.report())
+    if journal:
+        journal.close()
+        print(f"Journal: {journal.count} records in {journal.path}")
+    for arena in arenas.arenas:
+        if isinstance(arena.segmenter, (MotionGate, RoiTracker)):
+            print(f"{arena.name}: {arena.segmenter.report()}")
+    if metrics.enabled:
+        metrics.export()
+        print(metrics.report())
+    return ending
 
 
 
@@ -943,8 +968,9 @@ MAIN PROGRAM STARTS
 """
 
 if __name__ == "__main__":
-    global should_stop
-    should_stop = False
+    preloader = threading.Thread(target=preload_modules, name="RGT preload", daemon=True)
+    preloader.start()
+    root.after_idle(lambda: startup.mark("first dialog shown"))
 
     # Load or create settings
     if os.path.exists("rgt_settings.json"):
@@ -956,28 +982,26 @@ if __name__ == "__main__":
             print("Program cancelled at rodent selection")
             root.destroy()
             sys.exit(0)
-        initial_settings["MIN_AREA"] = RODENT_CONFIGS[selected_rodent]["MIN_AREA"]
-        initial_settings["LOWER_GREEN"] = RODENT_CONFIGS[selected_rodent]["LOWER_GREEN"].tolist()
-        initial_settings["UPPER_GREEN"] = RODENT_CONFIGS[selected_rodent]["UPPER_GREEN"].tolist()
-        initial_settings["VALUE_THRESHOLD"] = RODENT_CONFIGS[selected_rodent]["VALUE_THRESHOLD"]
-        initial_settings["MIN_CLICK_INTERVAL"] = RODENT_CONFIGS[selected_rodent]["MIN_CLICK_INTERVAL"]
-
-        saved_coords = load_coordinates()
-        choice = create_coordinate_choice_popup(saved_coords)
-        if choice == "cancel":
-            print("Program cancelled at coordinate selection")
-            root.destroy()
-            sys.exit(0)
-        elif choice == "saved":
-            initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"] = saved_coords
+        from gait_pipeline import rodent_settings
+        initial_settings.update(rodent_settings(selected_rodent))
+
+        # Several walkways on one monitor: their coordinates come from arenas.json
+        arenas = load_arenas()
+        if arenas:
+            initial_settings["arenas"] = arenas
+            print(f"Tracking {len(arenas)} arenas from {ARENAS_FILE}")
         else:
-            initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"] = create_side_view_and_click_selection_popup()
-            save_coordinates(initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"])
-        MONITOR_SIDEVIEW = {"top": initial_settings["top_left"][1], "left": initial_settings["top_left"][0],
-                           "width": initial_settings["bottom_right"][0] - initial_settings["top_left"][0],
-                           "height": initial_settings["bottom_right"][1] - initial_settings["top_left"][1]}
-        CLICK_POSITION = initial_settings["click"]
-        
+            saved_coords = load_coordinates()
+            choice = create_coordinate_choice_popup(saved_coords)
+            if choice == "cancel":
+                print("Program cancelled at coordinate selection")
+                root.destroy()
+                sys.exit(0)
+            elif choice == "saved":
+                initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"] = saved_coords
+            else:
+                initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"] = create_side_view_and_click_selection_popup()
+                save_coordinates(initial_settings["top_left"], initial_settings["bottom_right"], initial_settings["click"])
         initial_settings["click_value"] = create_click_limit_popup()
         if initial_settings["click_value"] == "cancel":
             print("Program cancelled at click limit selection")
@@ -996,21 +1020,27 @@ if __name__ == "__main__":
             sys.exit(0)
         else:
             initial_settings["recipient_email"] = email
-    stop_window = create_stop_button_window()
-    MONITOR_SIDEVIEW = {"top": initial_settings["top_left"][1], "left": initial_settings["top_left"][0],
-                       "width": initial_settings["bottom_right"][0] - initial_settings["top_left"][0],
-                       "height": initial_settings["bottom_right"][1] - initial_settings["top_left"][1]}
-    CLICK_POSITION = initial_settings["click"]
-
-    # Run gait tracker
-    gait_tracker()
+    startup.mark("setup")
+    preloader.join()
+    startup.mark("background imports finished")
+    if "--profile-startup" in sys.argv:
+        print(startup.report())
+
+    from notifications import NotificationWorker
+    notifier = NotificationWorker(load_email_config).start()
+
+    # Run tracking sessions until one ends without Restart
+    while True:
+        session = TrackingSession(initial_settings)
+        if not session.run():
+            break
+        print("Restarting session")
     
     # Cleanup
     try:
-        if 'stop_window' in globals() and stop_window is not None and stop_window.winfo_exists():
-            stop_window.destroy()
-        if 'timer' in globals():
-            timer.cancel()
+        if session.stop_window is not None and session.stop_window.winfo_exists():
+            session.stop_window.destroy()
+        session.cancel_timer()
         if os.path.exists("rgt_settings.json"):
             os.remove("rgt_settings.json")
         root.quit()
@@ -1019,6 +1049,6 @@ if __name__ == "__main__":
         print(f"Error during cleanup: {e}")
         root.quit()
         root.destroy()
+    notifier.stop()  # Send any queued email before exiting
     print("Cleaned up")
-    cv2.destroyAllWindows()
     sys.exit(0)
\ No newline at end of file
@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['cv2.gapi', 'cv2.typing'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,110 @@
+"""
+SPEED ESTIMATION
+"""
+
+from collections import deque
+
+# CONFIGURATION
+FILTER_ALPHA = 0.5  # Position correction gain (0-1): lower trusts the prediction more
+FILTER_BETA = 0.2  # Velocity correction gain (0-1): lower gives a smoother but slower speed
+
+
+
+# Alpha-beta filter on horizontal position and velocity, driven by the real capture timestamp
+# of each frame instead of an assumed frame interval. Velocity is in pixels per second.
+class AlphaBetaFilter:
+    def __init__(self, alpha=FILTER_ALPHA, beta=FILTER_BETA):
+        self.alpha = alpha
+        self.beta = beta
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.timestamp = None
+
+    # Feed one measurement; returns the filtered velocity, or None until two measurements have been seen
+    def update(self, position, timestamp):
+        if self.position is None:
+            self.position = float(position)
+            self.timestamp = timestamp
+            return None
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return self.velocity
+        self.timestamp = timestamp
+        if self.velocity is None:
+            # Second measurement: start from the finite difference
+            self.velocity = (position - self.position) / dt
+            self.position = float(position)
+            return self.velocity
+        predicted = self.position + self.velocity * dt
+        residual = position - predicted
+        self.position = predicted + self.alpha * residual
+        self.velocity += self.beta * residual / dt
+        return self.velocity
+
+
+
+# Timestamped speeds in a fixed-capacity ring buffer. A running sum gives the mean and
+# monotonic deques give the min and max, so each push/expire and every query is O(1) amortised.
+class RollingSpeedWindow:
+    __slots__ = ("capacity", "times", "values", "start", "end", "total", "min_queue", "max_queue")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.values = [0.0] * capacity
+        self.min_queue = deque()  # Sequence numbers with increasing values
+        self.max_queue = deque()  # Sequence numbers with decreasing values
+        self.clear()
+
+    def clear(self):
+        self.start = 0  # Sequence number of the oldest speed
+        self.end = 0  # Sequence number the next speed will get
+        self.total = 0.0
+        self.min_queue.clear()
+        self.max_queue.clear()
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _drop_oldest(self):
+        self.total -= self.values[self.start % self.capacity]
+        if self.min_queue[0] == self.start:
+            self.min_queue.popleft()
+        if self.max_queue[0] == self.start:
+            self.max_queue.popleft()
+        self.start += 1
+        if self.start == self.end:
+            self.total = 0.0  # Don't let rounding drift survive an empty window
+
+    def push(self, timestamp, value):
+        if self.end - self.start == self.capacity:
+            self._drop_oldest()
+        index = self.end % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+        self.total += value
+        values, capacity = self.values, self.capacity
+        while self.min_queue and values[self.min_queue[-1] % capacity] >= value:
+            self.min_queue.pop()
+        self.min_queue.append(self.end)
+        while self.max_queue and values[self.max_queue[-1] % capacity] <= value:
+            self.max_queue.pop()
+        self.max_queue.append(self.end)
+        self.end += 1
+
+    # Drop speeds measured more than duration seconds before now
+    def expire(self, now, duration):
+        while self.start < self.end and now - self.times[self.start % self.capacity] > duration:
+            self._drop_oldest()
+
+    def mean(self):
+        return self.total / len(self) if self.end > self.start else 0.0
+
+    def min(self):
+        return self.values[self.min_queue[0] % self.capacity]
+
+    def max(self):
+        return self.values[self.max_queue[0] % self.capacity]
@@ -0,0 +1,351 @@
+"""
+PARAMETER SWEEP
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from batch import find_videos
+from frame_sources import CaptureScheduler, CroppedFrameSource, VirtualClock, open_frame_source
+from gait_pipeline import (FRAME_RATE, FRAME_SKIP, IN_RANGE_DURATION, MAX_SPEED, RESOLUTION, RODENT_CONFIGS, SPEED_ESTIMATOR,
+                           SPEED_WINDOW, SPEEDS_CAP, GaitTrigger, make_scaled_segmenter, rodent_settings,
+                           speed_window_seconds)
+from journal import read_journal
+
+# CONFIGURATION
+SWEEP_SPEED_RANGES = "20:80:5"  # SPEED_RANGE_PERCENT values (start:stop:step, stop included)
+SWEEP_DURATIONS = "0.2:1.0:0.1"  # IN_RANGE_DURATION values (s)
+SWEEP_INTERVALS = "1:5:0.5"  # MIN_CLICK_INTERVAL values (s)
+SWEEP_CHUNK = 256  # Parameter combinations per worker task
+SIGNIFICANT_SPEED = 50  # px/s the latest speed must reach, as in GaitTrigger.update()
+
+
+
+# SERIES
+
+# Capture times and centroids of a recording, segmented once with the given settings (x, y are NaN
+# where no rodent was detected), and the analyzed frames each sample spans since the one before
+# (always 1 here: the motion gate is off, so every frame is measured). The trigger parameters only
+# act on this series, so one segmentation pass serves every combination of them.
+def centroid_series(source, settings, frame_skip=FRAME_SKIP, resolution=RESOLUTION):
+    clock = VirtualClock(source)
+    scheduler = CaptureScheduler(source, frame_skip=frame_skip)
+    segmenter = None  # Built for the size of the first frame
+    times, xs, ys = [], [], []
+    while True:
+        side_view = scheduler.next_frame()
+        if side_view is None:
+            break
+        if segmenter is None:
+            segmenter, to_reference = make_scaled_segmenter(settings, side_view.shape[1::-1], resolution,
+                                                            motion_gating=False)
+        centroid = segmenter.find_centroid(side_view)
+        if centroid is not None and to_reference:
+            centroid = (centroid[0] * to_reference[0], centroid[1] * to_reference[1])
+        times.append(clock.time())
+        xs.append(np.nan if centroid is None else centroid[0])
+        ys.append(np.nan if centroid is None else centroid[1])
+    times = np.array(times)
+    return times, np.array(xs), np.array(ys), np.ones(len(times), np.int64)
+
+# The same series from a telemetry journal (one arena of it). Frames the motion gate skipped measured
+# nothing, so they are dropped and counted into the steps of the next measured frame.
+def journal_series(path, arena=0):
+    records, description = read_journal(path)
+    records = records[records["arena"] == arena]
+    gated = records["gated"] if "gated" in records.dtype.names else np.zeros(len(records), bool)
+    kept = np.flatnonzero(~gated)
+    steps = np.diff(kept, prepend=-1) if len(kept) else np.zeros(0, np.int64)
+    records = records[kept]
+    return (records["time"].astype(np.float64), records["x"].astype(np.float64),
+            records["y"].astype(np.float64), steps.astype(np.int64))
+
+# Per-frame speed and rolling window statistics, exactly as GaitTrigger.update() computes them with
+# the "frame_rate" estimator, for a whole series at once: speed (0 where it isn't measured), the
+# window's mean/min/max and whether the window holds any speed. steps gives the analyzed frames
+# each sample spans since the one before (default 1 each); speed_window is resolved against
+# in_range_duration as the trigger does.
+def speed_statistics(times, xs, frame_rate=FRAME_RATE, frame_skip=FRAME_SKIP, speeds_cap=SPEEDS_CAP,
+                     speed_window=SPEED_WINDOW, steps=None, in_range_duration=IN_RANGE_DURATION):
+    speed_window = speed_window_seconds(speed_window, in_range_duration)
+    count = len(times)
+    if steps is None:
+        steps = np.ones(count, np.int64)
+    detected = ~np.isnan(xs)
+    measured = np.zeros(count, bool)  # Detected in this frame and the one before
+    measured[1:] = detected[1:] & detected[:-1]
+    speed = np.zeros(count)
+    speed[1:] = np.abs(xs[1:] - xs[:-1]) * frame_rate / (frame_skip * steps[1:])
+    speed[~measured] = 0
+    pushed = measured & (speed < MAX_SPEED)
+
+    # The window is cleared on every unmeasured frame, and holds at most the last speeds_cap speeds
+    # pushed since then that are no older than speed_window
+    pushed_times, pushed_speeds = times[pushed], speed[pushed]
+    end = np.cumsum(pushed)  # Speeds pushed up to and including each frame
+    start = np.maximum.accumulate(np.where(measured, 0, end))  # Speeds pushed before the last clear
+    start = np.maximum(start, end - speeds_cap)
+    columns = end[:, None] - speeds_cap + np.arange(speeds_cap)
+    valid = columns >= start[:, None]
+    columns = np.clip(columns, 0, max(0, len(pushed_speeds) - 1))
+    if len(pushed_speeds):
+        window_times, window_speeds = pushed_times[columns], pushed_speeds[columns]
+    else:
+        window_times = window_speeds = np.zeros(columns.shape)
+    if speed_window is not None:
+        valid &= ~(times[:, None] - window_times > speed_window)
+    valid[~measured] = False
+    size = valid.sum(axis=1)
+    has = size > 0
+    mean = np.where(has, np.where(valid, window_speeds, 0).sum(axis=1) / np.maximum(size, 1), 0.0)
+    low = np.where(valid, window_speeds, np.inf).min(axis=1)
+    high = np.where(valid, window_speeds, -np.inf).max(axis=1)
+    return {"speed": speed, "mean": mean, "min": low, "max": high, "has": has}
+
+
+
+# TRIGGER RULES
+
+# In-range flags of every frame for each SPEED_RANGE_PERCENT value: shape (percents, frames)
+def in_range_matrix(stats, percents):
+    percents = np.asarray(percents, np.float64)[:, None]
+    lower = stats["mean"] * (1 - (percents / 100))
+    upper = stats["mean"] * (1 + (percents / 100))
+    significant = stats["has"] & (SIGNIFICANT_SPEED <= stats["speed"])
+    return significant & (lower <= stats["min"]) & (stats["max"] <= upper)
+
+# Click decisions of GaitTrigger.update() for many parameter combinations at once. The per-frame
+# range checks are precomputed as a matrix; the in-range timer, armed flag and click interval are
+# then stepped through the frames with one array operation per step across all combinations.
+# in_range_rows selects each combination's row of in_range; returns one array of click frame
+# indices per combination.
+def evaluate_rules(times, in_range, in_range_rows, durations, intervals):
+    combos = len(in_range_rows)
+    durations = np.asarray(durations, np.float64)
+    intervals = np.asarray(intervals, np.float64)
+    first = np.zeros(combos, np.int64)  # Frame of the oldest in-range timestamp still held
+    running = np.zeros(combos, bool)  # In-range timestamps are held (the timer is running)
+    armed = np.zeros(combos, bool)  # is_in_range_for_duration
+    last_click = np.full(combos, -np.inf)
+    clicks = []  # (frame, combinations that clicked)
+    for frame, now in enumerate(times):
+        ok = in_range[in_range_rows, frame]
+        if ok.any():
+            first = np.where(ok & ~running, frame, first)
+            running = ok.copy()
+            armed |= ok & (now - times[first] >= durations)
+            # Drop timestamps older than the duration, as the deque does
+            while True:
+                stale = ok & (now - times[first] > durations)
+                if not stale.any():
+                    break
+                first[stale] += 1
+        else:
+            running[:] = False
+        if armed.any():
+            fire = ~ok & armed & (now - last_click >= intervals)
+            if fire.any():
+                clicked = np.flatnonzero(fire)
+                clicks.append((frame, clicked))
+                last_click[clicked] = now
+                armed[clicked] = False
+    frames = [[] for _ in range(combos)]
+    for frame, clicked in clicks:
+        for combo in clicked:
+            frames[combo].append(frame)
+    return [np.array(combo_frames, np.int64) for combo_frames in frames]
+
+# Click times of one parameter combination from GaitTrigger itself, to check evaluate_rules against
+def reference_clicks(times, xs, ys, settings, speed_range_percent, in_range_duration, frame_skip=FRAME_SKIP,
+                     steps=None):
+    trigger = GaitTrigger(settings, frame_skip=frame_skip, speed_estimator="frame_rate")
+    if steps is None:
+        steps = np.ones(len(times), np.int64)
+    clicks = []
+    for now, x, y, step in zip(times, xs, ys, steps):
+        for _ in range(int(step) - 1):
+            trigger.skip_frame()
+        centroid = None if np.isnan(x) else (x, y)
+        if trigger.update(centroid, now, speed_range_percent, in_range_duration):
+            clicks.append(now)
+    return clicks
+
+
+
+# SWEEP
+
+# Inclusive numeric grid from "start:stop:step", or a comma separated list of values
+def parse_grid(text):
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        return list(np.round(np.arange(start, stop + step / 2, step), 6))
+    return [float(value) for value in text.split(",")]
+
+# Keep each worker single-threaded inside OpenCV; the pool already uses every core
+def _init_worker():
+    cv2.setNumThreads(1)
+
+# Segment one recording with one VALUE_THRESHOLD (or read a journal); returns its series
+def extract_series(job):
+    path, settings, options = job
+    if path.endswith(".rgtj"):
+        return journal_series(path, options["arena"])
+    with open_frame_source(path, options["fps"]) as source:
+        if options["roi"]:
+            source = CroppedFrameSource(source, options["roi"])
+        return centroid_series(source, settings, options["frame_skip"], options["resolution"])
+
+# Evaluate one chunk of (speed range, duration, interval) combinations on one series. The speed
+# window can follow the duration (see SPEED_WINDOW), so the range checks are computed per
+# (speed range, duration) pair, with the window statistics shared by durations of the same window.
+def evaluate_chunk(job):
+    series, combos, frame_skip = job
+    times, xs, ys, steps = series
+    pairs, rows = np.unique([combo[:2] for combo in combos], axis=0, return_inverse=True)
+    windows = [speed_window_seconds(SPEED_WINDOW, duration) for duration in pairs[:, 1]]
+    in_range = np.zeros((len(pairs), len(times)), bool)
+    for window in set(windows):
+        selected = np.array([w == window for w in windows])
+        stats = speed_statistics(times, xs, frame_skip=frame_skip, speed_window=window, steps=steps)
+        in_range[selected] = in_range_matrix(stats, pairs[selected, 0])
+    rows = rows.reshape(-1)
+    frames = evaluate_rules(times, in_range, rows, [combo[1] for combo in combos], [combo[2] for combo in combos])
+    return [times[combo_frames].tolist() for combo_frames in frames]
+
+# Trigger times of every combination on every recording. Each (recording, VALUE_THRESHOLD) is
+# segmented once in the pool, then the combinations are split into SWEEP_CHUNK sized tasks.
+# Returns a list of dicts, one per combination, with the click times per recording.
+def run_sweep(paths, settings, grid, options, workers=None):
+    thresholds = grid["VALUE_THRESHOLD"]
+    combos = list(itertools.product(grid["SPEED_RANGE_PERCENT"], grid["IN_RANGE_DURATION"], grid["MIN_CLICK_INTERVAL"]))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        keys = [(path, threshold) for path in paths for threshold in thresholds]
+        jobs = [(path, dict(settings, VALUE_THRESHOLD=threshold), options) for path, threshold in keys]
+        series = dict(zip(keys, executor.map(extract_series, jobs)))
+        chunks = [combos[i:i + SWEEP_CHUNK] for i in range(0, len(combos), SWEEP_CHUNK)]
+        tasks = [(key, i) for key in keys for i in range(len(chunks))]
+        outputs = executor.map(evaluate_chunk, [(series[key], chunks[i], options["frame_skip"]) for key, i in tasks])
+        for (key, i), chunk_times in zip(tasks, outputs):
+            for combo, click_times in zip(chunks[i], chunk_times):
+                results[(key[1],) + combo, key[0]] = click_times
+    rows = []
+    for threshold in thresholds:
+        for combo in combos:
+            clicks = {path: results[(threshold,) + combo, path] for path in paths}
+            rows.append({"VALUE_THRESHOLD": threshold, "SPEED_RANGE_PERCENT": combo[0], "IN_RANGE_DURATION": combo[1],
+                         "MIN_CLICK_INTERVAL": combo[2], "clicks": sum(len(times) for times in clicks.values()),
+                         "times": clicks})
+    return rows, series
+
+# Best first: closest to the expected click count per recording when given, else most clicks;
+# ties go to the setting whose first click comes earliest
+def rank(rows, expected=None, recordings=1):
+    def key(row):
+        first = min((times[0] for times in row["times"].values() if times), default=float('inf'))
+        if expected is None:
+            return (-row["clicks"], first)
+        return (abs(row["clicks"] - expected * recordings), first)
+    return sorted(rows, key=key)
+
+def write_report(rows, path):
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "VALUE_THRESHOLD", "SPEED_RANGE_PERCENT", "IN_RANGE_DURATION", "MIN_CLICK_INTERVAL",
+                             "clicks", "recording", "times"])
+            for i, row in enumerate(rows, 1):
+                for recording, times in row["times"].items():
+                    writer.writerow([i, row["VALUE_THRESHOLD"], row["SPEED_RANGE_PERCENT"], row["IN_RANGE_DURATION"],
+                                     row["MIN_CLICK_INTERVAL"], row["clicks"], recording,
+                                     " ".join(f"{t:.3f}" for t in times)])
+    else:
+        with open(path, "w") as f:
+            for i, row in enumerate(rows, 1):
+                f.write(json.dumps({"rank": i, **row}) + "\n")
+
+
+
+"""
+MAIN PROGRAM STARTS
+"""
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank trigger parameter combinations on recorded side views")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories of videos and/or telemetry journals (.rgtj)")
+    parser.add_argument("--output", "-o", help="Ranked report (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: one per core)")
+    parser.add_argument("--top", type=int, default=20, help="Settings to print (default: 20)")
+    parser.add_argument("--expected", type=float, help="Good runs per recording; settings closest to it rank first")
+    parser.add_argument("--check", action="store_true", help="Check a sample of settings against GaitTrigger itself")
+    # Rodent profile
+    parser.add_argument("--rodent", choices=list(RODENT_CONFIGS), default="Black Rat", help="Rodent profile (default: Black Rat)")
+    parser.add_argument("--settings", help="Settings file saved by RGT; overrides --rodent")
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "WIDTH", "HEIGHT"),
+                        help="Crop each frame to the side view before segmentation")
+    parser.add_argument("--arena", type=int, default=0, help="Arena index to read from journals (default: 0)")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate of the recordings (default: from each file)")
+    parser.add_argument("--frame-skip", type=int, default=FRAME_SKIP, help=f"Analyze every Nth frame (default: {FRAME_SKIP})")
+    # Grid
+    parser.add_argument("--speed-range", default=SWEEP_SPEED_RANGES, help=f"Speed range %% values (default: {SWEEP_SPEED_RANGES})")
+    parser.add_argument("--in-range-duration", default=SWEEP_DURATIONS, help=f"In range durations (default: {SWEEP_DURATIONS})")
+    parser.add_argument("--min-click-interval", default=SWEEP_INTERVALS, help=f"Click intervals (default: {SWEEP_INTERVALS})")
+    parser.add_argument("--value-threshold", help="VALUE_THRESHOLD values; each one segments the recordings again (default: from the profile)")
+    args = parser.parse_args()
+
+    if SPEED_ESTIMATOR != "frame_rate":
+        parser.error('The sweep evaluates the "frame_rate" speed estimator only')
+    if args.settings:
+        with open(args.settings, "r") as f:
+            settings = json.load(f)
+    else:
+        settings = rodent_settings(args.rodent)
+    grid = {
+        "SPEED_RANGE_PERCENT": parse_grid(args.speed_range),
+        "IN_RANGE_DURATION": parse_grid(args.in_range_duration),
+        "MIN_CLICK_INTERVAL": parse_grid(args.min_click_interval),
+        "VALUE_THRESHOLD": [int(v) for v in parse_grid(args.value_threshold)] if args.value_threshold else [settings["VALUE_THRESHOLD"]],
+    }
+    options = {"fps": args.fps, "roi": args.roi, "frame_skip": args.frame_skip, "resolution": RESOLUTION, "arena": args.arena}
+    paths = [path for path in args.inputs if path.endswith(".rgtj")] + find_videos([path for path in args.inputs if not path.endswith(".rgtj")])
+    if not paths:
+        parser.error("No recordings found")
+    combinations = int(np.prod([len(values) for values in grid.values()]))
+    print(f"Sweeping {combinations} settings over {len(paths)} recording(s) with {args.workers} workers")
+
+    start = time.perf_counter()
+    rows, series = run_sweep(paths, settings, grid, options, args.workers)
+    elapsed = time.perf_counter() - start
+    rows = rank(rows, args.expected, len(paths))
+    print(f"Evaluated {combinations} settings in {elapsed:.1f}s")
+    print(f"{'rank':>4} {'value':>5} {'range%':>6} {'dur':>5} {'int':>5} {'clicks':>6}  first click times")
+    for i, row in enumerate(rows[:args.top], 1):
+        times = sorted(t for recording_times in row["times"].values() for t in recording_times)
+        shown = " ".join(f"{t:.2f}" for t in times[:8]) + (" ..." if len(times) > 8 else "")
+        print(f"{i:>4} {row['VALUE_THRESHOLD']:>5} {row['SPEED_RANGE_PERCENT']:>6g} {row['IN_RANGE_DURATION']:>5g} "
+              f"{row['MIN_CLICK_INTERVAL']:>5g} {row['clicks']:>6}  {shown}")
+
+    if args.check:
+        # GaitTrigger on the same series for every 50th ranked setting
+        mismatches = 0
+        for row in rows[::max(1, len(rows) // 50)]:
+            check_settings = dict(settings, MIN_CLICK_INTERVAL=row["MIN_CLICK_INTERVAL"])
+            for path in paths:
+                times, xs, ys, steps = series[path, row["VALUE_THRESHOLD"]]
+                expected = reference_clicks(times, xs, ys, check_settings, row["SPEED_RANGE_PERCENT"],
+                                            row["IN_RANGE_DURATION"], args.frame_skip, steps)
+                if len(expected) != len(row["times"][path]) or not np.allclose(expected, row["times"][path]):
+                    mismatches += 1
+                    print(f"Mismatch at {row}: GaitTrigger clicked at {expected}")
+        print(f"Check: {mismatches} mismatches")
+    if args.output:
+        write_report(rows, args.output)
+        print(f"Wrote {args.output}")
@@ -0,0 +1,9 @@
+"""
+TEST CONFIGURATION
+"""
+
+import os
+import sys
+
+# The tracker's modules sit at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,24 @@
+"""
+BLOB ENGINE TESTS
+"""
+
+from benchmarks.parity_blobs import SETTINGS, compare_blob_engines, compare_min_area
+from benchmarks.synthetic import add_noise, crossing_frames
+from frame_sources import ArrayFrameSource
+
+
+def test_engines_agree_on_a_crossing():
+    source = ArrayFrameSource(add_noise(crossing_frames(40, (1280, 400), speed=30), 20))
+    summary, _ = compare_blob_engines(source, SETTINGS, frame_skip=1)
+    assert summary["detection_mismatches"] == 0
+    assert summary["max_distance"] < 0.01
+
+# The engines only disagree on blobs whose pixel count passes MIN_AREA while their outline polygon doesn't
+def test_engines_disagree_only_at_the_min_area_boundary():
+    summary, cases = compare_min_area(SETTINGS)
+    assert any(case["contours"] for case in cases) and not all(case["components"] for case in cases)
+    for case in cases:
+        assert case["components"] == (case["pixels"] > SETTINGS["MIN_AREA"])
+        assert case["contours"] == (case["contours_area"] > SETTINGS["MIN_AREA"])
+        assert case["contours_area"] < case["pixels"]
+    assert summary["disagreeing_sizes"] >= 1
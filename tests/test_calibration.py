@@ -0,0 +1,57 @@
+"""
+ARENA CALIBRATION TESTS
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import add_noise, side_view_frame
+from calibration import calibration_key, learn_calibration, load_calibration, save_calibration
+from gait_pipeline import FrameSegmenter, rodent_settings
+
+SETTINGS = dict(rodent_settings("Black Rat"), top_left=[0, 0], bottom_right=[640, 480])
+FIXTURE = (slice(300, 340), slice(500, 540))  # A dark bracket on the green screen
+
+# Side view with dark walls above and below the green walkway and a static fixture on it;
+# x places the rodent (None: the empty arena)
+def arena_frame(x=None):
+    frame = side_view_frame(-100 if x is None else x)
+    frame[:100] = frame[380:] = 20
+    frame[FIXTURE] = 30
+    return frame
+
+
+def test_mask_keeps_the_walkway_only():
+    mask = learn_calibration(add_noise([arena_frame() for _ in range(5)], 6), SETTINGS, margin=12, edge=3)
+    assert mask.shape == (480, 640) and mask.dtype == np.uint8
+    assert mask[240, 100] == 255 and mask[104, 320] == 255 and mask[375, 320] == 255
+    assert mask[50, 320] == 0 and mask[98, 320] == 0  # The walls are dark in every empty frame
+    assert mask[320, 520] == 0 and mask[320, 542] == 0 and mask[320, 545] == 255  # Fixture grown by edge
+
+
+def test_calibrated_segmenter_ignores_static_objects():
+    mask = learn_calibration([arena_frame()], SETTINGS)
+    frame = arena_frame(x=250)
+    plain = FrameSegmenter(SETTINGS, resolution=None)
+    calibrated = FrameSegmenter(SETTINGS, resolution=None, calibration=mask)
+    assert plain.find_centroid(frame) != pytest.approx((250, 240), abs=2)  # Picks a wall
+    assert calibrated.find_centroid(frame) == pytest.approx((250, 240), abs=2)
+
+
+def test_no_green_screen_is_an_error():
+    with pytest.raises(ValueError):
+        learn_calibration([np.zeros((480, 640, 3), np.uint8)], SETTINGS)
+
+
+def test_saved_masks_are_keyed_to_their_settings(tmp_path):
+    path = str(tmp_path / "calibration.npz")
+    mask = learn_calibration([arena_frame()], SETTINGS)
+    save_calibration(SETTINGS, mask, path)
+    moved = dict(SETTINGS, top_left=[10, 0])
+    save_calibration(moved, 255 - mask, path)
+    assert np.array_equal(load_calibration(SETTINGS, path), mask)
+    assert np.array_equal(load_calibration(moved, path), 255 - mask)
+    for key, value in (("VALUE_THRESHOLD", SETTINGS["VALUE_THRESHOLD"] + 10), ("UPPER_GREEN", [90, 255, 255])):
+        changed = dict(SETTINGS, **{key: value})
+        assert calibration_key(changed) != calibration_key(SETTINGS)
+        assert load_calibration(changed, path) is None
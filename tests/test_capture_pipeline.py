@@ -0,0 +1,99 @@
+"""
+CAPTURE PIPELINE TESTS
+"""
+
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+from capture_pipeline import BLOCK, DROP_OLDEST, FramePipeline
+from frame_sources import ArrayFrameSource, CaptureScheduler, MssFrameSource
+from instrumentation import Instrumentation
+
+# Frames whose pixels hold their index, so the frames analyzed can be identified
+def numbered_frames(count):
+    return [np.full((4, 6, 3), i, np.uint8) for i in range(count)]
+
+# Frame numbers in the order the analysis loop gets them, pausing pause seconds per frame
+def analyze(pipeline, pause=0.0):
+    numbers = []
+    while True:
+        item = pipeline.get(timeout=1.0)
+        if item is None:
+            if pipeline.exhausted:
+                return numbers
+            continue
+        slot, frame, timestamp = item
+        numbers.append(int(frame[0, 0, 0]))
+        time.sleep(pause)
+        pipeline.release(slot)
+
+
+def test_block_keeps_every_frame():
+    pipeline = FramePipeline(CaptureScheduler(ArrayFrameSource(numbered_frames(40)), frame_skip=1),
+                             pool_size=2, policy=BLOCK).start()
+    numbers = analyze(pipeline, pause=0.002)
+    pipeline.stop()
+    assert numbers == list(range(40))
+    assert pipeline.frames_dropped == 0 and pipeline.frames_analyzed == 40
+
+
+def test_drop_oldest_keeps_the_latest_frames():
+    pipeline = FramePipeline(CaptureScheduler(ArrayFrameSource(numbered_frames(200)), frame_skip=1),
+                             pool_size=3, policy=DROP_OLDEST).start()
+    numbers = analyze(pipeline, pause=0.005)
+    pipeline.stop()
+    assert pipeline.frames_dropped > 0
+    assert numbers == sorted(set(numbers)) and numbers[-1] == 199  # In order, and the newest is never lost
+    assert len(numbers) + pipeline.frames_dropped == pipeline.frames_captured == 200
+
+
+def test_inline_mode_matches_threaded():
+    pipeline = FramePipeline(CaptureScheduler(ArrayFrameSource(numbered_frames(10)), frame_skip=2),
+                             threaded=False).start()
+    assert analyze(pipeline) == list(range(1, 10, 2))
+
+# mss handles belong to the thread that opened them: a live source built on one thread and grabbed
+# by the capture thread must open mss on the capture thread
+def test_mss_opens_on_the_grabbing_thread(monkeypatch):
+    opened = []
+
+    class FakeMss:
+        def __init__(self):
+            opened.append(threading.current_thread().name)
+
+        def grab(self, monitor):
+            raw = np.zeros((monitor["height"], monitor["width"], 4), np.uint8).tobytes()
+            return types.SimpleNamespace(raw=raw, width=monitor["width"], height=monitor["height"])
+
+        def close(self):
+            pass
+
+    monkeypatch.setitem(sys.modules, "mss", types.SimpleNamespace(mss=FakeMss))
+    source = MssFrameSource({"top": 0, "left": 0, "width": 6, "height": 4})
+    pipeline = FramePipeline(CaptureScheduler(source, target_hz=200), pool_size=2).start()
+    assert pipeline.get(timeout=1.0) is not None
+    pipeline.stop()
+    source.close()
+    assert opened == ["RGT capture"]
+
+# The capture decimation and the analysis downscale run on different threads, so they must not
+# share a histogram
+def test_capture_decimation_has_its_own_stage(monkeypatch):
+    class FakeMss:
+        def grab(self, monitor):
+            raw = np.zeros((monitor["height"], monitor["width"], 4), np.uint8).tobytes()
+            return types.SimpleNamespace(raw=raw, width=monitor["width"], height=monitor["height"])
+
+    metrics = Instrumentation(export=None)
+    source = MssFrameSource({"top": 0, "left": 0, "width": 16, "height": 8}, sct=FakeMss(), decimation=2)
+    source.metrics = metrics
+    pipeline = FramePipeline(CaptureScheduler(source, target_hz=200), pool_size=2).start()
+    slot, frame, timestamp = pipeline.get(timeout=1.0)
+    pipeline.stop()
+    assert frame.shape == (4, 8, 3)
+    assert metrics.histograms["decimate"].count >= 1
+    assert metrics.histograms["resize"].count == 0
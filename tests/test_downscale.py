@@ -0,0 +1,67 @@
+"""
+PYRAMID DOWNSCALE TESTS
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from arenas import Arena, ArenaTracker
+from benchmarks.synthetic import add_noise, side_view_frame
+from gait_pipeline import RESOLUTION, area_resize, make_scaled_segmenter, pyramid_factor, rodent_settings
+
+SETTINGS = rodent_settings("Black Rat")
+
+
+@pytest.mark.parametrize("size", [(640, 480), (1280, 960), (1920, 400), (2560, 1920), (5120, 3840), (40, 30)])
+@pytest.mark.parametrize("min_area", [50, 150])
+def test_pyramid_factor_is_the_largest_that_keeps_min_area(size, min_area):
+    factor = pyramid_factor(SETTINGS, size, RESOLUTION, min_area=min_area, max_factor=8)
+    native_area = SETTINGS["MIN_AREA"] * size[0] * size[1] / (RESOLUTION[0] * RESOLUTION[1])
+    assert factor in (1, 2, 4, 8) and factor <= max(1, min(size))
+    if factor > 1:
+        assert native_area / factor ** 2 >= min_area
+    if 2 * factor <= min(8, *size):
+        assert native_area / (2 * factor) ** 2 < min_area  # The next halving would lose the rodent
+
+
+def test_pyramid_factor_examples():
+    assert pyramid_factor(SETTINGS, RESOLUTION, min_area=150) == 1  # 500 px rodent: halving leaves 125
+    assert pyramid_factor(SETTINGS, (1280, 960), min_area=150) == 2
+    assert pyramid_factor(SETTINGS, (5120, 3840), min_area=150) == 8
+    assert pyramid_factor(SETTINGS, (5120, 3840), min_area=150, max_factor=4) == 4
+    assert pyramid_factor(SETTINGS, (1280, 960), resolution=None, min_area=150) == 1  # MIN_AREA already native
+
+
+@pytest.mark.parametrize("factor", [2, 4, 8])
+def test_area_resize_matches_one_area_resize(factor):
+    image = add_noise([side_view_frame(300, (1280, 960))], 30)[0]
+    size = (1280 // factor, 960 // factor)
+    halved = area_resize(image, size)
+    assert halved.shape == (960 // factor, 1280 // factor, 3)
+    assert np.abs(halved.astype(int) - cv2.resize(image, size, interpolation=cv2.INTER_AREA)).max() <= 1
+
+# Every factor reports centroids in RESOLUTION pixels and keeps MIN_AREA meaning the same rodent
+@pytest.mark.parametrize("factor", [1, 2, 4])
+def test_pyramid_centroids_in_reference_pixels(factor):
+    size = (1280, 960)
+    frame = side_view_frame(500, size, body=(120, 60))
+    segmenter, to_reference = make_scaled_segmenter(SETTINGS, size, RESOLUTION, "pyramid", factor=factor,
+                                                    roi_tracking=False, motion_gating=False)
+    x, y = segmenter.find_centroid(frame)
+    to_reference = to_reference or (1.0, 1.0)  # None when the analysis size is RESOLUTION itself
+    assert (x * to_reference[0], y * to_reference[1]) == pytest.approx((250, 240), abs=1)
+    assert segmenter.min_area == pytest.approx(SETTINGS["MIN_AREA"] * 4 / factor ** 2)
+
+
+def test_decimated_capture_feeds_every_arena():
+    arenas = []
+    for name, left, width in (("Wide", 0, 1280), ("Narrow", 1280, 640)):
+        settings = dict(SETTINGS, name=name, top_left=[left, 0], bottom_right=[left + width, 960], click=[0, 0])
+        arenas.append(Arena(settings, downscale="pyramid"))
+    factors = [arena.decimation for arena in arenas]
+    tracker = ArenaTracker(arenas, decimate_capture=True)
+    assert tracker.decimation == min(factors)
+    grab = np.zeros((960 // tracker.decimation, 1920 // tracker.decimation, 3), np.uint8)
+    assert [grab[arena.window].shape[:2] for arena in arenas] == [
+        (960 // tracker.decimation, width // tracker.decimation) for width in (1280, 640)]
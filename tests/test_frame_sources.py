@@ -0,0 +1,66 @@
+"""
+CAPTURE SCHEDULING TESTS
+"""
+
+import numpy as np
+import pytest
+
+import frame_sources
+from frame_sources import ArrayFrameSource, CaptureScheduler, VirtualClock
+
+# Frames whose pixels hold their index, so the frames handed out can be identified
+def numbered_frames(count):
+    return [np.full((4, 6, 3), i, np.uint8) for i in range(count)]
+
+
+@pytest.mark.parametrize("frame_skip", [1, 3, 25])
+def test_hands_out_every_frame_skip_th_frame(frame_skip):
+    source = ArrayFrameSource(numbered_frames(100), fps=50)
+    clock = VirtualClock(source)
+    scheduler = CaptureScheduler(source, frame_skip=frame_skip, rate_window=5)
+    numbers, times = [], []
+    while (frame := scheduler.next_frame()) is not None:
+        numbers.append(int(frame[0, 0, 0]))
+        times.append(clock.time())
+    expected = list(range(frame_skip - 1, 100, frame_skip))
+    assert numbers == expected
+    assert times == pytest.approx([number / 50 for number in expected])
+    assert scheduler.frames == len(expected)
+    assert (scheduler.first_timestamp, scheduler.last_timestamp) == pytest.approx((times[0], times[-1]))
+    assert list(scheduler.recent) == pytest.approx(times[-5:])  # Bounded to the latest rate_window
+    if len(expected) > 1:
+        assert scheduler.achieved_rate() == pytest.approx(50 / frame_skip)
+        assert scheduler.recent_rate() == pytest.approx(50 / frame_skip)
+
+
+def test_reads_into_out_and_follows_size_changes():
+    frames = numbered_frames(3) + [np.full((8, 6, 3), 3, np.uint8)]
+    scheduler = CaptureScheduler(ArrayFrameSource(frames, fps=50), frame_skip=1)
+    out = np.empty((4, 6, 3), np.uint8)
+    for number in range(3):
+        assert scheduler.next_frame(out=out) is out and out[0, 0, 0] == number
+    frame = scheduler.next_frame(out=out)
+    assert frame is not out and frame.shape == (8, 6, 3)
+    assert scheduler.next_frame(out=out) is None
+
+# A live consumer that falls behind: every capture slot that passes without a grab is counted once
+def test_counts_live_slots_skipped(monkeypatch):
+    class FakeTime:
+        now = 0.0
+
+        def perf_counter(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.now += seconds
+
+    clock = FakeTime()
+    monkeypatch.setattr(frame_sources, "time", clock)
+    source = ArrayFrameSource(numbered_frames(50))
+    source.live = True
+    scheduler = CaptureScheduler(source, target_hz=10)
+    for pause in (0.0, 0.0, 0.35, 0.0, 0.05, 1.0, 0.0):  # Seconds the consumer spends per frame
+        scheduler.next_frame()
+        clock.now += pause
+    assert scheduler.frames == 7
+    assert scheduler.slots_skipped == 2 + 9  # Slots due within the 0.35 s and 1.0 s stalls, less the grab when it ends
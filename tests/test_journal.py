@@ -0,0 +1,78 @@
+"""
+TELEMETRY JOURNAL TESTS
+"""
+
+import os
+
+import numpy as np
+
+from journal import RECORD_DTYPE, TelemetryJournal, export_csv, read_journal, records_around, summary
+
+# Append count records to journal: arena alternating, every third frame undetected, every fifth gated
+def fill(journal, count):
+    for i in range(count):
+        centroid = None if i % 3 == 0 else (float(i), float(2 * i))
+        journal.append(i / 20, i % 2, centroid, 10.0 * i, i, i / 2, 0.5, 1.5, i % 4 == 0, i % 6 == 0, i % 7 == 0,
+                       i % 5 == 0)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "session.rgtj")
+    count = 1000
+    journal = TelemetryJournal(path, ["Left", "Right"], chunk=64, info={"recording": "test"})
+    fill(journal, count)
+    records, description = read_journal(path)  # While still open
+    assert len(records) == count
+    journal.close()
+
+    records, description = read_journal(path)
+    assert description["arenas"] == ["Left", "Right"] and description["info"] == {"recording": "test"}
+    assert records.dtype == RECORD_DTYPE
+    index = np.arange(count)
+    assert np.allclose(records["time"], index / 20)
+    assert np.array_equal(records["arena"], index % 2)
+    assert np.array_equal(np.isnan(records["x"]), index % 3 == 0)
+    assert np.array_equal(records["y"][index % 3 != 0], 2 * index[index % 3 != 0])
+    assert np.array_equal(records["click"], index % 7 == 0)
+    assert np.array_equal(records["gated"], index % 5 == 0)
+    assert (tmp_path / "session.rgtj").stat().st_size == 4096 + count * RECORD_DTYPE.itemsize  # Trimmed on close
+
+    export_csv(records, description, str(tmp_path / "session.csv"))
+    lines = (tmp_path / "session.csv").read_text().splitlines()
+    assert len(lines) == count + 1 and lines[1].startswith("Left,") and lines[2].startswith("Right,")
+
+
+def test_stops_at_size_cap(tmp_path):
+    path = str(tmp_path / "capped.rgtj")
+    journal = TelemetryJournal(path, chunk=16, max_mb=0.01)
+    fill(journal, 1000)
+    journal.close()
+    records, _ = read_journal(path)
+    assert journal.full and len(records) == journal.max_records < 1000
+
+
+def test_session_retention(tmp_path):
+    for day in range(5):
+        old = tmp_path / f"rgt_2020010{day}_000000.rgtj"
+        old.write_bytes(b"")
+        mtime = 1_600_000_000 + day
+        os.utime(old, (mtime, mtime))
+    journal = TelemetryJournal.for_session(["Arena 1"], directory=str(tmp_path), keep=3)
+    journal.close()
+    assert sorted(path.name for path in tmp_path.iterdir())[:2] == ["rgt_20200103_000000.rgtj", "rgt_20200104_000000.rgtj"]
+    assert len(list(tmp_path.iterdir())) == 3
+
+# Live journals hold epoch capture times; --around is seconds into the session either way
+def test_around_is_relative_to_the_session_start(tmp_path):
+    start = 1_700_000_000.0
+    live = TelemetryJournal.for_session(["Arena 1"], directory=str(tmp_path / "live"), start=start)
+    replay = TelemetryJournal(str(tmp_path / "replay.rgtj"))
+    for i in range(100):
+        for journal, base in ((live, start), (replay, 0.0)):
+            journal.append(base + i / 10, 0, (float(i), 0.0), 0.0, 0, 0, 0, 0, False, False, False)
+    for journal in (live, replay):
+        journal.close()
+        records, description = read_journal(journal.path)
+        around = records_around(records, description, 5.0, window=0.25)
+        assert [round(float(x)) for x in around["x"]] == [48, 49, 50, 51, 52]
+        assert "from 0.000s to 9.900s" in summary(records, description)
@@ -0,0 +1,58 @@
+"""
+MOTION GATING TESTS
+"""
+
+import pytest
+
+from benchmarks.synthetic import add_noise, side_view_frame
+from gait_pipeline import RESOLUTION, GaitTrigger, MotionGate, make_segmenter, rodent_settings
+
+SETTINGS = rodent_settings("Black Rat")
+
+# Noisy frames of a rodent standing at x for count frames, then walking step pixels per frame
+def stop_and_go(count, x=200, step=12, walking=20):
+    positions = [x] * count + [x + step * (i + 1) for i in range(walking)]
+    return add_noise([side_view_frame(p, RESOLUTION) for p in positions], 6), positions
+
+
+def test_still_rodent_is_gated_between_refreshes():
+    frames, _ = stop_and_go(30, walking=0)
+    gate = MotionGate(make_segmenter(SETTINGS, motion_gating=False), refresh=5)
+    gated = []
+    for frame in frames:
+        centroid = gate.find_centroid(frame)
+        gated.append(gate.gated)
+        assert centroid == pytest.approx((200, 240), abs=1)
+        assert gate.area > SETTINGS["MIN_AREA"]  # The segmented blob's area is reused with its centroid
+    assert gated == [False] + ([True] * 5 + [False]) * 4 + [True] * 5  # Segmented again every refresh + 1 frames
+    assert gate.gated_frames == 25 and not gate.moving
+
+
+def test_walking_rodent_is_never_gated():
+    frames, positions = stop_and_go(3)
+    gate = MotionGate(make_segmenter(SETTINGS, motion_gating=False))
+    for frame, x in zip(frames[3:], positions[3:]):
+        assert gate.find_centroid(frame)[0] == pytest.approx(x, abs=1)
+        assert not gate.gated and gate.moving
+
+
+def test_reset_segments_the_next_frame():
+    frames, _ = stop_and_go(4, walking=0)
+    gate = MotionGate(make_segmenter(SETTINGS, motion_gating=False))
+    gate.find_centroid(frames[0])
+    gate.find_centroid(frames[1])
+    assert gate.gated
+    gate.reset()
+    gate.find_centroid(frames[2])
+    assert not gate.gated
+
+# A gated frame measures nothing: the next speed spans every frame since the last measured one
+def test_trigger_measures_across_gated_frames():
+    trigger = GaitTrigger(SETTINGS, frame_rate=30, frame_skip=3)
+    trigger.update((100, 240), 0.0)
+    trigger.skip_frame()
+    trigger.skip_frame()
+    trigger.update((130, 240), 0.3)
+    assert trigger.speed == pytest.approx(30 * 30 / (3 * 3))
+    trigger.update((140, 240), 0.4)
+    assert trigger.speed == pytest.approx(10 * 30 / 3)
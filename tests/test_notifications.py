@@ -0,0 +1,117 @@
+"""
+NOTIFICATION TESTS
+"""
+
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+import notifications
+from notifications import NotificationWorker
+
+# Just enough of an SMTP server on localhost to accept messages; records each message's
+# data and how many connections were opened
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.messages = []
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost ready")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "EHLO":
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 end with .")
+                data = []
+                while (line := self.rfile.readline().decode()) != ".\r\n":
+                    data.append(line)
+                self.server.messages.append("".join(data))
+                self.reply("250 queued")
+            else:
+                self.reply("250 ok")  # HELO, MAIL, RCPT, NOOP, RSET
+
+def config_for(port):
+    return {"sender_email": "rig@lab", "recipient_email": "me@lab", "app_password": "",
+            "smtp_host": "127.0.0.1", "smtp_port": port, "smtp_starttls": False}
+
+# A port nothing listens on
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_messages_share_one_connection():
+    with SmtpStandIn() as server:
+        loads = []
+        worker = NotificationWorker(lambda: loads.append(1) or config_for(server.port)).start()
+        for i in range(3):
+            worker.notify(f"Click {i}", "Body")
+        worker.stop()
+    assert worker.sent == 3 and worker.failed == 0
+    assert server.connections == 1
+    assert len(loads) == 1  # Config loaded once and cached
+    assert ["Subject: Click 0" in message for message in server.messages] == [True, False, False]
+    assert all("To: me@lab" in message for message in server.messages)
+
+
+def test_reload_config_picks_up_a_new_recipient():
+    with SmtpStandIn() as server:
+        config = config_for(server.port)
+        worker = NotificationWorker(lambda: dict(config)).start()
+        worker.notify("One", "Body")
+        deadline = time.monotonic() + 5
+        while worker.sent < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        config["recipient_email"] = "you@lab"
+        worker.notify("Two", "Body")  # Still the cached config
+        worker.reload_config()
+        worker.notify("Three", "Body")
+        worker.stop()
+    assert [message.count("To: you@lab") for message in server.messages] == [0, 0, 1]
+
+
+def test_unreachable_server_retries_then_drops(monkeypatch):
+    monkeypatch.setattr(notifications, "RETRY_BACKOFF", 0.01)
+    worker = NotificationWorker(lambda: config_for(closed_port())).start()
+    worker.notify("Lost", "Body")
+    worker.stop()
+    assert worker.sent == 0 and worker.failed == 1
+
+
+def test_missing_config_fails_without_connecting():
+    worker = NotificationWorker(lambda: None).start()
+    worker.notify("Nothing", "Body")
+    worker.stop()
+    assert worker.sent == 0 and worker.failed == 1
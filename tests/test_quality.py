@@ -0,0 +1,68 @@
+"""
+QUALITY LADDER TESTS
+"""
+
+import pytest
+
+from arenas import Arena
+from benchmarks.synthetic import side_view_frame
+from gait_pipeline import FRAME_RATE, rodent_settings
+from quality import QUALITY_LADDER, QualityController, segmenter_options
+
+WINDOW = 10
+
+# Feed windows of frames costing a fraction of the current level's budget; returns the levels after each window
+def run_windows(controller, fractions):
+    levels = []
+    for fraction in fractions:
+        for _ in range(WINDOW):
+            controller.record(fraction * controller.frame_budget())
+        levels.append(controller.level)
+    return levels
+
+
+def test_steps_down_one_level_per_overrunning_window():
+    controller = QualityController(window=WINDOW, frame_skip=3)
+    for _ in range(WINDOW - 1):
+        assert not controller.record(1.0)  # No decision before a full window
+    assert controller.record(1.0) and controller.level == 1
+    assert run_windows(controller, [2.0] * 5) == [2, 3, 4, 4, 4]  # Held at the last level
+    assert controller.frame_skip() == 3 * QUALITY_LADDER[-1]["skip_factor"]
+    assert controller.rate() == pytest.approx(FRAME_RATE / controller.frame_skip())
+
+
+def test_steps_back_up_once_calm():
+    controller = QualityController(window=WINDOW)
+    run_windows(controller, [2.0, 2.0])
+    assert run_windows(controller, [0.8, 0.3, 0.3]) == [2, 1, 0]  # Within budget but above recovery: stays
+    assert [change[1:3] for change in controller.changes] == [(0, 1), (1, 2), (2, 1), (1, 0)]
+
+
+def test_backoff_after_failed_step_up():
+    controller = QualityController(window=WINDOW)
+    run_windows(controller, [2.0, 0.3])  # Down to 1 and straight back up to 0
+    assert run_windows(controller, [2.0]) == [1]  # Level 0 overran again right after the step up
+    assert controller.backoff == 2
+    assert run_windows(controller, [0.3, 0.3]) == [1, 0]  # Two calm windows before retrying level 0
+    assert run_windows(controller, [2.0, 0.3, 0.3, 0.3, 0.3]) == [1, 1, 1, 1, 0]
+    assert controller.backoff == 4
+
+
+def test_level_frames_are_counted():
+    controller = QualityController(window=WINDOW)
+    run_windows(controller, [2.0, 0.8, 0.8])
+    assert controller.level_frames[:2] == [WINDOW, 2 * WINDOW]
+    assert "ended at level 1" in controller.report()
+
+# A lower analysis resolution scales MIN_AREA and keeps centroids in reference pixels
+def test_arena_tracks_at_every_level():
+    settings = dict(rodent_settings("Black Rat"), name="Rig", top_left=[0, 0], bottom_right=[640, 480], click=[0, 0])
+    arena = Arena(settings, (640, 480), downscale="resize")
+    frame = side_view_frame(300, (640, 480))
+    for level in QUALITY_LADDER:
+        arena.set_quality(level["scale"], 3 * level["skip_factor"], **segmenter_options(level))
+        centroid = arena.segmenter.find_centroid(frame[arena.window])
+        if arena.to_reference:
+            centroid = (centroid[0] * arena.to_reference[0], centroid[1] * arena.to_reference[1])
+        assert centroid == pytest.approx((300, 240), abs=2)
+        assert arena.trigger.frame_skip == 3 * level["skip_factor"]
@@ -0,0 +1,50 @@
+"""
+REGION OF INTEREST TESTS
+"""
+
+import pytest
+
+from benchmarks.synthetic import GREEN_SCREEN_BGR, crossing_frames, side_view_frame
+from gait_pipeline import FrameSegmenter, RoiTracker, rodent_settings
+
+SETTINGS = rodent_settings("Black Rat")
+
+
+def test_window_centroids_match_full_frame():
+    plain = FrameSegmenter(SETTINGS, resolution=None)
+    tracker = RoiTracker(FrameSegmenter(SETTINGS, resolution=None))
+    for frame in crossing_frames(80, speed=10):  # Enters and leaves the side view
+        expected = plain.find_centroid(frame)
+        centroid = tracker.find_centroid(frame)
+        assert (centroid is None) == (expected is None)
+        if expected is not None:
+            assert centroid == pytest.approx(expected, abs=0.5)
+    assert tracker.roi_frames > tracker.full_frames > 0
+
+
+def test_reacquires_after_a_jump_out_of_the_window():
+    tracker = RoiTracker(FrameSegmenter(SETTINGS, resolution=None), max_misses=1)
+    assert tracker.find_centroid(side_view_frame(200))[0] == pytest.approx(200, abs=2)
+    assert tracker.find_centroid(side_view_frame(210))[0] == pytest.approx(210, abs=2)
+    full_frames = tracker.full_frames
+    # The window around x = 210 misses the rodent at 500; the same frame falls back to a full search
+    assert tracker.find_centroid(side_view_frame(500))[0] == pytest.approx(500, abs=2)
+    assert tracker.full_frames == full_frames + 1
+    assert tracker.window[0] <= 500 <= tracker.window[2]
+
+
+def test_full_search_after_losing_the_rodent():
+    tracker = RoiTracker(FrameSegmenter(SETTINGS, resolution=None), max_misses=2)
+    tracker.find_centroid(side_view_frame(300))
+    empty = side_view_frame(0)
+    empty[:] = GREEN_SCREEN_BGR
+    assert tracker.find_centroid(empty) is None  # First miss: still searching the window
+    assert tracker.window is not None
+    assert tracker.find_centroid(empty) is None  # Second miss: full search, nothing found
+    assert tracker.window is None
+    assert tracker.find_centroid(side_view_frame(100))[0] == pytest.approx(100, abs=2)
+
+
+def test_edge_reach_follows_the_morphology():
+    assert FrameSegmenter(SETTINGS, resolution=None).morphology_reach == 7  # erode x5 + dilate x2, 3x3 kernel
+    assert FrameSegmenter(SETTINGS, resolution=None, erode_iterations=2, dilate_iterations=1).morphology_reach == 3
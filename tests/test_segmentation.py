@@ -0,0 +1,46 @@
+"""
+COLOR MASK PARITY TESTS
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.parity_chroma import compare_chroma_key
+from benchmarks.synthetic import add_noise, crossing_frames, profile_color
+from frame_sources import ArrayFrameSource
+from gait_pipeline import (RESOLUTION, RODENT_CONFIGS, ChromaKeySegmenter, FrameSegmenter, LutSegmenter,
+                           build_segmentation_lut, rodent_settings)
+
+# Noisy synthetic side views of a profile's rodent crossing the green screen, at RESOLUTION
+def profile_frames(profile, count=12):
+    return add_noise(crossing_frames(count, RESOLUTION, speed=50, color=profile_color(profile)), 20)
+
+
+@pytest.mark.parametrize("profile", list(RODENT_CONFIGS))
+def test_lut_mask_matches_hsv(profile):
+    settings = rodent_settings(profile)
+    hsv = FrameSegmenter(settings, RESOLUTION)
+    lut = LutSegmenter(settings, RESOLUTION, table=build_segmentation_lut(settings))
+    for frame in profile_frames(profile):
+        assert np.array_equal(hsv.segment(frame), lut.segment(frame))
+
+# Random colors: the two classifications may only disagree where the HSV conversion rounds across a bound
+def test_chroma_mask_matches_hsv_on_random_colors():
+    settings = rodent_settings("Black Rat")
+    colors = np.random.default_rng(0).integers(0, 256, (512, 512, 3), dtype=np.uint8)
+    hsv = FrameSegmenter(settings, resolution=None)
+    chroma = ChromaKeySegmenter(settings, resolution=None)
+    hsv._allocate(colors.shape)
+    chroma._allocate(colors.shape)
+    reference, candidate = hsv.color_mask(colors) > 0, chroma.color_mask(colors) > 0
+    assert np.count_nonzero(reference != candidate) / reference.size < 0.001
+
+
+@pytest.mark.parametrize("profile", list(RODENT_CONFIGS))
+def test_chroma_centroids_match_hsv(profile):
+    frames = profile_frames(profile, count=40)
+    report = compare_chroma_key(ArrayFrameSource(frames), rodent_settings(profile), frame_skip=1)
+    assert report["frames"] == len(frames)
+    assert report["color_mask_iou"]["min"] > 0.99
+    assert report["detection_mismatches"] == 0
+    assert report["max_distance"] < 1.0
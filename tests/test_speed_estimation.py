@@ -0,0 +1,107 @@
+"""
+SPEED ESTIMATION TESTS
+"""
+
+import numpy as np
+import pytest
+
+from gait_pipeline import GaitTrigger, rodent_settings
+from speed_estimation import AlphaBetaFilter, RollingSpeedWindow
+
+# Capture times with the jitter of a real grab loop around a 1/fps interval
+def jittered_times(count, fps=30.0, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.uniform(0.5, 1.5, count) / fps)
+
+
+def test_constant_speed_with_jittered_timestamps():
+    speed = 400.0
+    abf = AlphaBetaFilter()
+    velocities = [abf.update(10 + speed * t, t) for t in jittered_times(50)]
+    assert velocities[0] is None
+    for velocity in velocities[1:]:
+        assert velocity == pytest.approx(speed)
+
+
+def test_smooths_noisy_positions():
+    speed, times = 400.0, jittered_times(300)
+    rng = np.random.default_rng(1)
+    positions = speed * times + rng.normal(0, 3, len(times))
+    abf = AlphaBetaFilter()
+    filtered = np.array([abf.update(x, t) for x, t in zip(positions, times)][50:])
+    differences = np.diff(positions)[49:] / np.diff(times)[49:]
+    assert abs(filtered.mean() - speed) < 20
+    assert filtered.std() < differences.std() / 2
+
+
+def test_repeated_timestamp_and_reset():
+    abf = AlphaBetaFilter()
+    abf.update(0, 0.0)
+    assert abf.update(10, 0.1) == pytest.approx(100)
+    assert abf.update(50, 0.1) == pytest.approx(100)  # No time passed: measurement ignored
+    assert abf.position == pytest.approx(10)
+    abf.reset()
+    assert abf.update(50, 0.2) is None
+
+
+# The window as a plain list of (time, speed): the last capacity pushed, minus the expired ones
+class NaiveWindow:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = []
+
+    def push(self, timestamp, value):
+        self.entries = (self.entries + [(timestamp, value)])[-self.capacity:]
+
+    def expire(self, now, duration):
+        self.entries = [(t, v) for t, v in self.entries if now - t <= duration]
+
+    def clear(self):
+        self.entries = []
+
+
+@pytest.mark.parametrize("capacity", [1, 3, 30])
+def test_matches_naive_window(capacity):
+    rng = np.random.default_rng(capacity)
+    window, naive = RollingSpeedWindow(capacity), NaiveWindow(capacity)
+    now = 0.0
+    for step in range(3000):
+        now += rng.uniform(0.01, 0.1)
+        action = rng.random()
+        if action < 0.02:
+            window.clear()
+            naive.clear()
+        elif action < 0.3:
+            window.expire(now, 0.5)
+            naive.expire(now, 0.5)
+        else:
+            speed = float(rng.integers(1, 40) * 20)  # Repeated values exercise the min/max queue ties
+            window.push(now, speed)
+            naive.push(now, speed)
+        values = [v for _, v in naive.entries]
+        assert len(window) == len(values)
+        if values:
+            assert window.mean() == pytest.approx(np.mean(values))
+            assert window.min() == min(values)
+            assert window.max() == max(values)
+        else:
+            assert window.mean() == 0.0
+
+
+# A new In Range Duration (e.g. from the Control Panel) resizes the speed window on the next frame
+def test_speed_window_follows_in_range_duration():
+    trigger = GaitTrigger(rodent_settings("Black Rat"), frame_rate=10, frame_skip=1, speeds_cap=100)
+    now, x = 0.0, 100.0
+    for duration, frames in ((0.5, 20), (1.5, 20), (0.3, 5)):
+        for _ in range(frames):
+            now, x = round(now + 0.1, 6), x + 20
+            trigger.update((x, 200), now, in_range_duration=duration)
+        assert now - trigger.speeds.times[trigger.speeds.start % trigger.speeds.capacity] <= duration
+        assert len(trigger.speeds) == round(duration / 0.1) + 1
+
+
+def test_fixed_speed_window():
+    trigger = GaitTrigger(rodent_settings("Black Rat"), frame_rate=10, frame_skip=1, speeds_cap=100, speed_window=0.5)
+    for frame in range(1, 30):
+        trigger.update((100 + 20 * frame, 200), round(0.1 * frame, 6), in_range_duration=2.0)
+    assert len(trigger.speeds) == 6
@@ -0,0 +1,41 @@
+"""
+TRIGGER RULE SWEEP TESTS
+"""
+
+import numpy as np
+import pytest
+
+from gait_pipeline import FRAME_RATE, rodent_settings
+from sweep import evaluate_chunk, reference_clicks
+
+FRAME_SKIP = 25
+
+# Centroid series of a rodent that walks at a steady pace, stops, turns around and is lost now and then,
+# with the analyzed frames each sample spans (more than one where the motion gate skipped frames)
+def walking_series(count=1200, gated=False, seed=0):
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(1, 4, count) if gated else np.ones(count, np.int64)
+    steps[0] = 1
+    times = np.cumsum(steps) * FRAME_SKIP / FRAME_RATE
+    pace = np.repeat(rng.choice([0.0, 6.0, 8.0, -7.0], count // 40 + 1), 40)[:count]
+    xs = 300 + np.cumsum(pace * steps + rng.integers(-1, 2, count))
+    xs[rng.random(count) < 0.03] = np.nan
+    ys = np.full(count, 200.0)
+    return times, xs, ys, steps
+
+COMBOS = [(percent, duration, interval) for percent in (15, 30, 60) for duration in (0.5, 1.0, 2.0) for interval in (0.0, 4.0)]
+
+
+@pytest.mark.parametrize("gated", [False, True])
+def test_evaluate_rules_matches_gait_trigger(gated):
+    series = walking_series(gated=gated)
+    times, xs, ys, steps = series
+    settings = rodent_settings("Black Rat")
+    results = evaluate_chunk((series, COMBOS, FRAME_SKIP))
+    clicks = 0
+    for (percent, duration, interval), swept in zip(COMBOS, results):
+        expected = reference_clicks(times, xs, ys, dict(settings, MIN_CLICK_INTERVAL=interval), percent, duration,
+                                    FRAME_SKIP, steps)
+        assert swept == pytest.approx(expected), (percent, duration, interval)
+        clicks += len(expected)
+    assert clicks > 0  # The series must exercise the click path
@@ -0,0 +1,73 @@
+"""
+TRACKER THREAD
+"""
+
+import queue
+import threading
+import traceback
+
+STATUS_POLL_MS = 50  # How often the Tk main loop checks the status channel
+
+
+
+# Runs a tracking function on a worker thread, connected to the Tk main loop by two queues:
+# commands (Tk -> tracker, e.g. stop or new trigger parameters) and status (tracker -> Tk).
+# target(tracker, *args) is called on the worker; whatever it returns is published as the
+# "finished" status, which is always the last message.
+class TrackerThread:
+    def __init__(self, target, *args):
+        self.target = target
+        self.args = args
+        self.commands = queue.Queue()
+        self.status = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="RGT tracker", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def _run(self):
+        result = None
+        try:
+            result = self.target(self, *self.args)
+        except Exception as e:
+            traceback.print_exc()
+            self.publish("error", str(e))
+        finally:
+            self.publish("finished", result)
+
+    # Tk side
+
+    def send(self, command, value=None):
+        self.commands.put((command, value))
+
+    # All status messages published since the last poll, as (kind, value) pairs
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.status.get_nowait())
+            except queue.Empty:
+                return messages
+
+    # Tracker side
+
+    def publish(self, kind, value=None):
+        self.status.put((kind, value))
+
+    # All commands sent since the last call, as (command, value) pairs
+    def take_commands(self):
+        if self.commands.empty():  # Fast path; checked every frame
+            return []
+        commands = []
+        while True:
+            try:
+                commands.append(self.commands.get_nowait())
+            except queue.Empty:
+                return commands